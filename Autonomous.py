@@ -1,20 +1,85 @@
-import pygame
-import socket
+import argparse
 import time
-import struct
-import subprocess
-import re
+
+from FieldObjectTracker import FieldObjectTracker
+from MotionSequencer import MotionSequencer, VirtualClock, WaitUntil, drive, objectInRange, strafe, turn, wait
+from settings import parseSettings, settingsParser
+from transport import makeTransport
 
 
-pygame.init()
 ip_address =  '127.0.0.1'
+port = 9999
+connect = True  # send the frames to the robot server at ip_address (testcontrol.py or the robot)
+transport = "tcp"
+tick_rate = 50.0  # frames per second while a plan runs
+maxspeed = 0.8  # scale factor for motor outputs, as in operator_control.py
+dry_run = False  # run the plan on a virtual clock, as fast as possible (to testcontrol.py if connect is set)
+
+# Perception fills this in (see FieldObjectTracker.py); WaitUntil steps read it
+tracker = FieldObjectTracker()
+
+
+# The autonomous routine. Steps run one after another; see MotionSequencer.py for the kinds
+# of steps. Powers are -1..1 like the sticks: positive speed drives forward, positive strafe
+# and turn are the stick pushed right. Durations are in seconds.
+def makePlan(tracker):
+    return [
+        drive(0.5, 1.5),
+        strafe(0.4, 1.0),
+        turn(0.3, 0.8),
+        WaitUntil(objectInRange(tracker, "cone", 0.5), timeout=3.0, speed=0.25, name="creep up to a cone"),
+        wait(0.5),
+        drive(-0.5, 1.0),
+    ]
+
+
+def main(plan=None):
+    if plan is None:
+        plan = makePlan(tracker)
+
+    client = None
+    if connect:
+        client = makeTransport(transport, (ip_address, port))
+        client.connect()
+    frames = []
+    send = client.send if client is not None else lambda frame: frames.append(bytes(frame))
+
+    if dry_run:
+        clock = VirtualClock()
+        sequencer = MotionSequencer(send, tick_rate, maxspeed, clock, clock.sleep)
+    else:
+        sequencer = MotionSequencer(send, tick_rate, maxspeed)
+
+    started = time.monotonic()
+    try:
+        plan_time = sequencer.run(plan)
+    finally:
+        if client is not None:
+            client.close()
+    elapsed = time.monotonic() - started
+
+    for name, planned, actual in sequencer.steps:
+        print(f"{planned:7.2f} s  {name}" + (f"  (started {actual - planned:+.3f} s late)" if not dry_run else ""))
+    print(f"plan took {plan_time:.2f} s ({elapsed:.2f} s wall clock), {sequencer.ticks} frames, "
+          f"{sequencer.ticks_skipped} ticks skipped, latest tick {sequencer.max_lateness * 1e3:.1f} ms late")
+    return frames
+
+
+# Command line options override the settings above (see settings.py)
+def parseArgs(argv=None):
+    parser = settingsParser("Run the autonomous routine")
+    parser.add_argument("--ip", dest="ip_address", help=f"robot server address (default {ip_address})")
+    parser.add_argument("--port", type=int, help=f"robot server port (default {port})")
+    parser.add_argument("--connect", action=argparse.BooleanOptionalAction,
+                        help=f"send to the robot server (default {'on' if connect else 'off'})")
+    parser.add_argument("--transport", choices=("tcp", "udp"), help=f"default {transport}")
+    parser.add_argument("--rate", dest="tick_rate", type=float, help=f"frames per second (default {tick_rate:g})")
+    parser.add_argument("--maxspeed", type=float, help=f"motor output scale (default {maxspeed:g})")
+    parser.add_argument("--dry-run", dest="dry_run", action=argparse.BooleanOptionalAction,
+                        help="run on a virtual clock, as fast as possible")
+    return parseSettings(globals(), parser, argv)
 
-def main():
-    lf,rb,rf,lb = 0, 0, 0, 0
-    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-    client.connect((ip_address, 9999))
 
-   # while True: uncomment this to start the while True (infinite loop)
-   # I would suggest initializing each motor value, then sending them over the socket connection
-   # Look at operator.py to see what variables need to be initalized to what value
-   # implement time.sleep() to stop movement for now         
\ No newline at end of file
+if __name__ == "__main__":
+    parseArgs()
+    main()
@@ -0,0 +1,89 @@
+import time
+
+# Command state on the robot, between the network and the motors.
+#
+# Every applied frame's motor bytes go into the store with the time they arrived; a fixed-rate
+# actuation loop (RobotServer.actuate in testcontrol.py) reads the store and writes the motors,
+# so the motor update rate no longer depends on when frames happen to arrive. What sample()
+# returns depends on how old the newest command is:
+#
+#   up to extrapolate_time  the trend of the last two commands continued (0: off, see below)
+#   up to deadman_timeout   the newest command, held
+#   then, over ramp_time    a straight ramp from the newest command down to stop
+#   after that              stop
+#
+# Extrapolation is off by default: the operator stations only send when the frame changes
+# (plus a keepalive), so a quiet link usually means "unchanged", and continuing the last
+# trend would overshoot whenever the driver stops moving the stick. It suits a sender that
+# transmits at a steady rate, e.g. over UDP.
+
+StopFrame = (64, 192, 64, 192)  # rb, rf, lb, lf at rest, see remap()
+
+
+class CommandStore:
+    def __init__(self, extrapolate_time=0.0, deadman_timeout=0.5, ramp_time=0.25, stop=StopFrame,
+                 clock=time.monotonic):
+        self.extrapolate_time = extrapolate_time
+        self.deadman_timeout = deadman_timeout
+        self.ramp_time = ramp_time
+        self.stop_values = tuple(stop)
+        # each motor byte stays on its side of the protocol: 0-127 around 64, 128-255 around 192
+        self.limits = tuple((value - 64, value + 63) for value in self.stop_values)
+        self.clock = clock
+
+        self.values = self.stop_values  # newest command
+        self.updated = None  # clock() when it arrived, None when there is none
+        self.previous = self.stop_values  # the command before it, for extrapolation
+        self.previous_updated = None
+
+    # Store the motor bytes (rb, rf, lb, lf) of a frame that was just applied
+    def update(self, values, now=None):
+        if now is None:
+            now = self.clock()
+        self.previous = self.values
+        self.previous_updated = self.updated
+        self.values = tuple(values[:4])
+        self.updated = now
+
+    # Forget the current command: sample() returns stop until the next update()
+    def stop(self):
+        self.values = self.previous = self.stop_values
+        self.updated = self.previous_updated = None
+
+    # Seconds since the newest command, None when there is none
+    def age(self, now=None):
+        if self.updated is None:
+            return None
+        return (self.clock() if now is None else now) - self.updated
+
+    # Motor bytes (rb, rf, lb, lf) to write now
+    def sample(self, now=None):
+        if self.updated is None:
+            return self.stop_values
+        if now is None:
+            now = self.clock()
+        age = now - self.updated
+
+        if age <= self.extrapolate_time and self.previous_updated is not None:
+            gap = self.updated - self.previous_updated
+            if 0 < gap <= self.extrapolate_time:
+                return tuple(self.extrapolated(index, age / gap) for index in range(4))
+        if age <= self.deadman_timeout:
+            return self.values
+        if self.ramp_time > 0 and age < self.deadman_timeout + self.ramp_time:
+            remaining = 1.0 - (age - self.deadman_timeout) / self.ramp_time
+            return tuple(round(stop + (value - stop) * remaining)
+                         for value, stop in zip(self.values, self.stop_values))
+        return self.stop_values
+
+    # One motor byte continued along its last change, kept inside its channel and never
+    # carried past stop (a trend towards stop ends there instead of reversing the motor)
+    def extrapolated(self, index, fraction):
+        value = self.values[index]
+        stop = self.stop_values[index]
+        result = round(value + (value - self.previous[index]) * fraction)
+        low, high = self.limits[index]
+        result = min(high, max(low, result))
+        if (value - stop) * (result - stop) < 0:
+            return stop
+        return result
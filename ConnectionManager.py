@@ -0,0 +1,143 @@
+import random
+import threading
+
+
+# Owns the connection to the robot from a background thread, so the control loop never
+# blocks on connect, reconnect or a slow send.
+#
+# The control loop calls send(frame), which only stores the frame as the newest one and
+# returns immediately. The background thread sends whatever is newest; frames that were
+# replaced before it got to them are dropped, since only the latest command matters.
+# When the connection breaks it reconnects with exponential backoff plus random jitter,
+# and after reconnecting sends the newest frame right away instead of a backlog.
+# resolve, if given, is called before every connection attempt and returns the robot's
+# current (host, port), or None to keep the last one; this is how a robot that changed its
+# DHCP address is found again (see RobotDiscovery.py). unreachable, if given, is called with
+# the (host, port) a connection attempt failed on, so the resolver can stop offering it.
+# receiver, if given, gets everything the robot sends back (a TelemetryReceiver); a second
+# thread reads it, so the sending thread never waits on the robot's side of the connection.
+class ConnectionManager:
+    def __init__(self, transport, min_backoff=0.1, max_backoff=5.0, health_interval=0.5, resolve=None, receiver=None,
+                 unreachable=None):
+        self.transport = transport
+        self.resolve = resolve
+        self.unreachable = unreachable
+        self.receiver = receiver
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.health_interval = health_interval
+
+        self.connected = False
+        self.ever_connected = False
+        self.frames_dropped = 0  # frames replaced before they could be sent
+        self.reconnects = 0
+
+        self.condition = threading.Condition()
+        self.pending = None  # newest frame not sent yet
+        self.last_frame = None  # newest frame handed to send(), resent after a reconnect
+        self.running = False
+        self.stopped = threading.Event()  # wakes the thread out of a backoff wait
+        self.closed = False  # the reader saw the robot close the connection
+        self.thread = None
+        self.reader = None
+
+    def start(self):
+        self.running = True
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="ConnectionManager", daemon=True)
+        self.thread.start()
+        if self.receiver is not None:
+            self.reader = threading.Thread(target=self.read, name="ConnectionManager reader", daemon=True)
+            self.reader.start()
+
+    def stop(self):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.reader is not None:
+            self.reader.join()
+        self.transport.close()
+
+    # Queue frame to be sent as soon as possible. Never blocks.
+    # Returns False when the robot is not connected; the frame is then kept only as the
+    # state to send after reconnecting.
+    def send(self, frame):
+        frame = bytes(frame)  # the encoder reuses its buffer
+        with self.condition:
+            if self.pending is not None:
+                self.frames_dropped += 1
+            self.pending = frame
+            self.last_frame = frame
+            self.condition.notify()
+        return self.connected
+
+    def run(self):
+        attempt = 0
+        while self.running:
+            if not self.connected:
+                if self.resolve is not None:
+                    address = self.resolve()
+                    if address is not None:
+                        self.transport.address = address
+                try:
+                    self.transport.connect()
+                except OSError:
+                    self.transport.close()
+                    if self.unreachable is not None:
+                        self.unreachable(self.transport.address)
+                    delay = min(self.max_backoff, self.min_backoff * 2 ** attempt)
+                    attempt += 1
+                    self.stopped.wait(random.uniform(delay / 2, delay))
+                    continue
+
+                if self.ever_connected:
+                    self.reconnects += 1
+                    print("reconnected")
+                else:
+                    print("connected")
+                self.ever_connected = True
+                attempt = 0
+                with self.condition:
+                    self.pending = self.last_frame
+                if self.receiver is not None:
+                    self.receiver.reset()
+                self.closed = False
+                self.connected = True
+
+            with self.condition:
+                if self.pending is None and self.running:
+                    self.condition.wait(self.health_interval)
+                frame, self.pending = self.pending, None
+
+            try:
+                if frame is not None:
+                    self.transport.send(frame)
+                elif self.closed or (self.reader is None and not self.transport.alive()):
+                    raise ConnectionResetError("robot closed the connection")
+            except OSError:
+                print("connection refused")
+                self.connected = False
+                self.transport.close()
+                attempt = 1
+
+    # Reader thread: hands what the robot sends to the receiver. Only notices a closed
+    # connection; reconnecting is left to run().
+    def read(self):
+        while self.running:
+            if not self.connected or self.closed:
+                self.stopped.wait(0.05)
+                continue
+            try:
+                data = self.transport.receive(self.health_interval)
+                lost = data == b'' and self.transport.stream  # over UDP, just an empty datagram
+            except (OSError, ValueError):
+                data, lost = None, True  # closed by run() for a reconnect, or reset by the robot
+            if data:
+                self.receiver.feed(data)
+            elif lost and self.connected:
+                with self.condition:
+                    self.closed = True
+                    self.condition.notify()
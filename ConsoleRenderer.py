@@ -0,0 +1,57 @@
+import sys
+import threading
+
+
+# Draws the operator dashboard from its own thread, so the control loop never waits on the
+# terminal. The loop calls update(snapshot) every frame, which only stores the snapshot;
+# the renderer thread redraws at most `rate` times per second, and only when the snapshot
+# changed. render(snapshot) turns a snapshot into the text to show.
+# On a terminal the dashboard is redrawn in place; when output is redirected each redraw
+# is simply appended.
+class ConsoleRenderer:
+    def __init__(self, render, rate=10.0, stream=None):
+        self.render = render
+        self.interval = 1.0 / rate
+        self.stream = stream if stream is not None else sys.stdout
+        self.in_place = self.stream.isatty()
+
+        self.snapshot = None  # newest snapshot from the control loop
+        self.drawn = None  # snapshot currently on screen
+        self.lines = 0  # height of the last drawing, for moving the cursor back up
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="ConsoleRenderer", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        self.draw()
+
+    # Called from the control loop: a single reference assignment, never blocks
+    def update(self, snapshot):
+        self.snapshot = snapshot
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.draw()
+
+    def draw(self):
+        snapshot = self.snapshot
+        if snapshot is None or snapshot == self.drawn:
+            return
+        self.drawn = snapshot
+
+        lines = self.render(snapshot).split("\n")
+        if self.in_place:
+            # move to the start of the previous drawing and overwrite it line by line
+            text = (f"\x1b[{self.lines}F" if self.lines else "") + "\x1b[K\n".join(lines) + "\x1b[K\n"
+        else:
+            text = "\n".join(lines) + "\n"
+        self.lines = len(lines)
+        self.stream.write(text)
+        self.stream.flush()
@@ -0,0 +1,118 @@
+from ControllerReader import ControllerState, StateLayout
+
+# Decides which connected controller drives the robot when more than one is plugged in.
+# Every pad is read once per frame (by its ControllerReader); merge() then combines those
+# states into a single command state for the kinematics.
+#
+# Policies:
+#   "takeover"  the pad in control keeps it while it is being used; once it goes idle,
+#               whichever pad is used next takes over
+#   "priority"  the highest-priority pad with input controls; lower pads only drive while
+#               every pad above them is idle (priority = connection order, see promote())
+#   "merge"     axis-wise crew mode: sticks from the driver (first pad), buttons, triggers
+#               and D-pad from the co-pilot (second pad)
+# In every policy any pad holding the e-stop input forces an all-stop command.
+
+Policies = ("takeover", "priority", "merge")
+
+StickSlots = ("lj_lr", "lj_ud", "rj_lr", "rj_ud")
+ButtonSlots = tuple(slot for slot, _ in StateLayout if slot not in StickSlots)
+AllSlots = tuple(slot for slot, _ in StateLayout)
+
+# Inputs that count as "the operator is using this pad". Triggers are left out because
+# their resting value differs between pads (-1 on axis triggers, 0 on button triggers).
+ActivityButtons = ("a", "b", "x", "y", "lb", "rb", "d_lr", "d_ud")
+
+
+class ControllerArbiter:
+    def __init__(self, policy="takeover", activity_threshold=0.15, estop="home"):
+        if policy not in Policies:
+            raise ValueError(f"unknown arbitration policy \"{policy}\", expected one of {', '.join(Policies)}")
+        self.policy = policy
+        self.activity_threshold = activity_threshold
+        self.estop = estop  # ControllerState slot that triggers the e-stop, None to disable
+        self.order = []  # instance ids, highest priority (primary / driver) first
+        self.active = None  # instance id currently in control
+        self.estopped = False
+        self.merged = ControllerState()
+        self.rest = ControllerState()
+
+    def add(self, instance_id):
+        self.order.append(instance_id)
+
+    def remove(self, instance_id):
+        self.order.remove(instance_id)
+        if self.active == instance_id:
+            self.active = None
+
+    # Give a pad the highest priority (make it the primary / driver)
+    def promote(self, instance_id):
+        self.order.remove(instance_id)
+        self.order.insert(0, instance_id)
+
+    def isActive(self, state):
+        threshold = self.activity_threshold
+        for slot in StickSlots:
+            value = getattr(state, slot)
+            if value > threshold or value < -threshold:
+                return True
+        for slot in ActivityButtons:
+            if getattr(state, slot):
+                return True
+        return False
+
+    # Combine the states of all pads (instance id -> ControllerState) into one command.
+    # Returns None when no pad is connected. Under "takeover" and "priority" the result is the
+    # controlling pad's own live state object, which the next read of that pad overwrites;
+    # otherwise it is a state the arbiter reuses between calls. Either way it is only valid
+    # until the next read/merge, so copy it to keep it.
+    def merge(self, states):
+        if not self.order:
+            self.active = None
+            return None
+
+        if self.estop:
+            self.estopped = any(getattr(states[instance_id], self.estop) for instance_id in self.order)
+            if self.estopped:
+                copySlots(self.rest, self.merged, AllSlots)
+                return self.merged
+
+        if self.policy == "merge":
+            driver = states[self.order[0]]
+            copilot = states[self.order[1]] if len(self.order) > 1 else driver
+            self.active = self.order[0]
+            copySlots(driver, self.merged, StickSlots)
+            copySlots(copilot, self.merged, ButtonSlots)
+            return self.merged
+
+        if self.policy == "priority":
+            for instance_id in self.order:
+                if self.isActive(states[instance_id]):
+                    self.active = instance_id
+                    break
+        else:
+            # takeover: switch to a pad that is being used while the current one is idle,
+            # or when the current one is gone
+            current = states[self.active] if self.active in states else None
+            if current is None or not self.isActive(current):
+                for instance_id in self.order:
+                    if instance_id != self.active and self.isActive(states[instance_id]):
+                        self.active = instance_id
+                        break
+
+        if self.active not in states:
+            self.active = self.order[0]
+        return states[self.active]
+
+    # Short description for the operator console
+    def status(self):
+        if self.estopped:
+            return "E-STOP"
+        if self.active is None:
+            return f"no controller ({self.policy})"
+        return f"pad {self.active} in control ({self.policy})"
+
+
+def copySlots(source, target, slots):
+    for slot in slots:
+        setattr(target, slot, getattr(source, slot))
@@ -0,0 +1,93 @@
+# Compiled controller readers.
+# pollJoy looks up the controller name and mapping table for every single input it reads.
+# A ControllerReader does that lookup once (when the pad is plugged in) and afterwards reads
+# the whole logical input set in one pass into a ControllerState.
+
+# Input type tags, same values as the standardized names in the mapping tables
+Button = "Button"
+Axis = "Axis"
+Hat = "Hat"
+
+# Fixed layout of a ControllerState: (slot name, logical input name from the mapping table)
+StateLayout = (
+    ("lj_lr", "LJ_LR"), ("lj_ud", "LJ_UD"),
+    ("rj_lr", "RJ_LR"), ("rj_ud", "RJ_UD"),
+    ("lt", "LT"), ("rt", "RT"),
+    ("lb", "LB"), ("rb", "RB"),
+    ("d_lr", "D_LR"), ("d_ud", "D_UD"),
+    ("a", "A"), ("b", "B"), ("x", "X"), ("y", "Y"),
+    ("home", "HOME"),
+)
+
+
+# Snapshot of every logical input of one controller for one frame.
+# Inputs the controller has no mapping for always read as 0.
+class ControllerState:
+    __slots__ = tuple(slot for slot, _ in StateLayout)
+
+    def __init__(self):
+        for slot, _ in StateLayout:
+            setattr(self, slot, 0)
+
+    def as_tuple(self):
+        return tuple(getattr(self, slot) for slot, _ in StateLayout)
+
+    def __repr__(self):
+        values = ", ".join(f"{slot}={getattr(self, slot)}" for slot, _ in StateLayout)
+        return f"ControllerState({values})"
+
+
+# Reads one joystick using a mapping that has been resolved ahead of time.
+# controllerMap is the inputs table of one controller mapping (see MappingRegistry.py).
+class ControllerReader:
+    def __init__(self, joystick, controllerMap):
+        self.joystick = joystick
+        self.buttons = []  # (slot, button index)
+        self.axes = []     # (slot, axis index)
+        self.hats = {}     # hat index -> [(slot, hat tuple index)], so each hat is read once
+
+        # Some drivers expose fewer buttons than the mapping table knows about (e.g. no HOME);
+        # those inputs are left out instead of raising on every read
+        get_numbuttons = getattr(joystick, "get_numbuttons", None)
+        button_count = get_numbuttons() if get_numbuttons is not None else None
+
+        for slot, input_source in StateLayout:
+            source = controllerMap.get(input_source)
+            if not source:
+                continue
+            if source[0] == Button:
+                if button_count is not None and source[1] >= button_count:
+                    continue
+                self.buttons.append((slot, source[1]))
+            elif source[0] == Axis:
+                self.axes.append((slot, source[1]))
+            elif source[0] == Hat:
+                self.hats.setdefault(source[1], []).append((slot, source[2]))
+            else:
+                raise ValueError(f"Unable to find source \"{source}\".")
+
+        self.buttons = tuple(self.buttons)
+        self.axes = tuple(self.axes)
+        self.hats = tuple((index, tuple(parts)) for index, parts in self.hats.items())
+
+    # Fill state (or a new ControllerState) with the current inputs and return it.
+    # Pass the same state object every frame to avoid allocating a new one.
+    def read(self, state=None):
+        if state is None:
+            state = ControllerState()
+
+        get_axis = self.joystick.get_axis
+        for slot, index in self.axes:
+            setattr(state, slot, get_axis(index))
+
+        get_button = self.joystick.get_button
+        for slot, index in self.buttons:
+            setattr(state, slot, get_button(index))
+
+        get_hat = self.joystick.get_hat
+        for index, parts in self.hats:
+            hat = get_hat(index)
+            for slot, part in parts:
+                setattr(state, slot, hat[part])
+
+        return state
@@ -0,0 +1,217 @@
+import array
+import time
+
+from FieldObject import FieldObject
+from optional import lazyImport
+
+np = lazyImport("numpy")  # NumPy is optional, the queries fall back to plain Python; imported on first use
+
+# Every FieldObject autonomous mode is tracking, for perception updates once per camera frame.
+#
+# The objects live in columns rather than as separate instances: one array per field (object
+# id, AprilTag id, distance, last seen) plus a list of names, row i of each column being one
+# object. Removing an object moves the last row into its place, so the columns stay packed.
+# Dictionaries index the rows by object id, by AprilTag id and by name, so applying a batch
+# of detections costs the same however many objects are tracked; nearest() and evict() scan
+# one column (with NumPy when it is installed).
+#
+# A detection is (name, distance, AprilTag id or None). A tagged detection updates the object
+# with that tag. Otherwise it updates the untagged object of the same name whose distance is
+# closest, if that is within match_distance (a tagged detection then gives it its tag), or
+# else starts a new object.
+
+NoTag = -1  # AprilTag id column value for objects without a tag
+
+
+class FieldObjectTracker:
+    def __init__(self, match_distance=0.5, clock=time.monotonic):
+        self.match_distance = match_distance
+        self.clock = clock
+
+        self.ids = array.array('q')
+        self.tags = array.array('q')
+        self.distances = array.array('d')
+        self.last_seen = array.array('d')
+        self.names = []
+
+        self.rows = {}  # object id -> row
+        self.by_tag = {}  # AprilTag id -> row
+        self.by_name = {}  # name -> set of rows
+        self.untagged = {}  # name -> set of rows of objects without a tag, for matching
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    # Apply one camera frame's detections. Returns the object id of each detection.
+    def update(self, detections, now=None):
+        if now is None:
+            now = self.clock()
+        return [self.track(name, distance, tag, now) for name, distance, tag in detections]
+
+    # Apply one detection, see the top of the file. Returns its object id.
+    def track(self, name, distance, april_tag_id=None, now=None):
+        if now is None:
+            now = self.clock()
+        row = None
+        if april_tag_id is not None:
+            row = self.by_tag.get(april_tag_id)
+        if row is None:
+            row = self.closest(name, distance)
+            if row is not None and april_tag_id is not None:
+                # the tag of an object tracked so far by name has just been read
+                unindex(self.untagged, self.names[row], row)
+                self.tags[row] = april_tag_id
+                self.by_tag[april_tag_id] = row
+
+        if row is None:
+            return self.add(name, distance, april_tag_id, now)
+        if self.names[row] != name:
+            self.rename(row, name)
+        self.distances[row] = distance
+        self.last_seen[row] = now
+        return self.ids[row]
+
+    # Untagged object named name whose distance is nearest to distance, within match_distance
+    def closest(self, name, distance):
+        best = None
+        best_gap = self.match_distance
+        for row in self.untagged.get(name, ()):
+            gap = abs(self.distances[row] - distance)
+            if gap <= best_gap:
+                best, best_gap = row, gap
+        return best
+
+    def add(self, name, distance, april_tag_id, now):
+        object_id = self.next_id
+        self.next_id += 1
+        row = len(self.ids)
+        self.ids.append(object_id)
+        self.tags.append(NoTag if april_tag_id is None else april_tag_id)
+        self.distances.append(distance)
+        self.last_seen.append(now)
+        self.names.append(name)
+        self.rows[object_id] = row
+        self.index_name(row)
+        if april_tag_id is not None:
+            self.by_tag[april_tag_id] = row
+        return object_id
+
+    def rename(self, row, name):
+        self.unindex_name(row)
+        self.names[row] = name
+        self.index_name(row)
+
+    def index_name(self, row):
+        name = self.names[row]
+        self.by_name.setdefault(name, set()).add(row)
+        if self.tags[row] == NoTag:
+            self.untagged.setdefault(name, set()).add(row)
+
+    def unindex_name(self, row):
+        name = self.names[row]
+        unindex(self.by_name, name, row)
+        if self.tags[row] == NoTag:
+            unindex(self.untagged, name, row)
+
+    # Stop tracking an object. The last row moves into its place.
+    def remove(self, object_id):
+        row = self.rows.pop(object_id)
+        self.unindex_name(row)
+        if self.tags[row] != NoTag:
+            del self.by_tag[self.tags[row]]
+
+        last = len(self.ids) - 1
+        if row != last:
+            self.unindex_name(last)
+            moved_id = self.ids[last]
+            self.ids[row] = moved_id
+            self.tags[row] = self.tags[last]
+            self.distances[row] = self.distances[last]
+            self.last_seen[row] = self.last_seen[last]
+            self.names[row] = self.names[last]
+            self.rows[moved_id] = row
+            if self.tags[row] != NoTag:
+                self.by_tag[self.tags[row]] = row
+            self.index_name(row)
+        for column in (self.ids, self.tags, self.distances, self.last_seen, self.names):
+            column.pop()
+
+    # FieldObject copy of an object (also carrying its last_seen time), None if not tracked
+    def get(self, object_id):
+        row = self.rows.get(object_id)
+        if row is None:
+            return None
+        tag = self.tags[row]
+        field_object = FieldObject(self.distances[row], self.names[row], None if tag == NoTag else tag)
+        field_object.last_seen = self.last_seen[row]
+        return field_object
+
+    # Distance of an object, None if not tracked; no FieldObject copy, for per-tick checks
+    def distance(self, object_id):
+        row = self.rows.get(object_id)
+        return None if row is None else self.distances[row]
+
+    def find_tag(self, april_tag_id):
+        row = self.by_tag.get(april_tag_id)
+        return None if row is None else self.ids[row]
+
+    def find_name(self, name):
+        return [self.ids[row] for row in self.by_name.get(name, ())]
+
+    # Object id of the nearest object (of this name, and seen within max_age seconds, when
+    # given), None when there is none
+    def nearest(self, name=None, max_age=None, now=None):
+        if max_age is not None and now is None:
+            now = self.clock()
+        if name is not None:
+            best = None
+            for row in self.by_name.get(name, ()):
+                if max_age is not None and now - self.last_seen[row] > max_age:
+                    continue
+                if best is None or self.distances[row] < self.distances[best]:
+                    best = row
+            return None if best is None else self.ids[best]
+
+        count = len(self.ids)
+        if not count:
+            return None
+        if np is not None:
+            distances = np.frombuffer(self.distances, dtype=np.float64, count=count)
+            if max_age is not None:
+                fresh = now - np.frombuffer(self.last_seen, dtype=np.float64, count=count) <= max_age
+                if not fresh.any():
+                    return None
+                distances = np.where(fresh, distances, np.inf)
+            return self.ids[int(distances.argmin())]
+        rows = range(count)
+        if max_age is not None:
+            rows = [row for row in rows if now - self.last_seen[row] <= max_age]
+        if not rows:
+            return None
+        return self.ids[min(rows, key=self.distances.__getitem__)]
+
+    # Stop tracking every object not seen for more than max_age seconds. Returns how many.
+    def evict(self, max_age, now=None):
+        if now is None:
+            now = self.clock()
+        count = len(self.ids)
+        if not count:
+            return 0
+        if np is not None:
+            last_seen = np.frombuffer(self.last_seen, dtype=np.float64, count=count)
+            stale = [self.ids[row] for row in np.flatnonzero(now - last_seen > max_age).tolist()]
+            del last_seen  # the arrays cannot shrink while NumPy views them
+        else:
+            stale = [self.ids[row] for row in range(count) if now - self.last_seen[row] > max_age]
+        for object_id in stale:
+            self.remove(object_id)
+        return len(stale)
+
+
+# Take row out of index[key], dropping the key once it has no rows left
+def unindex(index, key, row):
+    rows = index[key]
+    rows.discard(row)
+    if not rows:
+        del index[key]
@@ -0,0 +1,322 @@
+import errno
+import random
+import selectors
+import socket
+import threading
+import time
+
+from MotorControlWatcher import FrameWatcher
+from protocol import FrameEncoder, MsgDrive
+from quantize import MotorEncoder
+from TelemetryReceiver import TelemetryReceiver
+from TransmitScheduler import TransmitScheduler
+
+# Sends to several robots at once from one operator station (fleet mode in operator_control.py).
+#
+# Every robot gets a non-blocking socket, and one background thread serves all of them from a
+# single selector loop, so there is no thread per robot. Like ConnectionManager, send() only
+# stores the frame as the robot's newest and returns immediately. The loop writes as much of
+# it as the robot's socket takes: a robot that reads slowly keeps its unsent bytes until its
+# socket is writable again, while the others go on sending. A frame replaced before it went
+# out is dropped, since only the latest command matters. A robot whose frame makes no progress
+# for stall_timeout, that closes the connection, or that cannot be reached, is reconnected
+# with exponential backoff plus jitter, and is sent its newest frame again once it is back.
+# What a robot sends back (telemetry) is read by the same loop into the robot's
+# TelemetryReceiver (links[name].telemetry).
+
+
+# One robot: its socket and what is still to be sent to it
+class RobotLink:
+    def __init__(self, name, address, kind, telemetry_capacity=64):
+        self.name = name
+        self.address = address
+        self.kind = kind
+        self.telemetry = TelemetryReceiver(telemetry_capacity)
+        self.sock = None
+        self.events = 0  # what the selector watches the socket for
+        self.connecting = False
+        self.connected = False
+        self.ever_connected = False
+        self.deadline = 0.0  # connect or write must finish by then
+        self.next_attempt = 0.0
+        self.attempt = 0
+
+        self.pending = None  # newest frame not started yet
+        self.last_frame = None  # newest frame handed to send(), resent after a reconnect
+        self.out = None  # memoryview of the rest of the frame being written
+
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.reconnects = 0
+
+
+# targets: {robot name: (host, port)}; kind: "tcp" or "udp" as in transport.py
+class FleetSender:
+    def __init__(self, targets, kind="tcp", min_backoff=0.1, max_backoff=5.0, stall_timeout=1.0, telemetry_capacity=64):
+        if kind not in ("tcp", "udp"):
+            raise ValueError(f"unknown transport \"{kind}\", expected tcp or udp")
+        self.links = {name: RobotLink(name, address, kind, telemetry_capacity) for name, address in targets.items()}
+        self.min_backoff = min_backoff
+        self.max_backoff = max_backoff
+        self.stall_timeout = stall_timeout
+
+        self.lock = threading.Lock()
+        self.ready = set()  # links with a pending frame the loop has not seen yet
+        self.selector = selectors.DefaultSelector()
+        self.wake_reader, self.wake_writer = socket.socketpair()
+        self.wake_reader.setblocking(False)
+        self.wake_writer.setblocking(False)
+        self.woken = False
+        self.selector.register(self.wake_reader, selectors.EVENT_READ, None)
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="FleetSender", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+        self.wake()
+        if self.thread is not None:
+            self.thread.join()
+        for link in self.links.values():
+            self.close(link)
+        self.selector.close()
+        self.wake_reader.close()
+        self.wake_writer.close()
+
+    # Queue frame for robot name. Never blocks. Returns False while that robot is not
+    # connected; the frame is then kept as the state to send after connecting.
+    def send(self, name, frame):
+        link = self.links[name]
+        frame = bytes(frame)  # the encoder reuses its buffer
+        with self.lock:
+            if link.pending is not None:
+                link.frames_dropped += 1
+            link.pending = frame
+            link.last_frame = frame
+            self.ready.add(link)
+            woken, self.woken = self.woken, True
+        if not woken:
+            self.wake()
+        return link.connected
+
+    # Queue the same frame for every robot
+    def sendAll(self, frame):
+        frame = bytes(frame)
+        with self.lock:
+            for link in self.links.values():
+                if link.pending is not None:
+                    link.frames_dropped += 1
+                link.pending = frame
+                link.last_frame = frame
+                self.ready.add(link)
+            woken, self.woken = self.woken, True
+        if not woken:
+            self.wake()
+
+    def connected(self, name):
+        return self.links[name].connected
+
+    def connectedCount(self):
+        return sum(link.connected for link in self.links.values())
+
+    def wake(self):
+        try:
+            self.wake_writer.send(b"\0")
+        except OSError:
+            pass  # already full (a wakeup is pending anyway) or closed
+
+    def run(self):
+        while self.running:
+            now = time.monotonic()
+            timeout = self.max_backoff
+            for link in self.links.values():
+                if link.sock is None:
+                    if now >= link.next_attempt:
+                        self.open(link, now)
+                    else:
+                        timeout = min(timeout, link.next_attempt - now)
+                if link.sock is not None and (link.connecting or link.out is not None):
+                    if now >= link.deadline:
+                        self.fail(link, "timed out" if link.connecting else "stalled")
+                    else:
+                        timeout = min(timeout, link.deadline - now)
+
+            for key, events in self.selector.select(max(0.0, timeout)):
+                link = key.data
+                if link is None:
+                    self.drain()
+                    continue
+                if link.connecting:
+                    error = link.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+                    if error:
+                        self.fail(link, errno.errorcode.get(error, str(error)))
+                        continue
+                    self.opened(link)
+                if events & selectors.EVENT_READ and link.sock is not None:
+                    self.receive(link)
+                if events & selectors.EVENT_WRITE and link.sock is not None:
+                    self.flush(link)
+
+            with self.lock:
+                ready, self.ready = self.ready, set()
+            for link in ready:
+                if link.connected and link.out is None:
+                    self.flush(link)
+
+    def drain(self):
+        with self.lock:
+            self.woken = False
+        try:
+            while self.wake_reader.recv(4096):
+                pass
+        except OSError:
+            pass
+
+    # Start connecting, without waiting for the connection
+    def open(self, link, now):
+        if link.kind == "udp":
+            link.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            link.sock.setblocking(False)
+            link.sock.connect(link.address)  # only sets the default destination
+            self.watch(link, selectors.EVENT_READ)
+            self.opened(link)
+            return
+        link.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        link.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        link.sock.setblocking(False)
+        error = link.sock.connect_ex(link.address)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK):
+            self.fail(link, errno.errorcode.get(error, str(error)))
+            return
+        link.connecting = True
+        link.deadline = now + self.stall_timeout
+        self.watch(link, selectors.EVENT_WRITE)
+
+    def opened(self, link):
+        link.telemetry.reset()
+        link.connecting = False
+        link.connected = True
+        link.attempt = 0
+        if link.ever_connected:
+            link.reconnects += 1
+            print(f"{link.name} reconnected")
+        else:
+            print(f"{link.name} connected")
+        link.ever_connected = True
+        with self.lock:
+            link.pending = link.last_frame
+        self.flush(link)
+
+    # Write the current frame, then the newest pending one, as far as the socket takes them
+    def flush(self, link):
+        while True:
+            if link.out is None:
+                with self.lock:
+                    frame, link.pending = link.pending, None
+                if frame is None:
+                    break
+                link.out = memoryview(frame)
+                link.deadline = time.monotonic() + self.stall_timeout
+            try:
+                sent = link.sock.send(link.out)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError as error:
+                if link.kind == "udp":
+                    sent = len(link.out)  # not listening yet: the datagram is gone, the next one supersedes it
+                else:
+                    self.fail(link, error.strerror or str(error))
+                    return
+            if sent < len(link.out):
+                link.out = link.out[sent:]
+                if sent:
+                    link.deadline = time.monotonic() + self.stall_timeout
+                break
+            link.out = None
+            link.frames_sent += 1
+        self.watch(link, selectors.EVENT_READ | selectors.EVENT_WRITE if link.out is not None else selectors.EVENT_READ)
+
+    def watch(self, link, events):
+        if events == link.events:
+            return
+        if link.events:
+            self.selector.modify(link.sock, events, link)
+        else:
+            self.selector.register(link.sock, events, link)
+        link.events = events
+
+    # Telemetry from the robot; an empty read means it closed the connection
+    def receive(self, link):
+        try:
+            data = link.sock.recv(4096)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as error:
+            if link.kind != "udp":
+                self.fail(link, error.strerror or str(error))
+            return
+        if data:
+            link.telemetry.feed(data)
+        elif link.kind == "tcp":
+            self.fail(link, "closed by the robot")
+
+    def fail(self, link, reason):
+        if link.connected:
+            print(f"{link.name} disconnected ({reason})")
+        self.close(link)
+        delay = min(self.max_backoff, self.min_backoff * 2 ** link.attempt)
+        link.attempt += 1
+        link.next_attempt = time.monotonic() + random.uniform(delay / 2, delay)
+
+    def close(self, link):
+        if link.sock is not None:
+            if link.events:
+                self.selector.unregister(link.sock)
+            link.sock.close()
+            link.sock = None
+        link.events = 0
+        link.connecting = False
+        link.connected = False
+        link.out = None  # a partial frame cannot be finished on a new connection
+
+
+# One robot's send path when each pad drives its own robot: the robot's own shaper, motor
+# encoder, change gate and sequence numbers, and the pad (instance id) driving it, if any
+class FleetRoute:
+    def __init__(self, sender, name, shaper, keepalive_rate=5.0, max_rate=250.0, msg_type=MsgDrive):
+        self.sender = sender
+        self.name = name
+        self.shaper = shaper
+        self.msg_type = msg_type
+        self.pad = None
+        self.motor_encoder = MotorEncoder()
+        self.encoder = FrameEncoder()
+        self.scheduler = TransmitScheduler(self.send, FrameWatcher(), keepalive_rate, max_rate)
+
+    def send(self, frame):
+        self.sender.send(self.name, self.encoder.encode(self.msg_type, frame))
+
+
+# Robots from the fleet setting: a dict {name: "host[:port]" or (host, port)}, or a list of
+# "name=host[:port]" or "host[:port]" entries (named after their address), as given by --fleet.
+# Returns {name: (host, port)}.
+def fleetTargets(fleet, default_port):
+    if isinstance(fleet, dict):
+        entries = list(fleet.items())
+    else:
+        entries = [entry.split("=", 1) if "=" in entry else (entry, entry) for entry in fleet]
+    return {name: parseAddress(address, default_port) for name, address in entries}
+
+
+def parseAddress(address, default_port):
+    if not isinstance(address, str):
+        host, port = address
+        return host, int(port)
+    host, _, port = address.rpartition(":")
+    if not host:
+        return address, default_port
+    return host, int(port)
@@ -0,0 +1,90 @@
+import array
+import atexit
+import struct
+
+# Flight recorder: keeps the last N frames of what the operator station did, so a robot that
+# misbehaved can be reconstructed afterwards (and replayed with replay.py).
+#
+# Each frame holds the time, the raw stick inputs (speed, strafe, turn), the four wheel
+# values from calculateMecanumWheel (lf, lb, rf, rb) and the payload bytes that went to
+# remap/the wire. Everything lives in preallocated arrays used as a ring buffer, so memory
+# is fixed and recording a frame is a handful of stores.
+
+Magic = b'FREC'
+FileVersion = 1
+FileHeader = struct.Struct('<4sBBI')  # magic, version, payload size, record count
+
+ValuesPerRecord = 8  # time, speed, strafe, turn, lf, lb, rf, rb
+
+
+class FlightRecorder:
+    def __init__(self, capacity, payload_size=4):
+        self.capacity = capacity
+        self.payload_size = payload_size
+        self.values = array.array('d', bytes(8 * ValuesPerRecord * capacity))
+        self.payloads = bytearray(payload_size * capacity)
+        self.index = 0  # slot the next record goes into
+        self.count = 0  # records held, at most capacity
+
+    # Size the buffer to hold `minutes` of recording at `rate` frames per second
+    @classmethod
+    def forDuration(cls, minutes, rate, payload_size=4):
+        return cls(int(minutes * 60 * rate), payload_size)
+
+    def record(self, t, speed, strafe, turn, lf, lb, rf, rb, payload):
+        i = self.index
+        values = self.values
+        base = i * ValuesPerRecord
+        values[base] = t
+        values[base + 1] = speed
+        values[base + 2] = strafe
+        values[base + 3] = turn
+        values[base + 4] = lf
+        values[base + 5] = lb
+        values[base + 6] = rf
+        values[base + 7] = rb
+        start = i * self.payload_size
+        self.payloads[start:start + self.payload_size] = payload
+
+        i += 1
+        self.index = 0 if i == self.capacity else i
+        if self.count < self.capacity:
+            self.count += 1
+
+    # Write the held records, oldest first, to a compact binary file
+    def dump(self, path):
+        first = (self.index - self.count) % self.capacity if self.capacity else 0
+        with open(path, 'wb') as out:
+            out.write(FileHeader.pack(Magic, FileVersion, self.payload_size, self.count))
+            # oldest part runs from `first` to the end of the buffer, the rest wraps to the start
+            if first + self.count <= self.capacity:
+                spans = ((first, first + self.count),)
+            else:
+                spans = ((first, self.capacity), (0, self.index))
+            for begin, end in spans:
+                out.write(memoryview(self.values)[begin * ValuesPerRecord:end * ValuesPerRecord].cast('B'))
+            for begin, end in spans:
+                out.write(self.payloads[begin * self.payload_size:end * self.payload_size])
+
+    # Dump to path when the program exits, including after an unhandled exception
+    def dumpAtExit(self, path):
+        atexit.register(self.dump, path)
+
+
+# Read a file written by FlightRecorder.dump.
+# Returns a list of (t, speed, strafe, turn, lf, lb, rf, rb, payload) tuples, oldest first.
+def loadRecording(path):
+    with open(path, 'rb') as source:
+        magic, version, payload_size, count = FileHeader.unpack(source.read(FileHeader.size))
+        if magic != Magic or version != FileVersion:
+            raise ValueError(f"{path} is not a flight recording")
+        values = array.array('d')
+        values.frombytes(source.read(8 * ValuesPerRecord * count))
+        payloads = source.read(payload_size * count)
+
+    records = []
+    for i in range(count):
+        base = i * ValuesPerRecord
+        records.append(tuple(values[base:base + ValuesPerRecord]) +
+                       (payloads[i * payload_size:(i + 1) * payload_size],))
+    return records
@@ -0,0 +1,227 @@
+import json
+import os
+import re
+import threading
+
+from ControllerReader import Axis, Button, ControllerReader, Hat, StateLayout
+from optional import lazyImport
+
+tomllib = lazyImport("tomllib")  # Python 3.11+, None before; imported once a .toml file is read
+difflib = lazyImport("difflib")  # only for the fuzzy match of unknown controller names
+
+# Controller mappings, loaded from data files instead of being hard-coded in the scripts.
+#
+# Every .json (or .toml, on Python 3.11+) file in the mappings directory describes one
+# controller:
+#   name     the name pygame reports for the pad, e.g. "Xbox One S Controller"
+#   aliases  other names the same pad is reported as (optional)
+#   guids    SDL GUIDs of the pad (optional), matched before any name
+#   default  true for the profile unknown pads get (at most one file)
+#   inputs   logical input -> ["Button", index] | ["Axis", index, sign] | ["Hat", index, part]
+#
+# A pad is matched by GUID, then by exact name, then by name ignoring case and punctuation,
+# then by the closest known name, and finally gets the default profile. The result is
+# remembered per pad name, so looking up a pad again is a dictionary hit.
+# watch() re-reads the files whenever one changes; a file with errors is reported and the
+# previous mappings stay in use.
+
+MappingsPath = os.path.join(os.path.dirname(os.path.abspath(__file__)), "mappings")
+MappingFileTypes = (".json", ".toml")
+
+# Logical inputs a mapping may define: everything a ControllerState holds, plus stick clicks
+LogicalInputs = frozenset(tag for _, tag in StateLayout) | {"LJ_IN", "RJ_IN"}
+
+FuzzyCutoff = 0.75  # how similar an unknown name must be to a known one to use its mapping
+
+
+class MappingError(ValueError):
+    pass
+
+
+# Lowercase words only, so "Xbox One S Controller" and "XBOX ONE-S controller" match
+def nameKey(name):
+    return " ".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+# Check one input source and return it as a tuple, the form ControllerReader expects
+def validateSource(path, logical, source):
+    if logical not in LogicalInputs:
+        raise MappingError(f"{path}: unknown input \"{logical}\", expected one of {', '.join(sorted(LogicalInputs))}")
+    if not isinstance(source, (list, tuple)) or not source:
+        raise MappingError(f"{path}: {logical} must be a list like [\"Button\", 0]")
+    kind = source[0]
+    lengths = {Button: 2, Axis: 3, Hat: 3}
+    if kind not in lengths:
+        raise MappingError(f"{path}: {logical} has unknown type \"{kind}\", expected Button, Axis or Hat")
+    if len(source) != lengths[kind]:
+        raise MappingError(f"{path}: {logical} must have {lengths[kind]} entries, got {list(source)}")
+    index = source[1]
+    if not isinstance(index, int) or isinstance(index, bool) or index < 0:
+        raise MappingError(f"{path}: {logical} index must be a whole number >= 0, got {index!r}")
+    if kind == Axis and source[2] not in (1, -1):
+        raise MappingError(f"{path}: {logical} axis sign must be 1 or -1, got {source[2]!r}")
+    if kind == Hat and source[2] not in (0, 1):
+        raise MappingError(f"{path}: {logical} hat part must be 0 (left/right) or 1 (up/down), got {source[2]!r}")
+    return tuple(source)
+
+
+# Read and validate one mapping file. Returns (profile dict, inputs dict).
+def loadMappingFile(path):
+    try:
+        if path.endswith(".toml"):
+            with open(path, "rb") as source:
+                profile = tomllib.load(source)
+        else:
+            with open(path) as source:
+                profile = json.load(source)
+    except (OSError, ValueError) as error:
+        raise MappingError(f"{path}: {error}") from error
+
+    if not isinstance(profile, dict) or not isinstance(profile.get("name"), str):
+        raise MappingError(f"{path}: needs a \"name\"")
+    inputs = profile.get("inputs")
+    if not isinstance(inputs, dict):
+        raise MappingError(f"{path}: needs an \"inputs\" table")
+    for field in ("aliases", "guids"):
+        values = profile.get(field, [])
+        if not isinstance(values, list) or not all(isinstance(value, str) for value in values):
+            raise MappingError(f"{path}: \"{field}\" must be a list of strings")
+    return profile, {logical: validateSource(path, logical, source) for logical, source in inputs.items()}
+
+
+# Everything lookup() needs, built in one go and swapped in as a whole
+class MappingIndex:
+    def __init__(self, files):
+        self.profiles = {}  # profile name -> inputs
+        self.sources = {}  # profile name -> file it was loaded from
+        self.by_guid = {}
+        self.by_key = {}  # nameKey of every name and alias -> profile name
+        self.default = None  # profile name for unknown pads
+        self.matches = {}  # (pad name, GUID) -> profile name, filled as pads are looked up
+
+        for path, (profile, inputs) in files:
+            name = profile["name"]
+            if name in self.profiles:
+                raise MappingError(f"{path}: \"{name}\" is already defined in {self.sources[name]}")
+            self.profiles[name] = inputs
+            self.sources[name] = path
+            for guid in profile.get("guids", []):
+                self.by_guid[guid.lower()] = name
+            for alias in [name] + profile.get("aliases", []):
+                self.by_key[nameKey(alias)] = name
+            if profile.get("default"):
+                if self.default is not None:
+                    raise MappingError(f"{path}: \"{self.default}\" is already the default profile")
+                self.default = name
+
+    def match(self, name, guid):
+        if guid is not None and guid.lower() in self.by_guid:
+            return self.by_guid[guid.lower()]
+        if name in self.profiles:
+            return name
+        key = nameKey(name)
+        if key in self.by_key:
+            return self.by_key[key]
+        # a known name contained in this one, e.g. "Nintendo Switch Pro Controller (USB)"
+        words = set(key.split())
+        contained = [known for known in self.by_key if set(known.split()) <= words]
+        if contained:
+            return self.by_key[max(contained, key=len)]
+        close = difflib.get_close_matches(key, self.by_key, n=1, cutoff=FuzzyCutoff)
+        if close:
+            return self.by_key[close[0]]
+        return self.default
+
+
+class MappingRegistry:
+    def __init__(self, path=MappingsPath):
+        self.path = path
+        self.index = MappingIndex(self.readFiles())
+        self.version = 0  # bumped on every successful reload
+        self.signature = self.fileSignature()
+        self.stopped = threading.Event()
+        self.thread = None
+
+    def mappingFiles(self):
+        names = sorted(os.listdir(self.path))
+        files = [os.path.join(self.path, name) for name in names if name.endswith(MappingFileTypes)]
+        if tomllib is None:
+            files = [path for path in files if not path.endswith(".toml")]
+        return files
+
+    def readFiles(self):
+        return [(path, loadMappingFile(path)) for path in self.mappingFiles()]
+
+    # Changes whenever a mapping file is added, removed or edited
+    def fileSignature(self):
+        signature = []
+        for path in self.mappingFiles():
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    # Re-read every file. Raises MappingError and keeps the current mappings if one is invalid.
+    def reload(self):
+        self.index = MappingIndex(self.readFiles())
+        self.version += 1
+
+    # Profile for a pad: (profile name or None, inputs). Pads without any match, and no
+    # default profile, get an empty mapping, so all their inputs read as 0.
+    def lookup(self, name, guid=None):
+        index = self.index  # one read, so a reload in between cannot mix two versions
+        profile = index.matches.get((name, guid), False)
+        if profile is False:
+            profile = index.matches[(name, guid)] = index.match(name, guid)
+        return profile, index.profiles.get(profile, {})
+
+    # Compiled reader for a newly connected pygame joystick
+    def reader(self, joystick):
+        name = joystick.get_name()
+        get_guid = getattr(joystick, "get_guid", None)
+        profile, inputs = self.lookup(name, get_guid() if get_guid is not None else None)
+        if profile is None:
+            print(f"No mapping for \"{name}\", inputs will read as 0")
+        elif profile != name:
+            print(f"No mapping for \"{name}\", using \"{profile}\"")
+        return ControllerReader(joystick, inputs)
+
+    # Check the mapping files for changes every interval seconds from a background thread
+    def watch(self, interval=1.0):
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, args=(interval,), name="MappingRegistry", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+
+    def run(self, interval):
+        while not self.stopped.wait(interval):
+            try:
+                signature = self.fileSignature()
+            except OSError:
+                continue
+            if signature == self.signature:
+                continue
+            self.signature = signature
+            try:
+                self.reload()
+            except MappingError as error:
+                print(f"controller mappings not reloaded: {error}")
+                continue
+            print("controller mappings reloaded")
+
+
+DefaultRegistry = None
+
+
+# The registry for the mappings directory next to this file, loaded on first use
+def defaultRegistry():
+    global DefaultRegistry
+    if DefaultRegistry is None:
+        DefaultRegistry = MappingRegistry()
+    return DefaultRegistry
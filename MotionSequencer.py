@@ -0,0 +1,155 @@
+import time
+
+from mecanum import mecanumWheel
+from protocol import FrameEncoder, MsgDrive
+from quantize import MotorEncoder
+
+# Runs autonomous motion plans and turns them into the same MsgDrive frames
+# operator_control.py sends, so testcontrol.py (or the robot) cannot tell the two apart.
+#
+# A plan is a list of steps. Move holds a (speed, strafe, turn) command for a time;
+# WaitUntil holds one until a condition is true (or a timeout passes). drive(), strafe(),
+# turn() and wait() build the common Moves.
+#
+# Frames go out at a fixed tick rate. Every tick and every step boundary has a deadline on
+# the monotonic clock, computed from the plan rather than from when the previous tick
+# happened to run, so late ticks never push the rest of the plan back: a 2 s drive ends
+# 2 s after it started whatever the scheduling jitter. How late each tick ran is tracked.
+#
+# With a VirtualClock the sequencer never sleeps: a plan runs as fast as the frames can be
+# produced, with the same frames and step times as in real time (dry run).
+
+
+class Move:
+    def __init__(self, speed=0.0, strafe=0.0, turn=0.0, duration=0.0, name=None):
+        self.speed = speed
+        self.strafe = strafe
+        self.turn = turn
+        self.duration = duration
+        self.name = name or f"move {speed:+.2f}/{strafe:+.2f}/{turn:+.2f} for {duration:g} s"
+
+    # True once the step is over; elapsed is the plan time since the step started
+    def done(self, elapsed, now):
+        return elapsed >= self.duration - 1e-9  # elapsed is a whole number of ticks
+
+
+# condition(now) is checked every tick; the step ends on the first tick it returns True.
+# timeout: end the step anyway after this many seconds, None to wait forever.
+class WaitUntil:
+    def __init__(self, condition, timeout=None, speed=0.0, strafe=0.0, turn=0.0, name="wait until"):
+        self.condition = condition
+        self.timeout = timeout
+        self.speed = speed
+        self.strafe = strafe
+        self.turn = turn
+        self.name = name
+        self.timed_out = False
+
+    def done(self, elapsed, now):
+        if self.condition(now):
+            return True
+        if self.timeout is not None and elapsed >= self.timeout:
+            self.timed_out = True
+            return True
+        return False
+
+
+def drive(power, seconds):
+    return Move(speed=power, duration=seconds, name=f"drive {power:+.2f} for {seconds:g} s")
+
+
+def strafe(power, seconds):
+    return Move(strafe=power, duration=seconds, name=f"strafe {power:+.2f} for {seconds:g} s")
+
+
+def turn(power, seconds):
+    return Move(turn=power, duration=seconds, name=f"turn {power:+.2f} for {seconds:g} s")
+
+
+def wait(seconds):
+    return Move(duration=seconds, name=f"wait {seconds:g} s")
+
+
+# Condition for WaitUntil: a tracked object (see FieldObjectTracker.py) named name is
+# within distance, and was seen in the last max_age seconds
+def objectInRange(tracker, name, distance, max_age=0.5):
+    def condition(now):
+        object_id = tracker.nearest(name, max_age=max_age, now=now)
+        return object_id is not None and tracker.distance(object_id) <= distance
+    return condition
+
+
+# Clock for dry runs: sleep() moves time forward instead of waiting
+class VirtualClock:
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.now += seconds
+
+
+# send: called with each encoded frame (e.g. a transport's send); the frame's buffer is
+# reused, so a sink that keeps frames has to copy them
+# tick_rate: frames per second
+# maxspeed: scale factor for motor outputs, as in operator_control.py
+class MotionSequencer:
+    def __init__(self, send, tick_rate=50.0, maxspeed=0.8, clock=time.monotonic, sleep=time.sleep):
+        self.send = send
+        self.interval = 1.0 / tick_rate
+        self.maxspeed = maxspeed
+        self.clock = clock
+        self.sleep = sleep
+        self.encoder = FrameEncoder(clock=lambda: int(self.clock() * 1e9))
+        self.motor_encoder = MotorEncoder()
+
+        self.ticks = 0
+        self.ticks_skipped = 0  # ticks that were already over when their turn came
+        self.max_lateness = 0.0  # seconds the latest tick ran after its deadline
+        self.total_lateness = 0.0
+        self.steps = []  # (step name, planned start, actual start) of the last run()
+
+    # Encode and send the motor bytes for one command. Positive speed is forward, as pushing the
+    # stick forward in operator_control.py: the pad's forward axis reads negative there, so the
+    # kinematics get speed with its sign flipped.
+    def command(self, speed, strafe, turn):
+        wheels = mecanumWheel(-speed, strafe, turn, 0, self.maxspeed)
+        self.send(self.encoder.encode(MsgDrive, self.motor_encoder.encode(*wheels)))
+
+    # Run every step of plan, then stop the motors. Returns the plan time it took.
+    # Tick n is due at start + n * interval; a step ends on the first tick it is done.
+    def run(self, plan):
+        self.steps = []
+        start = self.clock()
+        tick = self.waitFor(start, 0)
+        for step in plan:
+            step_tick = tick
+            self.steps.append((step.name, step_tick * self.interval, self.clock() - start))
+            while not step.done((tick - step_tick) * self.interval, start + tick * self.interval):
+                self.command(step.speed, step.strafe, step.turn)
+                tick = self.waitFor(start, tick + 1)
+        self.command(0.0, 0.0, 0.0)
+        return tick * self.interval
+
+    # Sleep until tick is due. Returns the tick to run now: tick itself, or, when more than a
+    # whole tick was missed, the latest tick that is already due.
+    def waitFor(self, start, tick):
+        deadline = start + tick * self.interval
+        now = self.clock()
+        if now < deadline:
+            self.sleep(deadline - now)
+            now = self.clock()
+        late = now - deadline
+        if late >= self.interval:
+            missed = int(late / self.interval)
+            self.ticks_skipped += missed
+            tick += missed
+            late -= missed * self.interval
+        self.ticks += 1
+        self.total_lateness += late
+        if late > self.max_lateness:
+            self.max_lateness = late
+        return tick
@@ -22,3 +22,16 @@ class MotorControlWatcher:
         self.rf_value = rf_new_value
         self.rb_value = rb_new_value
     
+
+
+# Same idea as MotorControlWatcher, but over a whole packed frame (wheel bytes, buttons,
+# triggers and D-pad), so any input that ends up on the wire counts as a change.
+class FrameWatcher:
+    def __init__(self):
+        self.frame = None
+        self.observer = False
+
+    def notify(self, new_frame):
+        # Set observer to True when the frame differs from the last one seen
+        self.observer = new_frame != self.frame
+        self.frame = bytes(new_frame)
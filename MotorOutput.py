@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+
+# Motor output stage for the robot server: the motor bytes of every frame go to the
+# Roboclaw controllers over serial ports.
+#
+# Each port is owned by a SerialWriter with its own thread, so a UART that stalls only
+# delays its own motors; the network loop and the other ports carry on. The bytes a frame
+# has for one port are written with a single write() call, and if a port falls behind,
+# frames that were replaced before it got to them are dropped: only the newest command
+# matters, never a backlog.
+
+Slots = ("rb", "rf", "lb", "lf")  # order of the motor bytes in a frame
+
+# (serial device, motor bytes in the order they are written) for the robot's wiring
+MotorPorts = (
+    ("/dev/serial0", ("rb", "rf")),
+    ("/dev/ttyAMA2", ("lf", "lb")),
+)
+
+
+# Writes the newest data handed to submit() to one port, from a dedicated thread.
+# port is anything with write(): a serial.Serial, or the loopback from openLoopback().
+class SerialWriter:
+    def __init__(self, port, size, name="port"):
+        self.port = port
+        self.name = name
+        self.pending = bytearray(size)  # newest data, filled by submit()
+        self.writing = bytearray(size)  # data the thread is writing, swapped with pending
+        self.has_pending = False
+
+        self.writes = 0
+        self.frames_dropped = 0  # frames replaced before they could be written
+        self.errors = 0
+        self.max_write_time = 0.0
+        self.recent_write_time = 0.0  # slowest write since the last takeWriteTime()
+        self.write_started = None  # time.monotonic() of the write in progress
+
+        self.condition = threading.Condition()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name=f"SerialWriter {self.name}", daemon=True)
+        self.thread.start()
+
+    # Stop after writing whatever is still pending, waiting at most timeout seconds for a
+    # stalled port
+    def stop(self, timeout=None):
+        with self.condition:
+            self.running = False
+            self.condition.notify()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    # Replace the data to write with values (one int per byte). Never blocks on the port.
+    def submit(self, values):
+        with self.condition:
+            if self.has_pending:
+                self.frames_dropped += 1
+            self.pending[:] = values
+            self.has_pending = True
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.has_pending and self.running:
+                    self.condition.wait()
+                if not self.has_pending:
+                    return
+                self.pending, self.writing = self.writing, self.pending
+                self.has_pending = False
+
+            start = time.monotonic()
+            self.write_started = start
+            try:
+                data = memoryview(self.writing)
+                while data:
+                    written = self.port.write(data)
+                    data = data[written if written is not None else len(data):]
+            except OSError as error:
+                # keep serving: the next frame is tried again, a stall is not a crash
+                self.errors += 1
+                if self.errors == 1:
+                    print(f"{self.name}: write failed: {error}")
+                continue
+            finally:
+                self.write_started = None
+            elapsed = time.monotonic() - start
+            if elapsed > self.max_write_time:
+                self.max_write_time = elapsed
+            if elapsed > self.recent_write_time:
+                self.recent_write_time = elapsed
+            self.writes += 1
+
+    # Slowest write since the previous call, counting a write still in progress (a stalled
+    # port) by how long it has taken so far
+    def takeWriteTime(self):
+        slowest, self.recent_write_time = self.recent_write_time, 0.0
+        started = self.write_started
+        if started is not None:
+            slowest = max(slowest, time.monotonic() - started)
+        return slowest
+
+
+# Routes the motor bytes of each frame to the SerialWriter of every port.
+# routes: [(port, name, slot names in write order)], see MotorPorts and open().
+class MotorOutput:
+    def __init__(self, routes):
+        self.writers = []
+        for port, name, slots in routes:
+            indexes = tuple(Slots.index(slot) for slot in slots)
+            self.writers.append((SerialWriter(port, len(indexes), name), indexes))
+
+    # Open the serial devices with pyserial (only needed when real ports are used)
+    @classmethod
+    def open(cls, ports=MotorPorts, baudrate=115200, write_timeout=0.5):
+        import serial  # pyserial; the loopback and the rest of the server work without it
+        return cls([(serial.Serial(device, baudrate, timeout=1, write_timeout=write_timeout), device, slots)
+                    for device, slots in ports])
+
+    def start(self):
+        for writer, _ in self.writers:
+            writer.start()
+
+    def stop(self, timeout=1.0):
+        for writer, _ in self.writers:
+            writer.stop(timeout)
+            close = getattr(writer.port, "close", None)
+            if close is not None:
+                close()
+
+    def apply(self, rb, rf, lb, lf):
+        values = (rb, rf, lb, lf)
+        for writer, indexes in self.writers:
+            writer.submit([values[index] for index in indexes])
+
+    # Slowest write of any port since the previous call (for telemetry)
+    def takeWriteTime(self):
+        return max((writer.takeWriteTime() for writer, _ in self.writers), default=0.0)
+
+
+# Pseudo-terminal pair standing in for a serial port, for running without hardware.
+# Returns (port, reader_fd): writes to port can be read back from reader_fd with os.read.
+# A reader that stops reading makes the port stall once the terminal buffer is full, the
+# same way a UART that cannot keep up does.
+def openLoopback():
+    import pty, tty  # Unix only
+    reader_fd, port_fd = pty.openpty()
+    tty.setraw(port_fd)
+    tty.setraw(reader_fd)
+    return os.fdopen(port_fd, "wb", buffering=0), reader_fd
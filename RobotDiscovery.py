@@ -0,0 +1,300 @@
+import math
+import os
+import platform
+import re
+import socket
+import struct
+import subprocess
+import threading
+import time
+import uuid
+
+# Finds the robot's IP address from its MAC address without blocking the operator station.
+#
+# On Linux the kernel's ARP table is read straight from /proc/net/arp (a few microseconds)
+# instead of spawning `arp -a`; other systems fall back to the arp command, run at most every
+# few seconds. Results are kept
+# in a cache with a time to live, and a background thread refreshes it, so lookup() answers
+# from memory and a robot that got a new DHCP address is picked up on the next reconnect.
+#
+# The ARP table only knows hosts this machine has talked to recently. The optional beacon
+# fills that gap: a UDP broadcast query on DiscoveryPort that testcontrol.py answers with
+# its MAC address and control port.
+
+ArpPath = "/proc/net/arp"
+ArpComplete = 0x2  # ATF_COM: the entry has a resolved hardware address
+
+DiscoveryPort = 9998
+BeaconQuery = struct.Struct('!4s6s')  # magic, wanted MAC (all zeros: any robot)
+BeaconReply = struct.Struct('!4s6sH')  # magic, robot MAC, robot control port
+QueryMagic = b'MRDQ'
+ReplyMagic = b'MRDR'
+AnyMac = bytes(6)
+
+IpPattern = re.compile(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})')
+MacPattern = re.compile(r'([0-9A-Fa-f]{1,2}[:-]){5}[0-9A-Fa-f]{1,2}')
+
+
+# Canonical form of a MAC address: lowercase, colon separated, two digits per byte.
+# Accepts the dash form Windows prints and the unpadded form macOS prints.
+def normalizeMac(mac):
+    return ":".join(f"{int(part, 16):02x}" for part in re.split(r'[:-]', mac))
+
+
+def macToBytes(mac):
+    return bytes(int(part, 16) for part in normalizeMac(mac).split(":"))
+
+
+def bytesToMac(raw):
+    return ":".join(f"{byte:02x}" for byte in raw)
+
+
+# (MAC address, IP address) of every resolved entry in the ARP table, in table order
+def readArpRows(path=ArpPath):
+    try:
+        with open(path) as table:
+            lines = table.read().splitlines()[1:]  # skip the column header
+    except OSError:
+        return readArpCommandRows()
+
+    rows = []
+    for line in lines:
+        fields = line.split()
+        # IP address, HW type, Flags, HW address, Mask, Device
+        if len(fields) >= 4 and int(fields[2], 16) & ArpComplete:
+            rows.append((normalizeMac(fields[3]), fields[0]))
+    return rows
+
+
+# Same as readArpRows for systems without /proc, by parsing the output of `arp -a`
+def readArpCommandRows():
+    try:
+        output = subprocess.check_output(['arp', '-a'], text=True)
+    except (OSError, subprocess.CalledProcessError):
+        return []
+
+    rows = []
+    for line in output.splitlines():
+        mac = MacPattern.search(line)
+        ip_address = IpPattern.search(line)
+        if mac and ip_address:
+            rows.append((normalizeMac(mac.group(0)), ip_address.group(0)))
+    return rows
+
+
+# MAC address -> IP address for every resolved entry in the ARP table. The table says nothing
+# about which of several addresses of one MAC is current (an old DHCP lease stays listed as
+# complete next to the new one), so this takes the first; RobotDiscovery keeps track of when
+# each address appeared and prefers the newest.
+def readArpTable(path=ArpPath):
+    entries = {}
+    for mac, ip_address in readArpRows(path):
+        entries.setdefault(mac, ip_address)
+    return entries
+
+
+# readArpTable from the output of `arp -a`
+def readArpCommand():
+    entries = {}
+    for mac, ip_address in readArpCommandRows():
+        entries.setdefault(mac, ip_address)
+    return entries
+
+
+# MAC addresses of this machine's network interfaces, used by the robot to answer beacons
+def localMacs():
+    macs = set()
+    if platform.system() == "Linux":
+        try:
+            for interface in os.listdir("/sys/class/net"):
+                with open(f"/sys/class/net/{interface}/address") as address:
+                    mac = address.read().strip()
+                if mac and mac != "00:00:00:00:00:00":
+                    macs.add(normalizeMac(mac))
+        except OSError:
+            pass
+    if not macs:
+        node = uuid.getnode()
+        macs.add(bytesToMac(node.to_bytes(6, "big")))
+    return macs
+
+
+# Answer to a beacon query, or None when the query is not for this robot
+def beaconReply(data, macs, port):
+    if len(data) != BeaconQuery.size:
+        return None
+    magic, wanted = BeaconQuery.unpack(data)
+    if magic != QueryMagic:
+        return None
+    if wanted == AnyMac:
+        mac = sorted(macs)[0]
+    else:
+        mac = bytesToMac(wanted)
+        if mac not in macs:
+            return None
+    return BeaconReply.pack(ReplyMagic, macToBytes(mac), port)
+
+
+# ttl: how long a cached address is trusted without being seen again
+# refresh_interval: how often the background thread re-reads the ARP table (and beacons)
+# arp_command_interval: without /proc/net/arp, the least time between runs of `arp -a`
+# beacon_port: send beacon queries to this UDP port, None to only use the ARP table
+class RobotDiscovery:
+    def __init__(self, ttl=10.0, refresh_interval=1.0, beacon_port=None, broadcast="<broadcast>",
+                 clock=time.monotonic, arp_command_interval=5.0, arp_path=ArpPath):
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self.arp_path = arp_path
+        self.arp_command = not os.path.exists(arp_path)  # every read spawns a process
+        self.arp_command_interval = arp_command_interval
+        self.last_arp_read = None
+        self.beacon_port = beacon_port
+        self.broadcast = broadcast
+        self.clock = clock
+
+        self.cache = {}  # MAC -> (IP address, time last seen in the ARP table)
+        self.first_seen = {}  # (MAC, IP address) -> when that ARP row first appeared, -inf once it failed
+        self.beacons = {}  # MAC -> (IP address, time of the reply, control port) from beacon replies
+        self.wanted = set()  # MACs lookup() has been asked for, beaconed for specifically
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread = None
+        self.sock = None
+
+    def start(self):
+        if self.beacon_port is not None:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            self.sock.settimeout(self.refresh_interval)
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, name="RobotDiscovery", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+    # IP address of the robot with this MAC, or None when it has not been seen.
+    # Answers from the cache; only an unknown or expired entry reads the ARP table.
+    # A beacon reply wins over the ARP table, which can still list an old DHCP address.
+    def lookup(self, mac):
+        mac = normalizeMac(mac)
+        with self.lock:
+            self.wanted.add(mac)
+        ip_address = self.cached(mac)
+        if ip_address is None:
+            self.refreshArp()
+            ip_address = self.cached(mac)
+        return ip_address
+
+    def cached(self, mac):
+        now = self.clock()
+        with self.lock:
+            for entry in (self.beacons.get(mac), self.cache.get(mac)):
+                if entry is not None and now - entry[1] <= self.ttl:
+                    return entry[0]
+        return None
+
+    # Function for ConnectionManager(resolve=...): the robot's current (IP address, port),
+    # or None while it has not been found. The port is the one the robot advertised in its
+    # beacon reply; port is used when only the ARP table knows the robot.
+    def resolver(self, mac, port):
+        def resolve():
+            ip_address = self.lookup(mac)
+            if ip_address is None:
+                return None
+            return ip_address, self.advertisedPort(mac) or port
+        return resolve
+
+    # Control port from the robot's latest beacon reply, or None when there is no fresh one
+    def advertisedPort(self, mac):
+        mac = normalizeMac(mac)
+        now = self.clock()
+        with self.lock:
+            entry = self.beacons.get(mac)
+        if entry is None or now - entry[1] > self.ttl:
+            return None
+        return entry[2]
+
+    # Function for ConnectionManager(unreachable=...): forget where mac was thought to be once
+    # a connect to that address failed
+    def invalidator(self, mac):
+        return lambda address: self.invalidate(mac, address[0])
+
+    # Forget the address of mac (only ip_address, if given), e.g. after it stopped answering.
+    # An ARP row with that address loses to any other address listed for mac from then on.
+    def invalidate(self, mac, ip_address=None):
+        mac = normalizeMac(mac)
+        with self.lock:
+            for entries in (self.cache, self.beacons):
+                entry = entries.get(mac)
+                if entry is not None and ip_address in (None, entry[0]):
+                    del entries[mac]
+            for key in self.first_seen:
+                if key[0] == mac and ip_address in (None, key[1]):
+                    self.first_seen[key] = -math.inf
+
+    # Where a MAC is listed with several addresses, the one that appeared last wins
+    # (on the first read, the first row). Without /proc the arp command runs at most every
+    # arp_command_interval seconds, however often lookups miss.
+    def refreshArp(self):
+        now = self.clock()
+        if self.arp_command and self.last_arp_read is not None and \
+                now - self.last_arp_read < self.arp_command_interval:
+            return
+        self.last_arp_read = now
+        rows = readArpRows(self.arp_path)
+        with self.lock:
+            self.first_seen = {row: self.first_seen.get(row, now) for row in rows}
+            newest = {}
+            for (mac, ip_address), first in self.first_seen.items():
+                if mac not in newest or first > newest[mac][1]:
+                    newest[mac] = (ip_address, first)
+            for mac, (ip_address, _) in newest.items():
+                self.cache[mac] = (ip_address, now)
+
+    def sendBeacon(self):
+        with self.lock:
+            wanted = [macToBytes(mac) for mac in self.wanted] or [AnyMac]
+        for mac in wanted:
+            try:
+                self.sock.sendto(BeaconQuery.pack(QueryMagic, mac), (self.broadcast, self.beacon_port))
+            except OSError:
+                pass  # no network yet, try again next round
+
+    # Collect beacon replies until the next refresh is due
+    def receiveReplies(self, deadline):
+        while not self.stopped.is_set():
+            remaining = deadline - self.clock()
+            if remaining <= 0:
+                return
+            self.sock.settimeout(remaining)
+            try:
+                data, (ip_address, _) = self.sock.recvfrom(64)
+            except socket.timeout:
+                return
+            except OSError:
+                self.stopped.wait(remaining)
+                return
+            if len(data) != BeaconReply.size:
+                continue
+            magic, mac, port = BeaconReply.unpack(data)
+            if magic != ReplyMagic:
+                continue
+            mac = bytesToMac(mac)
+            with self.lock:
+                self.beacons[mac] = (ip_address, self.clock(), port)
+
+    def run(self):
+        while not self.stopped.is_set():
+            deadline = self.clock() + self.refresh_interval
+            self.refreshArp()
+            if self.sock is not None:
+                self.sendBeacon()
+                self.receiveReplies(deadline)
+            else:
+                self.stopped.wait(self.refresh_interval)
@@ -0,0 +1,145 @@
+import array
+import threading
+import time
+from bisect import bisect_left
+
+# Per-stage timing for the control loops and the robot server.
+#
+# Every stage records its durations into a fixed-size histogram with logarithmic buckets
+# (8 per doubling, 1 us to 100 s), so recording is a bisect and an array increment, memory
+# never grows, and percentiles come out within about 9% of the true value.
+# The loop calls lap(stage) after each stage; maybeReport() prints a table of the last
+# `interval` seconds and starts a new window. serve(port) makes the last table available as
+# JSON on http://127.0.0.1:port/ for dashboards or scripts.
+#
+# Turned off, the instrumentation is a single `if stats is not None` per stage in the loop.
+
+BucketsPerDoubling = 8
+Bounds = tuple(1e-6 * 2 ** (i / BucketsPerDoubling) for i in range(27 * BucketsPerDoubling + 1))  # up to ~134 s
+Percentiles = (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("p999", 0.999))
+
+
+class Histogram:
+    def __init__(self):
+        self.counts = array.array('Q', bytes(8 * (len(Bounds) + 1)))  # last slot: above Bounds[-1]
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def record(self, seconds):
+        self.counts[bisect_left(Bounds, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    # Upper edge of the bucket holding the given fraction of samples (never above the maximum)
+    def percentile(self, fraction):
+        if not self.count:
+            return 0.0
+        wanted = fraction * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= wanted and count:
+                return min(Bounds[index], self.max) if index < len(Bounds) else self.max
+        return self.max
+
+    # count, mean, percentiles and max, times in milliseconds
+    def summary(self):
+        summary = {"count": self.count, "mean": self.total / self.count * 1e3 if self.count else 0.0}
+        for name, fraction in Percentiles:
+            summary[name] = self.percentile(fraction) * 1e3
+        summary["max"] = self.max * 1e3
+        return summary
+
+
+class StageTimers:
+    def __init__(self, interval=10.0, clock=time.perf_counter):
+        self.interval = interval  # seconds per reporting window, 0 to never print
+        self.clock = clock
+        self.histograms = {}  # stage -> Histogram for the current window
+        self.last = clock()
+        self.window_start = clock()
+        self.latest = {}  # summary of the last completed window, served by serve()
+        self.server = None
+
+    # Start timing a new iteration (the next lap measures from here)
+    def start(self):
+        self.last = self.clock()
+
+    # Record the time since the previous start()/lap() as stage.
+    # Histogram.record is written out here: lap() runs several times per loop iteration.
+    def lap(self, stage):
+        now = self.clock()
+        seconds = now - self.last
+        self.last = now
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.counts[bisect_left(Bounds, seconds)] += 1
+        histogram.count += 1
+        histogram.total += seconds
+        if seconds > histogram.max:
+            histogram.max = seconds
+
+    def record(self, stage, seconds):
+        histogram = self.histograms.get(stage)
+        if histogram is None:
+            histogram = self.histograms[stage] = Histogram()
+        histogram.record(seconds)
+
+    # stage -> summary dict for the current window
+    def summary(self):
+        return {stage: histogram.summary() for stage, histogram in self.histograms.items()}
+
+    # Print the window's table and start a new window once `interval` seconds have passed
+    def maybeReport(self):
+        now = self.clock()
+        if not self.interval or now - self.window_start < self.interval:
+            return
+        self.latest = {"window": now - self.window_start, "stages": self.summary()}
+        self.histograms = {}
+        self.window_start = now
+        print(self.report(self.latest))
+
+    @staticmethod
+    def report(latest):
+        width = max([14] + [len(stage) for stage in latest["stages"]])
+        lines = [f"timing over the last {latest['window']:.1f} s (ms):",
+                 f"  {'stage':{width}s} {'count':>8s} {'mean':>8s} " +
+                 " ".join(f"{name:>8s}" for name, _ in Percentiles) + f" {'max':>8s}"]
+        for stage, summary in latest["stages"].items():
+            lines.append(f"  {stage:{width}s} {summary['count']:8d} {summary['mean']:8.3f} " +
+                         " ".join(f"{summary[name]:8.3f}" for name, _ in Percentiles) +
+                         f" {summary['max']:8.3f}")
+        return "\n".join(lines)
+
+    # Serve the last completed window as JSON on http://host:port/ from a background thread
+    def serve(self, port, host="127.0.0.1"):
+        import json
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer  # lazy: most runs never serve
+
+        timers = self
+
+        class StatsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = json.dumps(timers.latest).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # keep the console for the dashboard
+
+        self.server = ThreadingHTTPServer((host, port), StatsHandler)
+        threading.Thread(target=self.server.serve_forever, name="StageTimers", daemon=True).start()
+        return self.server
+
+    def stop(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
@@ -0,0 +1,87 @@
+import collections
+import threading
+import time
+
+from protocol import (Header, MsgTelemetry, Payloads, ProtocolError, SequenceTracker, TelemetryIdle, TelemetryRamping,
+                      decodeHeader)
+
+# Operator side of the telemetry back-channel: MsgTelemetry frames the robot server sends to
+# its driver (see protocol.py and RobotServer.telemetry in testcontrol.py).
+#
+# The thread that owns the connection calls feed() with whatever bytes arrived; frames may be
+# split across reads. Decoded samples go into a bounded buffer: when the consumer (the control
+# loop, a dashboard, a logger) falls behind, the oldest samples are dropped, so feed() never
+# waits for the consumer and a slow consumer never holds up the connection that carries the
+# motor commands. The consumer calls take() for everything buffered, or reads `latest`.
+#
+# A sample is (time.monotonic() when it arrived, rb, rf, lb, lf, flags, frame age in us,
+# driver frames per second, frames not applied, motor write time in us).
+
+Telemetry = Payloads[MsgTelemetry]
+
+
+class TelemetryReceiver:
+    def __init__(self, capacity=64):
+        self.samples = collections.deque(maxlen=capacity)
+        self.lock = threading.Lock()
+        self.latest = None  # newest sample, also while it is still buffered
+        self.received = 0
+        self.dropped = 0  # samples pushed out of the buffer before take() got them
+        self.errors = 0
+        self.sequences = SequenceTracker()
+        self.partial = bytearray()  # start of a frame cut off at the end of a read
+
+    # A new connection: bytes left over from the old one belong to no frame
+    def reset(self):
+        self.partial.clear()
+        self.sequences = SequenceTracker()
+
+    def feed(self, data):
+        if self.partial:
+            self.partial += data
+            data = self.partial
+        view = memoryview(data)
+        end = len(view)
+        offset = 0
+        now = time.monotonic()
+        try:
+            while end - offset >= Header.size:
+                msg_type, length, sequence, timestamp = decodeHeader(view, offset)
+                frame_end = offset + Header.size + length
+                if frame_end > end:
+                    break
+                if msg_type == MsgTelemetry and length == Telemetry.size and self.sequences.accept(sequence):
+                    self.push((now,) + Telemetry.unpack_from(view, offset + Header.size))
+                offset = frame_end
+        except ProtocolError:
+            self.errors += 1  # out of step with the stream; start over with the next read
+            offset = end
+        tail = bytes(view[offset:end])
+        view.release()
+        self.partial[:] = tail
+
+    def push(self, sample):
+        with self.lock:
+            if len(self.samples) == self.samples.maxlen:
+                self.dropped += 1
+            self.samples.append(sample)
+            self.received += 1
+        self.latest = sample
+
+    # Every buffered sample, oldest first, emptying the buffer. Never waits on the connection.
+    def take(self):
+        with self.lock:
+            samples = list(self.samples)
+            self.samples.clear()
+        return samples
+
+
+# One line of what the robot reports (a sample, or None before the first), for the dashboards
+def renderTelemetry(sample):
+    if sample is None:
+        return "Robot: no telemetry"
+    received, rb, rf, lb, lf, flags, age, rate, not_applied, write_time = sample
+    state = " IDLE" if flags & TelemetryIdle else " RAMPING DOWN" if flags & TelemetryRamping else ""
+    return (f"Robot: motors {rb:3d} {rf:3d} {lb:3d} {lf:3d}  last frame {age / 1000:.0f} ms ago  {rate} frames/s  "
+            f"{not_applied} not applied  motor write {write_time / 1000:.1f} ms"
+            f"  ({time.monotonic() - received:.1f} s old){state}")
@@ -0,0 +1,48 @@
+import time
+
+
+# Decides when the control loop puts a frame on the wire.
+# A frame is sent right away when the watcher reports a change. While nothing changes, the
+# last frame is repeated at keepalive_rate so the robot knows the operator is still there.
+# max_rate caps how often changes are sent while a stick is moving continuously; a change
+# that arrives too early is held and sent as soon as the cap allows.
+class TransmitScheduler:
+    def __init__(self, send, watcher, keepalive_rate=5.0, max_rate=250.0, clock=time.monotonic):
+        self.send = send
+        self.watcher = watcher
+        self.keepalive_interval = 1.0 / keepalive_rate
+        self.min_interval = 1.0 / max_rate if max_rate else 0.0
+        self.clock = clock
+
+        self.last_send = None
+        self.pending = False  # a change was seen but not sent yet
+        self.frames_sent = 0
+
+    # Hand the scheduler the current frame; it is sent if it changed or a keepalive is due.
+    # Returns True when the frame was sent.
+    def offer(self, frame):
+        self.watcher.notify(frame)
+        if self.watcher.observer:
+            self.pending = True
+
+        now = self.clock()
+        if self.last_send is not None:
+            elapsed = now - self.last_send
+            if self.pending and elapsed < self.min_interval:
+                return False
+            if not self.pending and elapsed < self.keepalive_interval:
+                return False
+
+        self.send(frame)
+        self.last_send = now
+        self.pending = False
+        self.frames_sent += 1
+        return True
+
+    # Seconds until the scheduler next needs offer() to be called, even without new input.
+    # Used as the timeout when the control loop waits for input events.
+    def timeout(self):
+        if self.last_send is None:
+            return 0.0
+        interval = self.min_interval if self.pending else self.keepalive_interval
+        return max(0.0, self.last_send + interval - self.clock())
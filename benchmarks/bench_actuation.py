@@ -0,0 +1,152 @@
+# Robot-side command store and fixed-rate actuation loop vs. writing each frame to the
+# motors when it arrives.
+#   1. Simulated Wi-Fi (virtual clock): frames sent at 50 Hz arrive with jitter and
+#      occasional stalls. Motor update intervals, and how far the motor bytes are from
+#      what the driver commanded at that moment, for direct writes, hold and extrapolation.
+#   2. Link lost: how long until the motors are at rest, watchdog vs. deadman ramp.
+#   3. The real actuate() coroutine in an asyncio loop while frames flood in over UDP:
+#      how steady the motor update interval stays.
+# Run from the repository root:  python -m benchmarks.bench_actuation
+import asyncio
+import math
+import random
+import socket
+import time
+
+import testcontrol
+from CommandStore import CommandStore, StopFrame
+from StageTimers import Histogram
+from protocol import FrameEncoder, MsgDrive
+
+SendRate = 50.0
+ActuationRate = 100.0
+
+
+# What the driver commands at time t: a slow sweep on rb, held still every other second
+def commanded(t):
+    phase = t if int(t) % 2 == 0 else math.floor(t)
+    return (64 + round(60 * math.sin(phase * 2.0)), 192, 64, 192)
+
+
+# (arrival time, values) of frames sent at SendRate for seconds, over a jittery link that
+# stalls for 50-150 ms now and then (frames sent during a stall arrive together after it)
+def arrivals(seconds, rng):
+    frames = []
+    stall_until = 0.0
+    for index in range(int(seconds * SendRate)):
+        sent = index / SendRate
+        if sent >= stall_until and rng.random() < 0.02:
+            stall_until = sent + rng.uniform(0.05, 0.15)
+        arrive = max(sent, stall_until) + rng.lognormvariate(math.log(0.002), 0.8)
+        frames.append((arrive, commanded(sent)))
+    frames.sort(key=lambda frame: frame[0])
+    return frames
+
+
+def simulate(frames, seconds, store=None):
+    intervals = Histogram()
+    error = 0.0
+    ticks = 0
+    if store is None:
+        # motors written at each arrival; between arrivals they keep the last bytes
+        last = None
+        for arrive, _ in frames:
+            if last is not None:
+                intervals.record(arrive - last)
+            last = arrive
+        index = 0
+        current = StopFrame
+        for tick in range(int(seconds * ActuationRate)):
+            now = tick / ActuationRate
+            while index < len(frames) and frames[index][0] <= now:
+                current = frames[index][1]
+                index += 1
+            error += abs(current[0] - commanded(now)[0])
+            ticks += 1
+    else:
+        index = 0
+        for tick in range(int(seconds * ActuationRate)):
+            now = tick / ActuationRate
+            while index < len(frames) and frames[index][0] <= now:
+                store.update(frames[index][1], frames[index][0])
+                index += 1
+            error += abs(store.sample(now)[0] - commanded(now)[0])
+            ticks += 1
+        intervals.record(1.0 / ActuationRate)
+    return intervals, error / ticks
+
+
+def stopTimes(watchdog_timeout=testcontrol.watchdog_timeout):
+    # the watchdog wakes every timeout/4 and stops the motors once the driver is quiet
+    # longer than the timeout: at worst timeout + timeout/4 after the last frame
+    store = CommandStore()
+    store.update((124, 250, 4, 134), 0.0)
+    now = 0.0
+    while store.sample(now) != StopFrame:
+        now += 0.001
+    return watchdog_timeout * 1.25, now
+
+
+class FloodRobot(testcontrol.RobotServer):
+    def release(self, key, reason):
+        self.driver = None
+
+
+# Sorted intervals between motor writes of the real actuate() while UDP frames flood in
+async def live(seconds=2.0):
+    writes = []
+    testcontrol.applyMotors = lambda rb, rf, lb, lf: writes.append(time.monotonic())
+    robot = FloodRobot(store=CommandStore(), actuation_rate=ActuationRate)
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: testcontrol.DatagramServer(robot),
+                                                       local_addr=("127.0.0.1", 0))
+    port = transport.get_extra_info("sockname")[1]
+    actuation = asyncio.create_task(robot.actuate())
+
+    sender = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sender.setblocking(False)
+    encoder = FrameEncoder()
+    end = time.monotonic() + seconds
+    sent = 0
+    while time.monotonic() < end:
+        for _ in range(50):  # bursts of frames, the loop gets to run in between
+            try:
+                sender.sendto(encoder.encode(MsgDrive, bytes((64 + sent % 60, 192, 64, 192))), ("127.0.0.1", port))
+            except BlockingIOError:
+                break
+            sent += 1
+        await asyncio.sleep(0)
+    actuation.cancel()
+    transport.close()
+    sender.close()
+    return robot.frames_received, sorted(b - a for a, b in zip(writes, writes[1:]))
+
+
+def main(seconds=60):
+    testcontrol.stopMotors = lambda: None
+    testcontrol.applyMotors = lambda rb, rf, lb, lf: None
+    frames = arrivals(seconds, random.Random(4))
+
+    print(f"{len(frames)} frames at {SendRate:.0f} Hz over a jittery link, motors at {ActuationRate:.0f} Hz:")
+    for name, store in (("direct writes", None),
+                        ("store, hold", CommandStore()),
+                        ("store, extrapolate 40 ms", CommandStore(extrapolate_time=0.04))):
+        intervals, error = simulate(frames, seconds, store)
+        print(f"  {name:26s} update interval p50 {intervals.percentile(0.5) * 1e3:6.1f} ms  "
+              f"p99 {intervals.percentile(0.99) * 1e3:6.1f} ms  max {intervals.max * 1e3:6.1f} ms  "
+              f"mean error {error:5.2f} bytes")
+
+    watchdog, deadman = stopTimes()
+    print(f"link lost: motors at rest after up to {watchdog * 1e3:.0f} ms (watchdog, sudden stop) vs. "
+          f"{deadman * 1e3:.0f} ms (deadman {CommandStore().deadman_timeout * 1e3:.0f} ms + ramp)")
+
+    received, intervals = asyncio.run(live())
+    p50 = intervals[len(intervals) // 2]
+    p99 = intervals[int(len(intervals) * 0.99)]
+    print(f"live actuate() under a UDP flood ({received:,} frames received): interval "
+          f"p50 {p50 * 1e3:.2f} ms  p99 {p99 * 1e3:.2f} ms  max {intervals[-1] * 1e3:.2f} ms "
+          f"(target {1e3 / ActuationRate:.1f} ms)")
+
+
+if __name__ == "__main__":
+    main()
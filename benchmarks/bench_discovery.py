@@ -0,0 +1,66 @@
+# Robot address lookup: spawning `arp -a` (the old get_ip_from_mac), reading /proc/net/arp
+# directly, and a RobotDiscovery cache hit. Then a beacon round trip to an in-process
+# testcontrol beacon responder on the loopback interface.
+# Run from the repository root:  python -m benchmarks.bench_discovery
+import asyncio
+import re
+import subprocess
+import threading
+import time
+import timeit
+
+import testcontrol
+from RobotDiscovery import RobotDiscovery, localMacs, readArpCommand, readArpTable
+
+
+# get_ip_from_mac as it was before RobotDiscovery
+def arpSubprocess(mac_address):
+    try:
+        for line in subprocess.check_output(['arp', '-a'], text=True).splitlines():
+            if mac_address in line:
+                ip_address = re.search(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', line)
+                return ip_address.group(0) if ip_address else None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def timePerCall(function, number):
+    return min(timeit.repeat(function, number=number, repeat=3)) / number
+
+
+def main():
+    table = readArpTable()
+    mac = next(iter(table), "d8:3a:dd:d0:ac:cb")
+    print(f"ARP table: {len(table)} entries, looking up {mac}")
+
+    try:
+        subprocess.check_output(['arp', '-a'])
+        print(f"arp -a subprocess:  {timePerCall(lambda: arpSubprocess(mac), 20) * 1e3:8.3f} ms")
+        assert readArpCommand() == table
+    except (OSError, subprocess.CalledProcessError):
+        print("arp -a subprocess:  arp command not available")
+    print(f"/proc/net/arp read: {timePerCall(readArpTable, 2000) * 1e3:8.3f} ms")
+
+    discovery = RobotDiscovery()
+    discovery.lookup(mac)
+    print(f"cached lookup:      {timePerCall(lambda: discovery.lookup(mac), 100000) * 1e3:8.5f} ms")
+
+    # beacon: a robot that is not in the ARP table at all
+    port = 19998
+    robot_mac = sorted(localMacs())[0]
+    threading.Thread(target=asyncio.run, daemon=True,
+                     args=(testcontrol.serve("127.0.0.1", 19999, discovery_port=port),)).start()
+    time.sleep(0.2)
+    beaconing = RobotDiscovery(refresh_interval=0.05, beacon_port=port, broadcast="127.0.0.1")
+    start = time.perf_counter()
+    beaconing.start()
+    beaconing.lookup(robot_mac)
+    while beaconing.lookup(robot_mac) is None:
+        time.sleep(0.0005)
+    found = time.perf_counter() - start
+    beaconing.stop()
+    print(f"beacon discovery:   {found * 1e3:8.3f} ms ({robot_mac} at {beaconing.lookup(robot_mac)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+# Fleet mode: one station sending every frame to many local testcontrol servers, plus one dead
+# robot whose connects hang (a listener with a full backlog that never accepts, like a robot
+# that dropped off the network). Compares
+#   sequential   one blocking TcpTransport per robot, sent to in turn, reconnecting with backoff
+#   threads      one ConnectionManager (and thread) per robot
+#   FleetSender  one selector thread for all of them
+# by the latency from when a frame was due to when the healthy robots applied it, the time the
+# control loop spends handing a frame over, and the threads used.
+# Run from the repository root:  python -m benchmarks.bench_fleet [robots] [seconds]
+import asyncio
+import contextlib
+import io
+import socket
+import sys
+import threading
+import time
+
+import testcontrol
+from ConnectionManager import ConnectionManager
+from FleetSender import FleetSender
+from protocol import FrameEncoder, MsgDrive
+from transport import TcpTransport
+
+Rate = 250.0  # frames per second from the station
+Payloads = [bytes((64 + step % 32, 192, 64, 192)) for step in range(64)]
+
+
+class MeasuringRobot(testcontrol.RobotServer):
+    def __init__(self):
+        super().__init__(watchdog_timeout=3600.0, actuation_rate=0)
+        self.latencies = []
+
+    def apply(self, sequence, timestamp, values):
+        self.latencies.append((time.monotonic_ns() - timestamp) / 1e9)
+        self.frames_applied += 1
+
+
+def freePort():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+# count testcontrol servers on one event loop in a background thread
+def startRobots(count):
+    robots = [(MeasuringRobot(), freePort()) for _ in range(count)]
+    loop = asyncio.new_event_loop()
+
+    async def serveAll():
+        await asyncio.gather(*(testcontrol.serve("127.0.0.1", port, robot, None) for robot, port in robots))
+
+    threading.Thread(target=loop.run_until_complete, args=(serveAll(),), name="bench robots", daemon=True).start()
+    time.sleep(0.3)
+    return robots
+
+
+# A listener whose backlog is taken by one connection that is never accepted, so further
+# connects get no answer and hang until their timeout
+def deadRobot():
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(0)
+    fillers = []
+    for _ in range(4):
+        filler = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        filler.setblocking(False)
+        filler.connect_ex(listener.getsockname())
+        fillers.append(filler)
+    time.sleep(0.1)
+    return listener.getsockname(), (listener, fillers)
+
+
+class SequentialSender:
+    def __init__(self, targets, backoff=0.5):
+        self.transports = [TcpTransport(address) for address in targets.values()]
+        self.connected = [False] * len(self.transports)
+        self.retry = [0.0] * len(self.transports)
+        self.backoff = backoff
+
+    def sendAll(self, frame):
+        for index, transport in enumerate(self.transports):
+            if not self.connected[index]:
+                if time.monotonic() < self.retry[index]:
+                    continue
+                try:
+                    transport.connect()
+                    self.connected[index] = True
+                except OSError:
+                    transport.close()
+                    self.retry[index] = time.monotonic() + self.backoff
+                    continue
+            try:
+                transport.send(frame)
+            except OSError:
+                transport.close()
+                self.connected[index] = False
+                self.retry[index] = time.monotonic() + self.backoff
+
+    def stop(self):
+        for transport in self.transports:
+            transport.close()
+
+
+class ThreadedSender:
+    def __init__(self, targets):
+        self.managers = [ConnectionManager(TcpTransport(address)) for address in targets.values()]
+        for manager in self.managers:
+            manager.start()
+
+    def sendAll(self, frame):
+        for manager in self.managers:
+            manager.send(frame)
+
+    def stop(self):
+        for manager in self.managers:
+            manager.stop()
+
+
+class Fleet:
+    def __init__(self, targets):
+        self.sender = FleetSender(targets)
+        self.sender.start()
+
+    def sendAll(self, frame):
+        self.sender.sendAll(frame)
+
+    def stop(self):
+        self.sender.stop()
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else float("nan")
+
+
+def run(label, makeSender, robots, dead_address, seconds):
+    targets = {"dead": dead_address}  # first, so a sender that waits on it delays all the others
+    targets.update((f"robot{index}", ("127.0.0.1", port)) for index, (_, port) in enumerate(robots))
+    threads = threading.active_count()
+    with contextlib.redirect_stdout(io.StringIO()):  # connection messages
+        sender = makeSender(targets)
+        threads = threading.active_count() - threads
+        time.sleep(0.3)  # connect
+        handoff, frames = drive(sender, seconds, robots)
+        sender.stop()
+        time.sleep(0.2)  # the servers' disconnect messages
+
+    latencies = sorted(latency for robot, _ in robots for latency in robot.latencies)
+    handoff.sort()
+    applied = len(latencies) / (frames * len(robots))
+    print(f"  {label:12s} {threads:3d} threads   latency p50 {percentile(latencies, 0.5) * 1e3:7.2f} ms  "
+          f"p99 {percentile(latencies, 0.99) * 1e3:7.2f} ms  max {latencies[-1] * 1e3 if latencies else 0:8.2f} ms   "
+          f"handoff p99 {percentile(handoff, 0.99) * 1e3:7.3f} ms  max {handoff[-1] * 1e3:8.2f} ms   "
+          f"{applied:4.0%} of frames applied")
+
+
+# Frames at Rate for seconds, paced on deadlines. Returns the hand-over times and the frame count.
+def drive(sender, seconds, robots):
+    for robot, _ in robots:
+        robot.latencies = []
+
+    due = [0]
+    encoder = FrameEncoder(clock=lambda: due[0])  # stamp frames with when they were due
+    handoff = []
+    interval = 1.0 / Rate
+    start = time.monotonic()
+    frames = int(seconds * Rate)
+    for frame in range(frames):
+        deadline = start + frame * interval
+        due[0] = int(deadline * 1e9)
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        data = encoder.encode(MsgDrive, Payloads[frame % len(Payloads)])
+        began = time.perf_counter()
+        sender.sendAll(data)
+        handoff.append(time.perf_counter() - began)
+    time.sleep(0.2)
+    return handoff, frames
+
+
+def main(count=16, seconds=3.0):
+    testcontrol.stopMotors = lambda: None
+    with contextlib.redirect_stdout(io.StringIO()):
+        robots = startRobots(count)
+    dead_address, keep = deadRobot()
+    print(f"{count} testcontrol servers + 1 dead robot, {Rate:g} frames/s for {seconds:g} s:")
+    for label, makeSender in (("sequential", SequentialSender), ("threads", ThreadedSender), ("FleetSender", Fleet)):
+        run(label, makeSender, robots, dead_address, seconds)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 16, float(sys.argv[2]) if len(sys.argv) > 2 else 3.0)
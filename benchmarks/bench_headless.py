@@ -0,0 +1,63 @@
+# Runs the whole operator_control.main loop headless: ScriptedBackend input, reader,
+# calculateMecanumWheel, remap, the protocol encoder and the ConnectionManager socket path
+# into an in-process testcontrol server. No pygame, controller or display needed.
+# Run from the repository root:  python -m benchmarks.bench_headless [frames]
+import asyncio
+import contextlib
+import io
+import math
+import socket
+import sys
+import threading
+import time
+
+import operator_control
+import testcontrol
+from input_backend import ScriptedBackend
+
+
+# Sweep the left stick around a circle and wobble the right stick
+def circle(frame, joysticks):
+    joystick = joysticks[0]
+    angle = frame * 0.01
+    joystick.axes[0] = math.cos(angle)
+    joystick.axes[1] = math.sin(angle)
+    joystick.axes[2] = 0.5 * math.sin(angle * 3)
+
+
+def startServer():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    robot = testcontrol.RobotServer()
+    threading.Thread(target=asyncio.run, args=(testcontrol.serve("127.0.0.1", port, robot, None),), daemon=True).start()
+    time.sleep(0.2)
+    return robot, port
+
+
+def main(frames=20000):
+    testcontrol.stopMotors = lambda: None
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot, port = startServer()
+
+    operator_control.max_rate = 0  # no cap, send every changed frame
+    operator_control.recording_path = None
+    original = operator_control.makeTransport
+    operator_control.makeTransport = lambda kind, address: original(kind, ("127.0.0.1", port))
+
+    start = time.perf_counter()
+    cpu = time.process_time()
+    with contextlib.redirect_stdout(io.StringIO()):
+        operator_control.main(ScriptedBackend(circle, frames=frames))
+    elapsed = time.perf_counter() - start
+    cpu = time.process_time() - cpu
+    time.sleep(0.2)
+
+    print(f"{frames} loop iterations in {elapsed:.2f} s: {frames / elapsed:,.0f} frames/s, "
+          f"{cpu / frames * 1e6:.1f} us CPU per frame (client and server)")
+    print(f"server applied {robot.frames_applied} frames")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,39 @@
+# Benchmark: per-sample mecanumWheel calls vs. one batched mecanumWheels call,
+# the way an offline deadzone/maxspeed sweep over logged stick data would use them.
+# Run from the repository root:  python -m benchmarks.bench_mecanum
+import random
+import time
+
+import mecanum
+from mecanum import mecanumWheel, mecanumWheels
+
+
+def main(samples=200000, deadzone=0.08, maxspeed=0.8):
+    rng = random.Random(1)
+    speed = [rng.uniform(-1, 1) for _ in range(samples)]
+    strafe = [rng.uniform(-1, 1) for _ in range(samples)]
+    turn = [rng.uniform(-1, 1) for _ in range(samples)]
+
+    start = time.perf_counter()
+    scalar = [mecanumWheel(s, st, t, deadzone, maxspeed) for s, st, t in zip(speed, strafe, turn)]
+    scalar_time = time.perf_counter() - start
+
+    if mecanum.np is not None:
+        # convert once up front, as a replay tool holding arrays would
+        speed, strafe, turn = (mecanum.np.asarray(v) for v in (speed, strafe, turn))
+
+    start = time.perf_counter()
+    batch = mecanumWheels(speed, strafe, turn, deadzone, maxspeed)
+    batch_time = time.perf_counter() - start
+
+    if any(tuple(row) != expected for row, expected in zip(batch.tolist() if mecanum.np is not None else batch, scalar)):
+        raise SystemExit("mecanumWheels does not match mecanumWheel")
+
+    backend = "numpy" if mecanum.np is not None else "python fallback"
+    print(f"{samples} samples")
+    print(f"  mecanumWheel loop:        {scalar_time * 1e3:8.1f} ms")
+    print(f"  mecanumWheels ({backend}): {batch_time * 1e3:8.1f} ms  ({scalar_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+# Motor update latency with one stalled UART: the old inline per-byte writes against
+# MotorOutput's per-port writer threads. Two pseudo-terminal loopbacks stand in for the
+# Roboclaw ports; the second one stalls for stall_ms every 100 ms during the middle second.
+# Latency is measured on the first (healthy) port, from the time a frame was due (frames
+# arrive on a fixed 250 Hz schedule) to its bytes arriving, so time the server loop spends
+# blocked on the stalled port shows up on the healthy one.
+# Run from the repository root:  python -m benchmarks.bench_motor_output [stall_ms]
+import os
+import sys
+import threading
+import time
+
+from MotorOutput import MotorOutput, openLoopback
+
+
+# A port whose writes hang for stall seconds, periodically, while the stall window is open
+class StallingPort:
+    def __init__(self, port, stall, start, end):
+        self.port = port
+        self.stall = stall
+        self.start = start
+        self.end = end
+        self.next_stall = start
+
+    def write(self, data):
+        now = time.monotonic()
+        if self.start <= now < self.end and now >= self.next_stall:
+            time.sleep(self.stall)
+            self.next_stall = now + 0.1
+        return self.port.write(data)
+
+    def close(self):
+        self.port.close()
+
+
+# Read the healthy port and timestamp each 2-byte frame (rb carries a frame counter)
+def receive(reader_fd, arrivals, count):
+    buffer = b""
+    while len(arrivals) < count:
+        try:
+            buffer += os.read(reader_fd, 64)
+        except OSError:
+            return
+        now = time.monotonic()
+        while len(buffer) >= 2:
+            arrivals[buffer[0]] = now  # last arrival of this counter value
+            buffer = buffer[2:]
+
+
+def drain(reader_fd):
+    while True:
+        try:
+            if not os.read(reader_fd, 4096):
+                return
+        except OSError:
+            return
+
+
+def run(name, makeApply, stall, frames=750, rate=250.0):
+    healthy, healthy_fd = openLoopback()
+    stalled, stalled_fd = openLoopback()
+    start = time.monotonic()
+    slow = StallingPort(stalled, stall, start + 1.0, start + 2.0)
+    apply, stop = makeApply(healthy, slow)
+
+    arrivals = {}
+    threading.Thread(target=receive, args=(healthy_fd, arrivals, 10 ** 9), daemon=True).start()
+    threading.Thread(target=drain, args=(stalled_fd,), daemon=True).start()
+
+    latencies = []
+    late = 0
+    first = time.monotonic()
+    for frame in range(frames):
+        due = first + frame / rate
+        if due > time.monotonic():
+            time.sleep(due - time.monotonic())
+        counter = frame % 200
+        arrivals.pop(counter, None)
+        apply(counter, 64, 64, 192)
+        # wait for this frame on the healthy port, up to the next frame's slot
+        while counter not in arrivals and time.monotonic() < due + 1.0 / rate:
+            time.sleep(0.0001)
+        if counter in arrivals:
+            latencies.append(arrivals[counter] - due)
+        else:
+            late += 1
+
+    stats = stop()
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] * 1e3
+    p99 = latencies[int(len(latencies) * 0.99)] * 1e3
+    worst = latencies[-1] * 1e3
+    return (f"{name:24s} p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  max {worst:7.2f} ms  "
+            f"not there by the next frame: {late}{stats}")
+
+
+# Old testcontrol applyMotors: four single-byte writes, inline in the network loop
+def inlineWrites(healthy, stalled):
+    def apply(rb, rf, lb, lf):
+        healthy.write(bytes([rb]))
+        healthy.write(bytes([rf]))
+        stalled.write(bytes([lf]))
+        stalled.write(bytes([lb]))
+    return apply, lambda: ""
+
+
+def writerThreads(healthy, stalled):
+    motors = MotorOutput([(healthy, "healthy", ("rb", "rf")), (stalled, "stalled", ("lf", "lb"))])
+    motors.start()
+    return motors.apply, lambda: stopWriters(motors)
+
+
+def stopWriters(motors):
+    motors.stop()
+    return "".join(f"\n    {writer.name} port: {writer.writes} writes, "
+                   f"{writer.frames_dropped} superseded frames dropped" for writer, _ in motors.writers)
+
+
+def main():
+    stall = float(sys.argv[1]) / 1e3 if len(sys.argv) > 1 else 0.05
+    results = [run("inline writes", inlineWrites, stall), run("per-port writer threads", writerThreads, stall)]
+    print(f"250 Hz for 3 s, second port stalls {stall * 1e3:.0f} ms every 100 ms during second 2:")
+    for line in results:
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+# Encode/decode throughput of the wire protocol in protocol.py.
+# Run from the repository root:  python -m benchmarks.bench_protocol
+import struct
+import timeit
+
+from protocol import (FrameEncoder, MsgControl, MsgDrive, decodeFrames, decodeHeader,
+                      decodePayload, Header)
+
+
+def rate(stmt, number):
+    seconds = min(timeit.repeat(stmt, number=number, repeat=5))
+    return number / seconds
+
+
+def main(number=200000):
+    encoder = FrameEncoder()
+    payload = bytes([64, 192, 64, 192])
+    control = tuple(range(14))
+
+    print("encode (frames/s)")
+    print(f"  bare struct.pack 14B (old control.py) {rate(lambda: struct.pack('!' + 'B'*14, *control), number):12,.0f}")
+    print(f"  encode(MsgDrive, payload)            {rate(lambda: encoder.encode(MsgDrive, payload), number):12,.0f}")
+
+    def addValues():
+        encoder.add_values(MsgControl, *control)
+        encoder.flush()
+    print(f"  add_values(MsgControl) + flush       {rate(addValues, number):12,.0f}")
+
+    def batch():
+        for _ in range(8):
+            encoder.add_values(MsgControl, *control)
+        encoder.flush()
+    print(f"  batch of 8 x MsgControl              {rate(batch, number // 8) * 8:12,.0f}")
+
+    for _ in range(8):
+        encoder.add_values(MsgControl, *control)
+    batched = bytes(encoder.flush())
+    single = batched[:Header.size + 14]
+
+    def decodeOne():
+        msg_type, length, sequence, timestamp = decodeHeader(single)
+        decodePayload(msg_type, memoryview(single)[Header.size:])
+
+    def decodeBatch():
+        for msg_type, sequence, timestamp, payload in decodeFrames(batched):
+            decodePayload(msg_type, payload)
+
+    print("decode (frames/s)")
+    print(f"  decodeHeader + decodePayload         {rate(decodeOne, number):12,.0f}")
+    print(f"  decodeFrames, batch of 8             {rate(decodeBatch, number // 8) * 8:12,.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+# Table-driven MotorEncoder (quantize.py) against remap + struct.pack, for the 4-byte drive
+# frame of operator_control.py and the 14-byte control frame of control.py.
+# Before timing, runs the equivalence check of tests/test_quantize.py on more random inputs.
+# Run from the repository root:  python -m benchmarks.bench_quantize
+import random
+import timeit
+
+import control
+from quantize import MotorEncoder
+from tests.test_quantize import Seed, controlEncoder, controlFrame, driveEncoder, driveFrame, mismatches, samples
+
+
+def main(frames=2000, repeat=200):
+    values = samples(100000, random.Random(Seed))
+    for name, encode, reference in (("drive", driveEncoder(), driveFrame), ("control", controlEncoder(), controlFrame)):
+        found = mismatches(encode, reference, values)
+        if found:
+            raise SystemExit(f"{name} frames differ from remap + struct.pack: {found}")
+    print(f"equivalence: {len(values) + 5 ** 4} frames identical for both variants")
+
+    drive = MotorEncoder()
+    full = MotorEncoder(negative_scale=64, negate=False, frame_size=14)
+    buttons = (1, 0, 1, 2, 2, 0, 1, 0, 1, 0)
+    wheels = [tuple(random.uniform(-0.8, 0.8) for _ in range(4)) for _ in range(frames)]
+
+    def oldDrive():
+        for w in wheels:
+            driveFrame(*w)
+
+    def newDrive():
+        encode = drive.encode
+        for w in wheels:
+            encode(*w)
+
+    def oldControl():
+        for w in wheels:
+            controlFrame(*w, buttons)
+
+    def newControl():
+        encode = full.encode
+        pack_into = control.ControlFields.pack_into
+        for w in wheels:
+            pack_into(encode(*w), 4, *buttons)
+
+    for name, old, new in (("drive (4 bytes)", oldDrive, newDrive), ("control (14 bytes)", oldControl, newControl)):
+        before = min(timeit.repeat(old, number=repeat, repeat=5)) / repeat / frames
+        after = min(timeit.repeat(new, number=repeat, repeat=5)) / repeat / frames
+        print(f"{name:19s} remap+pack {before * 1e9:6.0f} ns  tables+pack_into {after * 1e9:6.0f} ns  "
+              f"({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
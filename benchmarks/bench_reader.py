@@ -0,0 +1,62 @@
+# Microbenchmark: per-input pollJoy lookups vs. a compiled ControllerReader, and the cost of
+# looking up the mapping of a known and an unknown pad in the MappingRegistry.
+# Run from the repository root:  python -m benchmarks.bench_reader
+import timeit
+
+from ControllerReader import ControllerReader, ControllerState
+from MappingRegistry import defaultRegistry
+from operator_control import pollJoy
+
+
+# Stand-in for pygame.joystick.Joystick with fixed input values
+class FakeJoystick:
+    def __init__(self, name):
+        self.name = name
+
+    def get_name(self):
+        return self.name
+
+    def get_axis(self, index):
+        return 0.25
+
+    def get_button(self, index):
+        return 1
+
+    def get_hat(self, index):
+        return (1, -1)
+
+
+# Inputs the old main loop read per joystick per frame (3 in calculateMecanumWheel, 12 in main)
+LegacyInputs = ("LJ_UD", "LJ_LR", "RJ_LR",
+                "LB", "RB", "D_UD", "D_LR",
+                "B", "X", "Y", "A",
+                "RT", "LT")
+
+
+def legacyPoll(joystick):
+    for input_source in LegacyInputs:
+        pollJoy(joystick, input_source)
+
+
+def main(number=100000):
+    print(f"{'controller':32s} {'pollJoy loop':>14s} {'reader.read':>14s} {'speedup':>8s}")
+    for name in ("Pro Controller", "Xbox One S Controller", "DualSense Wireless Controller"):
+        joystick = FakeJoystick(name)
+        reader = ControllerReader(joystick, defaultRegistry().lookup(name)[1])
+        state = ControllerState()
+
+        legacy = min(timeit.repeat(lambda: legacyPoll(joystick), number=number, repeat=5)) / number
+        compiled = min(timeit.repeat(lambda: reader.read(state), number=number, repeat=5)) / number
+        print(f"{name:32s} {legacy * 1e6:11.2f} us {compiled * 1e6:11.2f} us {legacy / compiled:7.1f}x")
+
+    registry = defaultRegistry()
+    print()
+    for name in ("Xbox One S Controller", "Some Unknown Gamepad"):
+        first = timeit.timeit(lambda: registry.lookup(name + " (first lookup)"), number=1)
+        again = min(timeit.repeat(lambda: registry.lookup(name), number=number, repeat=5)) / number
+        print(f"lookup \"{name}\" -> \"{registry.lookup(name)[0]}\": "
+              f"first {first * 1e6:.1f} us, then {again * 1e6:.3f} us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# Robot server receive path under a flood: a local client sends frames over TCP as fast as
+# it can, and the server decodes them. Compares the old StreamReader path (readexactly for
+# every header and payload, every frame applied) with FrameReceiver (recv_into a
+# preallocated buffer, every frame decoded in place, newest of each burst applied).
+# Reports frames per second and the server thread's CPU time per frame.
+# Run from the repository root:  python -m benchmarks.bench_receive [frames]
+import asyncio
+import socket
+import sys
+import threading
+import time
+
+import testcontrol
+from protocol import FrameEncoder, Header, MsgDrive, ProtocolError, SequenceTracker, decodeHeader, decodePayload
+
+
+# testcontrol's TCP handler before FrameReceiver, without the driver/watchdog bookkeeping
+async def streamHandler(robot, reader, writer):
+    sequences = SequenceTracker()
+    try:
+        while True:
+            header = await reader.readexactly(Header.size)
+            msg_type, length, sequence, timestamp = decodeHeader(header)
+            payload = await reader.readexactly(length)
+            values = decodePayload(msg_type, payload)
+            robot.frames_received += 1
+            if sequences.accept(sequence, timestamp):
+                robot.apply(sequence, timestamp, values)
+    except (asyncio.IncompleteReadError, ConnectionResetError, ProtocolError):
+        pass
+    finally:
+        writer.close()
+        robot.done.set()
+
+
+class CountingServer(testcontrol.RobotServer):
+    def __init__(self):
+        super().__init__()
+        self.done = threading.Event()
+        self.last_sequence = None
+
+    def apply(self, sequence, timestamp, values):
+        self.last_sequence = sequence
+        self.frames_applied += 1
+
+    def release(self, key, reason):
+        self.driver = None
+        self.done.set()
+
+
+def serve(robot, kind, ready, result):
+    async def run():
+        loop = asyncio.get_running_loop()
+        if kind == "stream":
+            server = await asyncio.start_server(lambda r, w: streamHandler(robot, r, w), "127.0.0.1", 0)
+        else:
+            server = await loop.create_server(lambda: testcontrol.FrameReceiver(robot), "127.0.0.1", 0)
+        result["port"] = server.sockets[0].getsockname()[1]
+        ready.set()
+        start = time.thread_time()
+        await loop.run_in_executor(None, robot.done.wait)
+        result["cpu"] = time.thread_time() - start
+        server.close()
+    asyncio.run(run())
+
+
+def flood(kind, data, frames):
+    robot = CountingServer()
+    ready = threading.Event()
+    result = {}
+    thread = threading.Thread(target=serve, args=(robot, kind, ready, result))
+    thread.start()
+    ready.wait()
+
+    client = socket.create_connection(("127.0.0.1", result["port"]))
+    start = time.perf_counter()
+    # odd-sized chunks, so frames are routinely split across reads
+    view = memoryview(data)
+    for offset in range(0, len(view), 4093):
+        client.sendall(view[offset:offset + 4093])
+    client.shutdown(socket.SHUT_WR)
+    robot.done.wait()
+    elapsed = time.perf_counter() - start
+    client.close()
+    thread.join()
+
+    assert robot.frames_received == frames, (robot.frames_received, frames)
+    assert robot.last_sequence == frames - 1
+    return (f"{kind:8s} {frames / elapsed:12,.0f} frames/s  "
+            f"{result['cpu'] / frames * 1e6:6.2f} us server CPU per frame  "
+            f"{robot.frames_applied:8d} frames applied")
+
+
+def main():
+    frames = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    testcontrol.stopMotors = lambda: None
+    encoder = FrameEncoder()
+    data = b"".join(bytes(encoder.encode(MsgDrive, bytes((i & 0xff, 192, 64, 192)))) for i in range(frames))
+    results = [flood(kind, data, frames) for kind in ("stream", "recv_into")]
+    print(f"{frames} frames, {len(data) / 1e6:.1f} MB")
+    for line in results:
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# Hot-path cost of FlightRecorder.record and the size/speed of dumping a full buffer.
+# Run from the repository root:  python -m benchmarks.bench_recorder
+import os
+import tempfile
+import time
+import timeit
+
+from FlightRecorder import FlightRecorder, loadRecording
+
+
+def main(number=500000):
+    recorder = FlightRecorder.forDuration(5, 250)
+    payload = bytes([64, 192, 64, 192])
+
+    seconds = min(timeit.repeat(lambda: recorder.record(1.0, 0.5, -0.25, 0.1, 0.4, 0.3, 0.2, 0.1, payload),
+                                number=number, repeat=5))
+    print(f"record():  {seconds / number * 1e6:.2f} us per frame")
+    print(f"buffer:    {recorder.capacity} frames, "
+          f"{(len(recorder.values) * 8 + len(recorder.payloads)) / 1e6:.1f} MB")
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.rec")
+    start = time.perf_counter()
+    recorder.dump(path)
+    dumped = time.perf_counter() - start
+    print(f"dump():    {dumped * 1e3:.1f} ms, {os.path.getsize(path) / 1e6:.1f} MB on disk")
+    assert len(loadRecording(path)) == recorder.count
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+# Autonomous step timing: sending a frame and then time.sleep(interval), as Autonomous.main
+# used to plan to, vs. MotionSequencer's deadlines, with a send that takes a random 0-4 ms
+# (encoding, a busy socket, a slow laptop). Reports when each step actually started against
+# when the plan says it should, then how fast a dry run gets through the same plan.
+# Run from the repository root:  python -m benchmarks.bench_sequencer [seconds]
+import random
+import sys
+import time
+
+from MotionSequencer import MotionSequencer, VirtualClock, drive, strafe, turn, wait
+
+TickRate = 50.0
+
+
+def makePlan(seconds):
+    part = seconds / 4
+    return [drive(0.5, part), strafe(0.4, part), turn(0.3, part), wait(part)]
+
+
+def jitteryRun(rng):
+    def send(frame):
+        time.sleep(rng.uniform(0.0, 0.004))
+    return send
+
+
+# Each step sends duration * rate frames with a sleep after each one
+def runSleeps(plan, send):
+    interval = 1.0 / TickRate
+    sequencer = MotionSequencer(send, TickRate)
+    start = time.monotonic()
+    starts = []
+    for step in plan:
+        starts.append(time.monotonic() - start)
+        for _ in range(round(step.duration * TickRate)):
+            sequencer.command(step.speed, step.strafe, step.turn)
+            time.sleep(interval)
+    sequencer.command(0.0, 0.0, 0.0)
+    return starts, time.monotonic() - start
+
+
+def runDeadlines(plan, send):
+    sequencer = MotionSequencer(send, TickRate)
+    start = time.monotonic()
+    sequencer.run(plan)
+    return [actual for _, _, actual in sequencer.steps], time.monotonic() - start, sequencer
+
+
+def report(label, plan, starts, total):
+    planned = 0.0
+    errors = []
+    for step, actual in zip(plan, starts):
+        errors.append(actual - planned)
+        planned += step.duration
+    errors.append(total - planned)
+    print(f"  {label:16s}" + "".join(f"{error * 1e3:+9.1f}" for error in errors))
+
+
+def main(seconds=4.0):
+    plan = makePlan(seconds)
+    print(f"{seconds:g} s plan at {TickRate:g} Hz, send takes 0-4 ms; ms late at each step start, then at the end:")
+    starts, total = runSleeps(plan, jitteryRun(random.Random(1)))
+    report("sleep(interval)", plan, starts, total)
+    starts, total, sequencer = runDeadlines(plan, jitteryRun(random.Random(1)))
+    report("deadlines", plan, starts, total)
+    print(f"  deadlines: {sequencer.ticks} ticks, {sequencer.ticks_skipped} skipped, "
+          f"mean lateness {sequencer.total_lateness / sequencer.ticks * 1e3:.2f} ms, "
+          f"max {sequencer.max_lateness * 1e3:.2f} ms")
+
+    plan = makePlan(600.0)
+    frames = []
+    clock = VirtualClock()
+    sequencer = MotionSequencer(lambda frame: frames.append(bytes(frame)), TickRate, clock=clock, sleep=clock.sleep)
+    start = time.perf_counter()
+    plan_time = sequencer.run(plan)
+    elapsed = time.perf_counter() - start
+    print(f"dry run: {plan_time:.0f} s plan ({len(frames)} frames) in {elapsed * 1e3:.0f} ms, "
+          f"{plan_time / elapsed:.0f}x real time")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 4.0)
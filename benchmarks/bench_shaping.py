@@ -0,0 +1,92 @@
+# Input shaping: how many frames a noisy, mostly held stick puts on the wire with the plain
+# per-axis deadzone vs. the shaping pipeline, what shaping costs per frame, and shapeArrays
+# vs. shape() over a whole recording.
+# Run from the repository root:  python -m benchmarks.bench_shaping [seconds]
+import random
+import sys
+import time
+
+import shaping
+from mecanum import mecanumWheel
+from quantize import MotorEncoder
+from shaping import makeShaper
+
+Rate = 250  # loop iterations per second
+Noise = 0.003  # standard deviation of the stick noise, about 100 counts of a 16-bit axis
+
+
+# A driver holding the sticks still for a second, then moving to a new position over a
+# quarter second, with sensor noise on top. Returns times, speed, strafe, turn.
+def driving(seconds, rng):
+    times, speed, strafe, turn = [], [], [], []
+    target = (0.0, 0.0, 0.0)
+    for index in range(seconds * Rate):
+        phase = index % Rate
+        if phase == 0:
+            previous = target
+            target = (rng.choice((0.0, rng.uniform(-1, 1))), rng.uniform(-1, 1) * rng.random(), rng.choice((0.0, 0.3)))
+        blend = min(1.0, phase / (Rate / 4))
+        times.append(index / Rate)
+        values = [p + (t - p) * blend + rng.gauss(0, Noise) for p, t in zip(previous, target)]
+        speed.append(max(-1.0, min(1.0, values[0])))
+        strafe.append(max(-1.0, min(1.0, values[1])))
+        turn.append(max(-1.0, min(1.0, values[2])))
+    return times, speed, strafe, turn
+
+
+# Frames a change-gated sender would send: those whose motor bytes differ from the last
+def changedFrames(samples, shaper, deadzone=0.08, maxspeed=0.8):
+    encoder = MotorEncoder()
+    last = None
+    changed = 0
+    for now, speed, strafe, turn in zip(*samples):
+        if shaper is not None:
+            speed, strafe, turn = shaper.shape(speed, strafe, turn, now)
+            wheels = mecanumWheel(speed, strafe, turn, 0, maxspeed)
+        else:
+            wheels = mecanumWheel(speed, strafe, turn, deadzone, maxspeed)
+        frame = bytes(encoder.encode(*wheels))
+        if frame != last:
+            changed += 1
+            last = frame
+    return changed
+
+
+def main(seconds=60):
+    rng = random.Random(3)
+    samples = driving(seconds, rng)
+    frames = len(samples[0])
+
+    print(f"{frames} frames ({seconds} s at {Rate} Hz) of a noisy stick, frames with changed motor bytes:")
+    print(f"  per-axis deadzone only:         {changedFrames(samples, None):6d}")
+    print(f"  radial deadzone:                {changedFrames(samples, makeShaper(0.08)):6d}")
+    print(f"  + quantize 1/128, hysteresis:   {changedFrames(samples, makeShaper(0.08, step=1 / 128)):6d}")
+    print(f"  + quantize 1/64, hysteresis:    {changedFrames(samples, makeShaper(0.08, step=1 / 64)):6d}")
+    print(f"  + expo 0.3, slew 4/s:           {changedFrames(samples, makeShaper(0.08, 0.3, 4.0, 1 / 64)):6d}")
+
+    shaper = makeShaper(0.08, 0.3, 4.0, 1 / 64)
+    start = time.perf_counter()
+    for now, speed, strafe, turn in zip(*samples):
+        shaper.shape(speed, strafe, turn, now)
+    per_frame = (time.perf_counter() - start) / frames
+    print(f"shape(), all four stages: {per_frame * 1e6:.2f} us per frame")
+
+    times, speed, strafe, turn = samples
+    if shaping.np is not None:
+        times, speed, strafe, turn = (shaping.np.asarray(values) for values in samples)
+    for name, stages in (("deadzone + expo", (0.08, 0.3)), ("all four stages", (0.08, 0.3, 4.0, 1 / 64))):
+        start = time.perf_counter()
+        makeShaper(*stages).shapeArrays(speed, strafe, turn, times)
+        batch = time.perf_counter() - start
+        start = time.perf_counter()
+        loop = makeShaper(*stages)
+        for row in zip(*samples):
+            loop.shape(row[1], row[2], row[3], row[0])
+        scalar = time.perf_counter() - start
+        backend = "NumPy" if shaping.np is not None else "plain Python"
+        print(f"shapeArrays ({backend}), {name}: {batch * 1e3:.1f} ms vs. {scalar * 1e3:.1f} ms "
+              f"sample by sample ({scalar / batch:.1f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60)
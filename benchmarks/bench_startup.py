@@ -0,0 +1,46 @@
+# Cold start of the entry points: a fresh interpreter importing each script, with the optional
+# and rarely used dependencies imported lazily (optional.py) vs. imported up front as the
+# modules used to (NumPy, http.server, difflib, tomllib). With pygame installed it also
+# compares pygame.init() with initializing only the display and joystick subsystems, as
+# PygameBackend does. Median of several runs each.
+# Run from the repository root:  python -m benchmarks.bench_startup [runs]
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+Root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+Modules = ("operator_control", "control", "testcontrol", "Autonomous", "replay")
+Eager = "import numpy, json, difflib, tomllib, http.server\n"
+
+
+def coldStart(code, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", code], cwd=Root, check=True, stdout=subprocess.DEVNULL)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def main(runs=15):
+    bare = coldStart("pass", runs)
+    print(f"python -c pass: {bare * 1e3:.1f} ms; import times below are on top of that")
+    for module in Modules:
+        lazy = coldStart(f"import {module}", runs) - bare
+        eager = coldStart(Eager + f"import {module}", runs) - bare
+        print(f"  {module:17s} eager imports {eager * 1e3:6.1f} ms   lazy {lazy * 1e3:6.1f} ms   ({eager / lazy:.1f}x)")
+
+    try:
+        import pygame  # noqa: F401
+    except ImportError:
+        print("pygame not installed, skipping the SDL init comparison")
+        return
+    full = coldStart("import pygame\npygame.init()", runs) - bare
+    joystick = coldStart("import pygame\npygame.display.init()\npygame.joystick.init()", runs) - bare
+    print(f"  pygame.init() {full * 1e3:.1f} ms   display + joystick only {joystick * 1e3:.1f} ms")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 15)
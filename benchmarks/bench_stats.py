@@ -0,0 +1,66 @@
+# Cost of the StageTimers instrumentation: one lap() on its own, and the headless
+# operator_control loop (see bench_headless.py) with the timers off and on. Prints the
+# stage table of the timed run, so it doubles as an example of the output.
+# Run from the repository root:  python -m benchmarks.bench_stats [frames]
+import contextlib
+import io
+import sys
+import time
+import timeit
+
+import operator_control
+import testcontrol
+from StageTimers import StageTimers
+from benchmarks.bench_headless import circle, startServer
+from input_backend import ScriptedBackend
+
+
+def timeLap(number=200000):
+    stats = StageTimers(0)
+    stats.start()
+    seconds = min(timeit.repeat(lambda: stats.lap("stage"), number=number, repeat=5))
+    disabled = None
+    check = min(timeit.repeat(lambda: disabled is not None, number=number, repeat=5))
+    return seconds / number, check / number
+
+
+def runLoop(port, frames, interval):
+    operator_control.stats_interval = interval
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        operator_control.main(ScriptedBackend(circle, frames=frames))
+    return frames / (time.perf_counter() - start)
+
+
+def main(frames=20000):
+    lap, check = timeLap()
+    print(f"lap(): {lap * 1e6:.2f} us, disabled check: {check * 1e9:.0f} ns")
+
+    testcontrol.stopMotors = lambda: None
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot, port = startServer()
+
+    operator_control.max_rate = 0
+    operator_control.recording_path = None
+    operator_control.dashboard_rate = 0
+    original = operator_control.makeTransport
+    operator_control.makeTransport = lambda kind, address: original(kind, ("127.0.0.1", port))
+
+    # keep hold of the loop's timers, reporting only at the end
+    created = []
+    operator_control.StageTimers = lambda interval: created.append(StageTimers(interval)) or created[-1]
+
+    # alternate the two runs and keep the best of each, the loop is noisy
+    off = on = 0.0
+    for _ in range(3):
+        off = max(off, runLoop(port, frames, 0))
+        on = max(on, runLoop(port, frames, 3600.0))
+    print(f"headless loop: {off:,.0f} frames/s without timers, {on:,.0f} frames/s with timers "
+          f"({(off / on - 1) * 100:+.1f}% time per frame)")
+
+    stats = created[-1]
+    print(StageTimers.report({"window": time.perf_counter() - stats.window_start, "stages": stats.summary()}))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,317 @@
+# Benchmark and soak suite for the whole operator-to-robot path, headless on one machine:
+# ScriptedBackend input, ControllerReader, shaping and calculateMecanumWheel, MotorEncoder,
+# the protocol encoder and ConnectionManager socket, and the testcontrol server receiving and
+# decoding in a thread of the same process.
+#
+#   throughput  the loop as fast as it goes: frames/s, CPU per frame (client and server),
+#               encode-to-apply latency under saturation, and net memory blocks per frame
+#   memory      the same loop under tracemalloc: traced memory growth per 1000 frames
+#   soak        the loop at a fixed rate for a long time, with the server dropping the
+#               connection every few seconds: reconnect stalls, memory, thread and file
+#               descriptor counts over time, and encode-to-apply latency at a realistic rate
+#
+# Results can be saved as a JSON baseline and later runs compared against it; a metric that
+# got worse by more than the tolerance is reported and the exit status is 1.
+#
+# Run from the repository root:
+#   python -m benchmarks.bench_suite                             # throughput + memory
+#   python -m benchmarks.bench_suite --save baseline.json        # ... and save the results
+#   python -m benchmarks.bench_suite --compare baseline.json     # ... and check for regressions
+#   python -m benchmarks.bench_suite --soak 600 --disconnect-every 5
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import socket
+import sys
+import threading
+import time
+import tracemalloc
+
+import operator_control
+import testcontrol
+from StageTimers import Histogram, Percentiles
+from benchmarks.bench_headless import circle
+from input_backend import ScriptedBackend
+
+OriginalTransport = operator_control.makeTransport  # configure() wraps this one, however often it runs
+
+# metric -> True when higher is better; metrics not listed are informational
+Better = {
+    "frames_per_s": True,
+    "cpu_us_per_frame": False,
+    "latency_p50_ms": False,
+    "latency_p99_ms": False,
+    "latency_p999_ms": False,
+    "blocks_per_frame": False,
+    "traced_bytes_per_1k_frames": False,
+    "stall_max_ms": False,
+    "stall_mean_ms": False,
+    "memory_growth_kib_per_min": False,
+}
+
+
+# RobotServer that measures instead of driving motors
+class MeasuringRobot(testcontrol.RobotServer):
+    def __init__(self):
+        super().__init__(watchdog_timeout=3600.0)
+        self.latency = Histogram()
+        self.disconnected_at = None  # time.monotonic_ns() of a forced disconnect, until the next frame
+        self.stalls = []  # seconds from each forced disconnect to the next applied frame
+
+    def apply(self, sequence, timestamp, values):
+        now = time.monotonic_ns()
+        self.latency.record((now - timestamp) / 1e9)
+        self.frames_applied += 1
+        if self.disconnected_at is not None:
+            self.stalls.append((now - self.disconnected_at) / 1e9)
+            self.disconnected_at = None
+
+    def release(self, key, reason):
+        if self.driver == key:
+            self.driver = None
+
+    # Called in the server's event loop: drop the driver's connection
+    def dropDriver(self):
+        if isinstance(self.driver, testcontrol.FrameReceiver):
+            self.disconnected_at = time.monotonic_ns()
+            self.driver.transport.abort()
+
+
+# Start a testcontrol server on a free port in a background thread.
+# Returns (robot, event loop, port).
+def startServer():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+
+    robot = MeasuringRobot()
+    loop = asyncio.new_event_loop()
+    server = testcontrol.serve("127.0.0.1", port, robot, None)
+    threading.Thread(target=loop.run_until_complete, args=(server,), name="bench server", daemon=True).start()
+    time.sleep(0.2)
+    return robot, loop, port
+
+
+# Point operator_control at the local server, with nothing but the pipeline running
+def configure(port, max_rate):
+    operator_control.connect = True
+    operator_control.transport = "tcp"
+    operator_control.max_rate = max_rate
+    operator_control.recording_path = None
+    operator_control.dashboard_rate = 0
+    operator_control.stats_interval = 0
+    operator_control.mapping_reload = 0
+    operator_control.makeTransport = lambda kind, address: OriginalTransport(kind, ("127.0.0.1", port))
+
+
+# Runs operator_control.main on script. Returns the startup time (main() called to the first
+# frame read) and the total time until main() returned, in seconds.
+def runLoop(script, frames=None, rate=None):
+    first = []
+
+    def timed(frame, joysticks):
+        if not first:
+            first.append(time.perf_counter())
+        return script(frame, joysticks)
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        operator_control.main(ScriptedBackend(timed, frames=frames, rate=rate))
+    total = time.perf_counter() - start
+    time.sleep(0.1)  # let the server take the last frames
+    return (first[0] - start if first else total), total
+
+
+def latencyMetrics(histogram):
+    return {f"latency_{name}_ms": histogram.percentile(fraction) * 1e3 for name, fraction in Percentiles}
+
+
+def throughput(robot, frames):
+    runLoop(circle, frames=min(frames, 2000))  # warm up
+    robot.latency = Histogram()
+    applied = robot.frames_applied
+    received = robot.frames_received
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    cpu = time.process_time()
+    startup, total = runLoop(circle, frames=frames)
+    elapsed = total - startup
+    cpu = time.process_time() - cpu
+    gc.collect()
+    blocks = sys.getallocatedblocks() - blocks
+
+    results = {
+        "frames": frames,
+        "frames_per_s": frames / elapsed,
+        "cpu_us_per_frame": cpu / frames * 1e6,
+        "frames_received": robot.frames_received - received,  # decoded by the server
+        "frames_applied": robot.frames_applied - applied,  # newest frame of each read
+        "blocks_per_frame": blocks / frames,
+    }
+    results.update(latencyMetrics(robot.latency))
+    return results
+
+
+def memory(frames):
+    tracemalloc.start()
+    try:
+        runLoop(circle, frames=frames // 2)  # reach a steady state first
+        gc.collect()
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        runLoop(circle, frames=frames)
+        gc.collect()
+        after, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {
+        "traced_bytes_per_1k_frames": (after - before) / frames * 1000,
+        "traced_peak_kib": peak / 1024,
+    }
+
+
+def openFiles():
+    try:
+        return len(os.listdir("/proc/self/fd"))
+    except OSError:
+        return None
+
+
+def soak(robot, loop, seconds, rate, disconnect_every, sample_every=10.0):
+    samples = []  # (seconds since start, traced KiB, threads, open files)
+    state = {"next_disconnect": None, "next_sample": None, "disconnects": 0}
+    robot.stalls = []
+    robot.latency = Histogram()
+    applied = robot.frames_applied
+
+    def script(frame, joysticks):
+        now = time.monotonic()
+        if state["next_disconnect"] is None:
+            state["start"] = now
+            state["next_disconnect"] = now + disconnect_every if disconnect_every else float("inf")
+            state["next_sample"] = now
+        if now >= state["next_sample"]:
+            traced, _ = tracemalloc.get_traced_memory()
+            samples.append((now - state["start"], traced / 1024, threading.active_count(), openFiles()))
+            state["next_sample"] += sample_every
+        if now >= state["next_disconnect"]:
+            loop.call_soon_threadsafe(robot.dropDriver)
+            state["disconnects"] += 1
+            state["next_disconnect"] += disconnect_every
+        circle(frame, joysticks)
+        return now - state["start"] < seconds
+
+    tracemalloc.start()
+    try:
+        runLoop(script, rate=rate)
+    finally:
+        tracemalloc.stop()
+
+    # traced memory growth per minute: least squares over the samples after the first minute
+    steady = [(t, kib) for t, kib, _, _ in samples if t >= min(60.0, seconds / 2)]
+    growth = 0.0
+    if len(steady) >= 2:
+        mean_t = sum(t for t, _ in steady) / len(steady)
+        mean_kib = sum(kib for _, kib in steady) / len(steady)
+        spread = sum((t - mean_t) ** 2 for t, _ in steady)
+        if spread:
+            growth = sum((t - mean_t) * (kib - mean_kib) for t, kib in steady) / spread * 60
+
+    stalls = robot.stalls
+    results = {
+        "seconds": seconds,
+        "rate": rate,
+        "disconnects": state["disconnects"],
+        "reconnects_seen": len(stalls),
+        "stall_max_ms": max(stalls) * 1e3 if stalls else 0.0,
+        "stall_mean_ms": sum(stalls) / len(stalls) * 1e3 if stalls else 0.0,
+        "memory_growth_kib_per_min": growth,
+        "threads_start": samples[0][2] if samples else None,
+        "threads_end": samples[-1][2] if samples else None,
+        "open_files_start": samples[0][3] if samples else None,
+        "open_files_end": samples[-1][3] if samples else None,
+        "frames_applied": robot.frames_applied - applied,
+    }
+    results.update(latencyMetrics(robot.latency))
+    return results
+
+
+# (suite, metric, baseline value, new value) for every metric worse than tolerance allows
+def regressions(baseline, results, tolerance):
+    found = []
+    for suite, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get("results", {}).get(suite, {}).get(metric)
+            if metric not in Better or not isinstance(old, (int, float)) or old <= 0:
+                continue
+            worse = old / value - 1 if Better[metric] else value / old - 1
+            if worse > tolerance:
+                found.append((suite, metric, old, value))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark and soak test the operator-to-robot pipeline")
+    parser.add_argument("--frames", type=int, default=20000, help="loop iterations for throughput and memory")
+    parser.add_argument("--soak", type=float, default=0, metavar="SECONDS", help="also run a soak test this long")
+    parser.add_argument("--rate", type=float, default=250.0, help="soak loop iterations per second")
+    parser.add_argument("--disconnect-every", type=float, default=5.0, metavar="SECONDS",
+                        help="drop the connection this often during the soak, 0 never")
+    parser.add_argument("--skip-throughput", action="store_true", help="only run the soak test")
+    parser.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="compare against a saved baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25,
+                        help="how much worse a metric may get before it counts as a regression")
+    args = parser.parse_args()
+
+    testcontrol.stopMotors = lambda: None
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot, loop, port = startServer()
+
+    results = {}
+    if not args.skip_throughput:
+        configure(port, max_rate=0)
+        results["throughput"] = throughput(robot, args.frames)
+        results["memory"] = memory(args.frames)
+    if args.soak:
+        configure(port, max_rate=operator_control.max_rate or 250.0)
+        results["soak"] = soak(robot, loop, args.soak, args.rate, args.disconnect_every)
+
+    for suite, metrics in results.items():
+        print(f"{suite}:")
+        for metric, value in metrics.items():
+            print(f"  {metric:28s} {value:12,.3f}" if isinstance(value, float) else f"  {metric:28s} {value!s:>12s}")
+
+    report = {
+        "version": 1,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "machine": f"{platform.system()} {platform.machine()} {platform.node()}",
+        "results": results,
+    }
+    if args.save:
+        with open(args.save, "w") as output:
+            json.dump(report, output, indent=2)
+        print(f"saved to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as source:
+            baseline = json.load(source)
+        found = regressions(baseline, results, args.tolerance)
+        print(f"compared with {args.compare} ({baseline.get('created')}, {baseline.get('machine')}):")
+        for suite, metric, old, value in found:
+            print(f"  REGRESSION {suite}.{metric}: {old:,.3f} -> {value:,.3f}")
+        if not found:
+            print(f"  no metric worse by more than {args.tolerance:.0%}")
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
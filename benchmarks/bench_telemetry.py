@@ -0,0 +1,153 @@
+# Telemetry back-channel under a slow consumer.
+# Robot side: a driver that sends frames at 250 Hz but never reads, while the robot server
+# sends telemetry at 1000 Hz. Writing every telemetry frame to the connection (what a plain
+# transport.write does) vs. the drop-oldest queue in FrameReceiver.queueTelemetry: the
+# telemetry the robot holds unsent at the end, and the drive frames' latency from timestamp
+# to apply. Both ends of the connection get small socket buffers, so the stalled link backs up
+# into the robot within seconds.
+# Operator side: ConnectionManager with a TelemetryReceiver whose consumer only takes samples
+# once a second: what is buffered and dropped, and the cost of handing drive frames over
+# with the reader thread running.
+# Run from the repository root:  python -m benchmarks.bench_telemetry [seconds]
+import asyncio
+import contextlib
+import io
+import socket
+import sys
+import threading
+import time
+
+import testcontrol
+from ConnectionManager import ConnectionManager
+from protocol import FrameEncoder, MsgDrive
+from TelemetryReceiver import TelemetryReceiver
+from transport import makeTransport
+
+DriveRate = 250.0
+TelemetryRate = 1000.0
+Original = testcontrol.FrameReceiver
+
+
+class MeasuringRobot(testcontrol.RobotServer):
+    def __init__(self, telemetry_rate):
+        super().__init__(watchdog_timeout=3600.0, actuation_rate=0, telemetry_rate=telemetry_rate)
+        self.latencies = []
+
+    def apply(self, sequence, timestamp, values):
+        self.latencies.append((time.monotonic_ns() - timestamp) / 1e9)
+        self.frames_applied += 1
+
+
+# Telemetry written straight to the connection, however much is still unsent
+class WriteEverything(testcontrol.FrameReceiver):
+    def queueTelemetry(self, frame):
+        self.transport.write(frame)
+        self.robot.telemetry_sent += 1
+
+
+def startRobot(telemetry_rate):
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    robot = MeasuringRobot(telemetry_rate)
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_until_complete, args=(testcontrol.serve("127.0.0.1", port, robot, None),),
+                     name="bench robot", daemon=True).start()
+    time.sleep(0.2)
+    return robot, loop, port
+
+
+# Frames at rate for seconds, paced on deadlines; returns the hand-over times
+def drive(send, seconds, rate=DriveRate):
+    encoder = FrameEncoder()
+    handoff = []
+    start = time.monotonic()
+    for frame in range(int(seconds * rate)):
+        delay = start + frame / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        data = encoder.encode(MsgDrive, bytes((64 + frame % 32, 192, 64, 192)))
+        began = time.perf_counter()
+        send(data)
+        handoff.append(time.perf_counter() - began)
+    return sorted(handoff)
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))] if values else float("nan")
+
+
+def robotSide(label, receiver_class, telemetry_rate, seconds):
+    testcontrol.FrameReceiver = receiver_class
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot, loop, port = startRobot(telemetry_rate)
+        driver = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        # a small receive window, so the kernel buffers fill within the run rather than after minutes
+        driver.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+        driver.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        driver.connect(("127.0.0.1", port))
+        time.sleep(0.1)
+        # and a small send buffer on the robot: loopback otherwise lets the kernel take megabytes
+        loop.call_soon_threadsafe(lambda: robot.driver.transport.get_extra_info("socket").setsockopt(
+            socket.SOL_SOCKET, socket.SO_SNDBUF, 4096))
+        drive(driver.sendall, seconds)
+        time.sleep(0.1)
+        sizes = []
+        done = threading.Event()
+
+        def measure():  # on the robot's own loop
+            queued = sum(len(frame) for frame in getattr(robot.driver, "telemetry", ()))
+            sizes.append(robot.driver.transport.get_write_buffer_size() + queued)
+            done.set()
+        loop.call_soon_threadsafe(measure)
+        done.wait(1.0)
+        driver.close()
+        time.sleep(0.1)
+    print(f"  {label:28s} drive latency p50 {percentile(robot.latencies, 0.5) * 1e3:6.2f} ms  "
+          f"p99 {percentile(robot.latencies, 0.99) * 1e3:6.2f} ms   telemetry sent {robot.telemetry_sent:6d}  "
+          f"dropped {robot.telemetry_dropped:6d}  unsent backlog on the robot {sizes[0] / 1024 if sizes else 0:8.1f} KiB")
+
+
+def operatorSide(seconds):
+    testcontrol.FrameReceiver = Original
+    with contextlib.redirect_stdout(io.StringIO()):
+        robot, loop, port = startRobot(TelemetryRate)
+        results = []
+        for label, receiver in (("no telemetry reader", None), ("reader, consumer at 1 Hz", TelemetryReceiver(64))):
+            client = ConnectionManager(makeTransport("tcp", ("127.0.0.1", port)), receiver=receiver)
+            client.start()
+            time.sleep(0.2)
+            stop = threading.Event()
+            taken = []
+            if receiver is not None:
+                def consume():
+                    while not stop.wait(1.0):
+                        taken.append(len(receiver.take()))
+                threading.Thread(target=consume, daemon=True).start()
+            handoff = drive(client.send, seconds)
+            stop.set()
+            client.stop()
+            results.append((label, handoff, receiver, taken))
+            time.sleep(0.2)
+    for label, handoff, receiver, taken in results:
+        line = f"  {label:28s} send() p99 {percentile(handoff, 0.99) * 1e6:6.1f} us  max {handoff[-1] * 1e6:7.1f} us"
+        if receiver is not None:
+            line += (f"   samples received {receiver.received}, taken {sum(taken)} "
+                     f"(at most {max(taken, default=0)} at a time), dropped {receiver.dropped}")
+        print(line)
+
+
+def main(seconds=5.0):
+    testcontrol.stopMotors = lambda: None
+    print(f"robot side: driver at {DriveRate:g} Hz that never reads telemetry, {seconds:g} s:")
+    robotSide("telemetry off", Original, 0, seconds)
+    robotSide(f"write every frame, {TelemetryRate:g} Hz", WriteEverything, TelemetryRate, seconds)
+    robotSide(f"drop-oldest queue, {TelemetryRate:g} Hz", Original, TelemetryRate, seconds)
+    print(f"operator side: {TelemetryRate:g} Hz telemetry, drive frames at {DriveRate:g} Hz, {seconds:g} s:")
+    operatorSide(seconds)
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
@@ -0,0 +1,65 @@
+# Perception updates for autonomous mode: a list of FieldObject instances updated one
+# detection at a time (find by AprilTag or name with a linear search, set_distance) vs.
+# FieldObjectTracker applying the whole batch through its indexes. Each camera frame has 20
+# detections, then asks for the nearest object and evicts stale ones.
+# Run from the repository root:  python -m benchmarks.bench_tracker [frames]
+import random
+import sys
+import time
+
+import FieldObjectTracker as tracker_module
+from FieldObject import FieldObject
+from FieldObjectTracker import FieldObjectTracker
+
+Names = ("cone", "cube", "ball", "tag")
+PerFrame = 20
+
+
+# count tagged objects, then frames of detections of random ones at new distances
+def scenario(count, frames, rng):
+    objects = [(Names[index % len(Names)], index) for index in range(count)]
+    return [[(name, rng.uniform(0.2, 8.0), tag) for name, tag in rng.sample(objects, min(PerFrame, count))]
+            for _ in range(frames)], objects
+
+
+def runObjects(field, frames):
+    seen = {}
+    for frame, detections in enumerate(frames):
+        for name, distance, tag in detections:
+            for field_object in field:
+                if field_object.april_tag_id == tag:
+                    field_object.set_distance(distance)
+                    seen[id(field_object)] = frame
+                    break
+        min(field, key=lambda field_object: field_object.distance)
+        field = [field_object for field_object in field if frame - seen.get(id(field_object), frame) < 1000]
+
+
+def runTracker(tracker, frames):
+    for frame, detections in enumerate(frames):
+        tracker.update(detections, now=float(frame))
+        tracker.nearest()
+        tracker.evict(1000.0, now=float(frame))
+
+
+def main(frames=300):
+    rng = random.Random(5)
+    backend = "NumPy" if tracker_module.np is not None else "plain Python"
+    print(f"per camera frame ({PerFrame} detections, nearest query, eviction), FieldObjectTracker with {backend}:")
+    for count in (20, 200, 2000, 20000):
+        detections, objects = scenario(count, frames, rng)
+        field = [FieldObject(10.0, name, tag) for name, tag in objects]
+        start = time.perf_counter()
+        runObjects(field, detections)
+        naive = (time.perf_counter() - start) / frames
+        tracker = FieldObjectTracker()
+        tracker.update([(name, 10.0, tag) for name, tag in objects], now=0.0)
+        start = time.perf_counter()
+        runTracker(tracker, detections)
+        tracked = (time.perf_counter() - start) / frames
+        print(f"  {count:6d} objects: FieldObject list {naive * 1e6:10.1f} us   "
+              f"tracker {tracked * 1e6:8.1f} us   ({naive / tracked:.0f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,120 @@
+# Input-to-wire latency and traffic: fixed 30 Hz polling loop vs. change-gated TransmitScheduler.
+# A local receiver reads 4-byte frames the same way testcontrol.py does and timestamps them.
+# Simulated input changes at random times; each frame carries a counter of the changes seen
+# so the receiver can tell which change a frame delivered.
+# Run from the repository root:  python -m benchmarks.bench_transmit [seconds]
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+
+from MotorControlWatcher import FrameWatcher
+from TransmitScheduler import TransmitScheduler
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# Receiver thread: records (arrival time, counter) for every frame
+def receive(server, arrivals):
+    client, _ = server.accept()
+    buf = b''
+    while True:
+        data = client.recv(4096)
+        if not data:
+            break
+        now = time.perf_counter()
+        buf += data
+        while len(buf) >= 4:
+            arrivals.append((now, struct.unpack('!I', buf[:4])[0]))
+            buf = buf[4:]
+    client.close()
+
+
+# Input thread: bumps the counter at random times, like a driver moving a stick.
+# Alternates one second of stick movement with one second of hands-off idle.
+class SimulatedInput:
+    def __init__(self, duration, mean_interval=0.04):
+        self.counter = 0
+        self.changes = []  # time of change k is changes[k - 1]
+        self.event = threading.Event()  # stands in for a pygame joystick event
+        self.running = True
+        self.duration = duration
+        self.mean_interval = mean_interval
+
+    def run(self):
+        rng = random.Random(7)
+        start = time.perf_counter()
+        end = start + self.duration
+        while time.perf_counter() < end:
+            time.sleep(rng.expovariate(1.0 / self.mean_interval))
+            if int(time.perf_counter() - start) % 2:
+                continue
+            self.changes.append(time.perf_counter())
+            self.counter += 1
+            self.event.set()
+        self.running = False
+        self.event.set()
+
+
+def fixedTickLoop(client, source, rate=30):
+    interval = 1.0 / rate
+    next_tick = time.perf_counter()
+    while source.running:
+        client.send(struct.pack('!I', source.counter))
+        next_tick += interval
+        time.sleep(max(0.0, next_tick - time.perf_counter()))
+
+
+def scheduledLoop(client, source):
+    scheduler = TransmitScheduler(client.send, FrameWatcher(), keepalive_rate=5.0, max_rate=250.0)
+    while source.running:
+        source.event.wait(scheduler.timeout())
+        source.event.clear()
+        scheduler.offer(struct.pack('!I', source.counter))
+
+
+def run(loop, duration):
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen(1)
+    arrivals = []
+    receiver = threading.Thread(target=receive, args=(server, arrivals))
+    receiver.start()
+
+    client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    client.connect(server.getsockname())
+    source = SimulatedInput(duration)
+    inputs = threading.Thread(target=source.run)
+    inputs.start()
+    loop(client, source)
+    inputs.join()
+    time.sleep(0.1)
+    client.close()
+    receiver.join()
+    server.close()
+
+    latencies = []
+    index = 0
+    for change, changed_at in enumerate(source.changes, start=1):
+        while index < len(arrivals) and arrivals[index][1] < change:
+            index += 1
+        if index < len(arrivals):
+            latencies.append(arrivals[index][0] - changed_at)
+    return latencies, len(arrivals)
+
+
+def main(duration=5.0):
+    print(f"{'loop':18s} {'p50':>9s} {'p99':>9s} {'max':>9s} {'frames/s':>9s}")
+    for name, loop in (("fixed 30 Hz tick", fixedTickLoop), ("TransmitScheduler", scheduledLoop)):
+        latencies, frames = run(loop, duration)
+        print(f"{name:18s} {percentile(latencies, 0.5) * 1e3:6.2f} ms {percentile(latencies, 0.99) * 1e3:6.2f} ms "
+              f"{max(latencies) * 1e3:6.2f} ms {frames / duration:9.1f}")
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 5.0)
@@ -0,0 +1,153 @@
+# Frame latency over TCP vs. UDP on a simulated lossy link, all on the local machine.
+# Frames go sender -> impairment proxy -> testcontrol.RobotServer. The proxy adds delay and
+# jitter and loses packets: for UDP a lost datagram is dropped, for TCP a lost segment is
+# held back until it would be retransmitted and everything behind it waits (head-of-line
+# blocking). Latency is measured from the frame's protocol timestamp to the moment the
+# server applies it.
+# Run from the repository root:  python -m benchmarks.bench_transport [loss] [delay_ms]
+import asyncio
+import collections
+import heapq
+import random
+import socket
+import sys
+import threading
+import time
+
+import testcontrol
+from protocol import FrameEncoder, MsgDrive
+from transport import makeTransport
+
+
+def freePort():
+    probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    probe.bind(("127.0.0.1", 0))
+    port = probe.getsockname()[1]
+    probe.close()
+    return port
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+# RobotServer that records latency instead of driving motors
+class RecordingServer(testcontrol.RobotServer):
+    def __init__(self):
+        super().__init__(watchdog_timeout=5.0)
+        self.latencies = []
+
+    def apply(self, sequence, timestamp, values):
+        self.latencies.append((time.monotonic_ns() - timestamp) / 1e6)
+
+
+def startServer(port):
+    robot = RecordingServer()
+    testcontrol.stopMotors = lambda: None
+    thread = threading.Thread(target=asyncio.run, args=(testcontrol.serve("127.0.0.1", port, robot),), daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    return robot
+
+
+class Impairment:
+    def __init__(self, loss, delay, jitter, retransmit, seed=3):
+        self.loss = loss
+        self.delay = delay
+        self.jitter = jitter
+        self.retransmit = retransmit
+        self.rng = random.Random(seed)
+
+
+def udpProxy(listen_port, server_port, impairment, stop):
+    inbound = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    inbound.bind(("127.0.0.1", listen_port))
+    inbound.settimeout(0.001)
+    outbound = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    pending = []  # heap of (release time, order, datagram); jitter may reorder them
+    order = 0
+    while not stop.is_set() or pending:
+        try:
+            data = inbound.recv(2048)
+            if impairment.rng.random() >= impairment.loss:
+                release = time.monotonic() + impairment.delay + impairment.rng.uniform(0, impairment.jitter)
+                heapq.heappush(pending, (release, order, data))
+                order += 1
+        except socket.timeout:
+            pass
+        while pending and pending[0][0] <= time.monotonic():
+            outbound.sendto(heapq.heappop(pending)[2], ("127.0.0.1", server_port))
+    inbound.close()
+    outbound.close()
+
+
+def tcpProxy(listen_port, server_port, impairment, stop):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", listen_port))
+    listener.listen(1)
+    inbound, _ = listener.accept()
+    inbound.settimeout(0.001)
+    outbound = socket.create_connection(("127.0.0.1", server_port))
+    outbound.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    pending = collections.deque()  # (release time, data), in stream order
+    last_release = 0.0
+    while not stop.is_set() or pending:
+        try:
+            data = inbound.recv(4096)
+            if data:
+                release = time.monotonic() + impairment.delay + impairment.rng.uniform(0, impairment.jitter)
+                if impairment.rng.random() < impairment.loss:
+                    release += impairment.retransmit  # lost, arrives after retransmission
+                last_release = max(release, last_release)  # the stream stays in order
+                pending.append((last_release, data))
+        except socket.timeout:
+            pass
+        while pending and pending[0][0] <= time.monotonic():
+            outbound.sendall(pending.popleft()[1])
+    inbound.close()
+    outbound.close()
+    listener.close()
+
+
+def run(kind, impairment, frames, rate):
+    server_port = freePort()
+    robot = startServer(server_port)
+    proxy_port = freePort()
+    stop = threading.Event()
+    proxy = threading.Thread(target=udpProxy if kind == "udp" else tcpProxy,
+                             args=(proxy_port, server_port, impairment, stop))
+    proxy.start()
+    time.sleep(0.1)
+
+    client = makeTransport(kind, ("127.0.0.1", proxy_port))
+    client.connect()
+    encoder = FrameEncoder()
+    next_send = time.monotonic()
+    for i in range(frames):
+        client.send(encoder.encode(MsgDrive, bytes([i & 0xFF, 192, 64, 192])))
+        next_send += 1.0 / rate
+        time.sleep(max(0.0, next_send - time.monotonic()))
+    time.sleep(impairment.delay + impairment.jitter + impairment.retransmit + 0.1)
+    stop.set()
+    proxy.join()
+    client.close()
+    return robot.latencies
+
+
+def main(loss=0.05, delay=0.005, jitter=0.003, retransmit=0.04, frames=500, rate=100):
+    results = [(kind, run(kind, Impairment(loss, delay, jitter, retransmit), frames, rate)) for kind in ("tcp", "udp")]
+
+    print()
+    print(f"loss {loss:.0%}, delay {delay * 1e3:.0f} ms + up to {jitter * 1e3:.0f} ms jitter, "
+          f"TCP retransmit after {retransmit * 1e3:.0f} ms, {frames} frames at {rate} Hz")
+    print(f"{'transport':10s} {'applied':>8s} {'p50':>9s} {'p99':>9s}")
+    for kind, latencies in results:
+        print(f"{kind:10s} {len(latencies) / frames:8.1%} {percentile(latencies, 0.5):6.2f} ms "
+              f"{percentile(latencies, 0.99):6.2f} ms")
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    main(loss=float(args[0]) if args else 0.05,
+         delay=float(args[1]) / 1e3 if len(args) > 1 else 0.005)
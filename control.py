@@ -1,165 +1,46 @@
-import platform
-import pygame
-import socket
-import time
+import argparse
 import struct
-import subprocess
-import re
+import time
+from ControllerArbiter import ControllerArbiter
+from ControllerReader import ControllerState
+from MappingRegistry import MappingRegistry, MappingsPath
+from mecanum import mecanumWheel
+from quantize import MotorEncoder
+from shaping import makeShaper
+from MotorControlWatcher import FrameWatcher
+from TransmitScheduler import TransmitScheduler
+from input_backend import PygameBackend, JoyAdded, JoyRemoved, Quit
+from protocol import FrameEncoder, MsgControl
+from transport import makeTransport
+from ConnectionManager import ConnectionManager
+from TelemetryReceiver import TelemetryReceiver, renderTelemetry
+from ConsoleRenderer import ConsoleRenderer
+from RobotDiscovery import DiscoveryPort, RobotDiscovery, normalizeMac, readArpTable
+from StageTimers import StageTimers
+from settings import parseSettings, settingsParser
 
 
 def get_ip_from_mac(mac_address):
-    os = platform.system()
-    if os == "Windows":
-        mac_address = mac_address.replace(":", "-")
-    try:
-        arp_output = subprocess.check_output(['arp', '-a'], text=True)
-        arp_lines = arp_output.splitlines()
-        for line in arp_lines:
-            if mac_address in line:
-                ip_address = re.search(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', line)
-                if ip_address:
-                    return ip_address.group(0)
-                return None
-    except subprocess.CalledProcessError:
-         return None
-
-pygame.init()
-
-# Standardized Names
-Button = "Button"
-Axis = "Axis"
-Hat = "Hat"
-
-LeftBumper = "LB"
-RightBumper = "RB"
-LeftTrigger = "LT"
-RightTrigger = "RT"
-
-AButton = "A"
-BButton = "B"
-XButton = "X"
-YButton = "Y"
-HomeButton = "HOME"
-
-LeftJoyLeftRight = "LJ_LR"
-LeftJoyUpDown = "LJ_UD"
-LeftJoyIn = "LJ_IN"
-RightJoyLeftRight = "RJ_LR"
-RightJoyUpDown = "RJ_UD"
-RightJoyIn = "RJ_IN"
-
-DpadLeftRight = "D_LR"
-DpadUpDown = "D_UD"
-
-ControllerMappings = {
-    "Pro Controller": {
-        AButton: (Button, 1), BButton: (Button, 0),
-        XButton: (Button, 2), YButton: (Button, 3),
-        LeftBumper: (Button, 5),  RightBumper: (Button, 6),
-        LeftTrigger: (Button, 7), RightTrigger: (Button, 8),
-        LeftJoyIn: (Button, 12),  RightJoyIn: (Button, 13),
-        HomeButton: (Button, 11),
-
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 2, 1), RightJoyUpDown: (Axis, 3, -1),
-
-        DpadLeftRight: (Hat, 0, 0), DpadUpDown: (Hat, 0, 1),
-    },
-
-    "Xbox One S Controller": {
-        AButton: (Button, 0), BButton: (Button, 1),
-        XButton: (Button, 3), YButton: (Button, 4),
-        LeftBumper: (Button, 6),  RightBumper: (Button, 7),
-        LeftTrigger: (Axis, 4, 1), RightTrigger: (Axis, 5, 1),
-        LeftJoyIn: (Button, 13),  RightJoyIn: (Button, 14),
-        HomeButton: (Button, 12),
-
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 2, 1), RightJoyUpDown: (Axis, 3, -1),
-
-        DpadLeftRight: (Hat, 0, 0), DpadUpDown: (Hat, 0, 1),
-    },
-    "Xbox 360 Controller": {
-        AButton: (Button, 0), BButton: (Button, 1),
-        XButton: (Button, 3), YButton: (Button, 2),
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 3, 1), RightJoyUpDown: (Axis, 4, -1),
-        LeftBumper: (Button, 4),  RightBumper: (Button, 5),
-        LeftTrigger: (Axis, 4, 1), RightTrigger: (Axis, 5, 1),
-    },
-    "DualSense Wireless Controller": {
-        AButton: (Button, 0), BButton: (Button, 1),
-        XButton: (Button, 3), YButton: (Button, 2),
-        LeftBumper: (Button, 4),  RightBumper: (Button, 5),
-        LeftTrigger: (Axis, 2, 1), RightTrigger: (Axis, 5, 1),
-        LeftJoyIn: (Button, 13),  RightJoyIn: (Button, 14),
-        HomeButton: (Button, 12),
-
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 3, 1), RightJoyUpDown: (Axis, 4, -1),
-
-        DpadLeftRight: (Hat, 0, 0), DpadUpDown: (Hat, 0, 1),
-    }
-}
-
-
-def pollJoy(joystick, input_source):
-    name = joystick.get_name()
-    controllerMap = ControllerMappings.get(name, False)
-    source = controllerMap.get(input_source, False)
-
-    if source[0] == Button:
-        return joystick.get_button(source[1])
-
-    if source[0] == Axis:
-        if (source[2] < 0):
-            return joystick.get_axis(source[1])
-        return joystick.get_axis(source[1])
-
-    if source[0] == Hat:
-        return joystick.get_hat(source[1])[source[2]]
-
-    print(f"Unable to find source \"{source}\".")
-    exit(1)
-
-
-def calculateMecanumWheel(joystick, deadzone, maxspeed):
-    speed = pollJoy(joystick, LeftJoyUpDown) * -1 
-    strafe = pollJoy(joystick, LeftJoyLeftRight)
-    turn = pollJoy(joystick, RightJoyLeftRight)
-
-    deadzone = abs(deadzone) 
-
-    if turn >= -deadzone and turn <= deadzone:
-        turn = 0
-    if speed >= -deadzone and speed <= deadzone:
-        speed = 0
-    if strafe >= -deadzone and strafe <= deadzone:
-        strafe = 0
-
-    # Map joysticks onto mecanum wheels
-    lFwd = speed + strafe + turn
-    lBwd = speed - strafe - turn
-    rFwd = speed - strafe + turn
-    rBwd = speed + strafe - turn
-
-    # Calculate if any values exceed 1
-    peak = max(abs(lFwd), abs(lBwd), abs(rFwd), abs(rBwd), 1)
-
-    # divide by that value so no value exceeds 1
-    lFwd /= peak
-    lBwd /= peak
-    rFwd /= peak
-    rBwd /= peak
-
-    lFwd *= maxspeed
-    lBwd *= maxspeed
-    rFwd *= maxspeed
-    rBwd *= maxspeed
-
-    return (lFwd, lBwd, rFwd, rBwd)
+    return readArpTable().get(normalizeMac(mac_address))
+
+
+# shaper/now: see calculateMecanumWheel in operator_control.py
+def calculateMecanumWheel(state, deadzone, maxspeed, shaper=None, now=0.0):
+    speed = state.lj_ud * -1
+    strafe = state.lj_lr
+    turn = state.rj_lr
+    if shaper is not None:
+        speed, strafe, turn = shaper.shape(speed, strafe, turn, now)
+        deadzone = 0
+
+    # This robot's left back and right front motors are wired swapped relative to
+    # operator_control.py, so the middle two wheel values trade places
+    lf, rf, lb, rb = mecanumWheel(speed, strafe, turn, deadzone, maxspeed)
+    return (lf, lb, rf, rb)
 
 
+# Reference version of the motor byte mapping; main() encodes with MotorEncoder(64, negate=False)
+# from quantize.py, which gives the same bytes
 def remap(ch1, ch2):
     if (ch2 > 0):
         return (int(ch1*63+64), int(ch2*63+192))
@@ -167,32 +48,145 @@ def remap(ch1, ch2):
         return (int(ch1*63+64), int(ch2*64+192))
     
 
+# Robot frame&motor power visualizer, followed by the remapped bytes
+def renderDashboard(snapshot):
+    (lf_power, rf_power, lb_power, rb_power, lf, rf, lb, rb, dpad_value_1, dpad_value_2,
+     a, y, rt_trigger, lt_trigger, lb_button, rb_button, ip_address, connected, control, telemetry) = snapshot
+    return ("\\===\\-----/===/\n" +
+            f"\\{lf_power*100:3.0f}\\     /{rf_power*100:3.0f}/\n" +
+            "\\===\\     /===/\n" +
+            ("   |       |\n" * 3) +
+            "/===/     \\===\\\n" +
+            f"/{lb_power*100:3.0f}/     \\{rb_power*100:3.0f}\\\n" +
+            "/===/-----\\===\\\n\n" +
+            f"{lf:3d}\t{rf:3d}\n{lb:3d}\t{rb:3d}\t{dpad_value_1: 3d}\t{dpad_value_2: 3d}\t{a: 3d}\t{y: 3d}\t{rt_trigger: 3d}\t{lt_trigger: 3d}\t{lb_button: 3d}\t {rb_button: 3d}\t {a: 3d}\t{y: 3d}\n" +
+            f"{ip_address} {'connected' if connected else 'not connected'}\n" +
+            f"Control: {control}\n" +
+            renderTelemetry(telemetry))
+
+
+ip_address = "127.0.0.1"
+port = 9999
 connect = True
-
-
-def main():
-    clock = pygame.time.Clock()
+transport = "tcp"
+keepalive_rate = 5.0
+max_rate = 250.0
+robot_mac = None  # find the robot by MAC address (RobotDiscovery.py) instead of using ip_address
+discovery_beacon = True
+deadzone = 0.08
+maxspeed = 0.8
+expo = 0.0  # see operator_control.py for the shaping settings
+slew_rate = 0.0
+input_step = 1 / 64
+dashboard_rate = 10.0  # console redraws per second, 0 turns the console off
+arbitration = "takeover"  # "takeover", "priority" or "merge", see ControllerArbiter.py
+mappings_path = MappingsPath
+mapping_reload = 1.0  # seconds between checks for edited mapping files, 0 to not reload them
+stats_interval = 0  # seconds between per-stage timing summaries, 0 turns the timers off
+stats_port = None  # serve the latest timing summary as JSON on http://127.0.0.1:<port>/
+telemetry_buffer = 64  # robot telemetry samples kept until the loop reads them; the oldest are dropped
+
+# The 10 bytes after the motor bytes: rb_button, lb_button, dpad_value_1, dpad_value_2,
+# rt_trigger, lt_trigger, x, b, a, y
+ControlFields = struct.Struct('!10B')
+
+
+def main(backend=None):
+    if backend is None:
+        backend = PygameBackend()
     joysticks = {}
-
-    ip_address = "127.0.0.1"
+    readers = {}
+    states = {}
+    arbiter = ControllerArbiter(arbitration)
+
+    mappings = MappingRegistry(mappings_path)
+    mapping_version = mappings.version
+    if mapping_reload:
+        mappings.watch(mapping_reload)
+
+    address = ip_address
+
+    discovery = None
+    resolve = None
+    unreachable = None
+    if robot_mac:
+        discovery = RobotDiscovery(beacon_port=DiscoveryPort if discovery_beacon else None)
+        discovery.start()
+        address = discovery.lookup(robot_mac) or address
+        resolve = discovery.resolver(robot_mac, port)
+        unreachable = discovery.invalidator(robot_mac)
 
     # Initalizes socket to
+    # What the robot reports back is read on the connection's own thread into a bounded buffer
+    telemetry = TelemetryReceiver(telemetry_buffer)
+    client = ConnectionManager(makeTransport(transport, (address, port)), resolve=resolve, receiver=telemetry,
+                               unreachable=unreachable)
     if connect:
-        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client.connect((ip_address, 9999))
+        client.start()
+
+    # Wraps each payload in a protocol header (sequence number, timestamp)
+    encoder = FrameEncoder()
+
+    def send(frame):
+        if connect:
+            client.send(encoder.encode(MsgControl, frame))
+
+    # Send as soon as any of the 14 bytes change, otherwise at the keepalive rate
+    scheduler = TransmitScheduler(send, FrameWatcher(), keepalive_rate, max_rate)
+
+    # One reused 14-byte frame: motor bytes from lookup tables, then the button fields
+    motor_encoder = MotorEncoder(negative_scale=64, negate=False, frame_size=4 + ControlFields.size)
+
+    shaper = makeShaper(deadzone, expo, slew_rate, input_step)
+    ramp_interval = 1.0 / max_rate if max_rate else 0.0
+
+    # Console output is drawn from its own thread at a capped rate
+    renderer = None
+    if dashboard_rate:
+        renderer = ConsoleRenderer(renderDashboard, dashboard_rate)
+        renderer.start()
+
+    # Per-stage timing histograms (see StageTimers.py); None when turned off
+    stats = None
+    if stats_interval:
+        stats = StageTimers(stats_interval)
+        if stats_port:
+            stats.serve(stats_port)
+    last_sent = None
 
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        if stats is not None:
+            stats.start()
+        timeout = scheduler.timeout()
+        # A slew-limited ramp only moves when the loop shapes again, so keep waking at max_rate
+        if shaper.settling():
+            timeout = min(timeout, ramp_interval)
+        for event in backend.poll(timeout):
+            if event[0] == Quit:
+                client.stop()
+                if stats is not None:
+                    stats.stop()
+                mappings.stop()
+                if discovery is not None:
+                    discovery.stop()
+                if renderer is not None:
+                    renderer.stop()
+                backend.close()
                 return
 
             # Handle hotplugging
-            if event.type == pygame.JOYDEVICEADDED:
-                joy = pygame.joystick.Joystick(event.device_index)
+            if event[0] == JoyAdded:
+                joy = event[1]
                 joysticks[joy.get_instance_id()] = joy
+                readers[joy.get_instance_id()] = mappings.reader(joy)
+                states[joy.get_instance_id()] = ControllerState()
+                arbiter.add(joy.get_instance_id())
                 print(f"{joy.get_name()}, connencted") 
-            if event.type == pygame.JOYDEVICEREMOVED:
-                del joysticks[event.instance_id]
+            if event[0] == JoyRemoved:
+                joy = joysticks.pop(event[1])
+                del readers[event[1]]
+                del states[event[1]]
+                arbiter.remove(event[1])
                 print(f"{joy.get_name()}, disconnected")
 
         lf, lb, rf, rb = 0, 0, 0, 0
@@ -201,63 +195,92 @@ def main():
         dpad_value_1 = 0
         dpad_value_2 = 0
         a, b, x, y = 0, 0, 0, 0
+        if stats is not None:
+            stats.lap("wait")  # blocked in poll, plus hotplug handling
+            busy = stats.last
+
+        # Mapping files changed: swap in freshly compiled readers for every pad
+        if mappings.version != mapping_version:
+            mapping_version = mappings.version
+            readers = {instance_id: mappings.reader(joy) for instance_id, joy in joysticks.items()}
+
+        for instance_id, reader in readers.items():
+            reader.read(states[instance_id])
 
-        for joystick in joysticks.values():
-            lf, lb, rf, rb = calculateMecanumWheel(joystick, 0.08, 0.8)
+        state = arbiter.merge(states)
+        if state is None:
+            shaper.reset()
+        else:
+            lf, lb, rf, rb = calculateMecanumWheel(state, deadzone, maxspeed, shaper, time.monotonic())
 
-            lb_button = pollJoy(joystick, LeftBumper) 
-            rb_button = pollJoy(joystick, RightBumper)
+            lb_button = state.lb
+            rb_button = state.rb
 
-            dpad_value_1 = pollJoy(joystick, DpadUpDown) + 1
-            dpad_value_2 = pollJoy(joystick, DpadLeftRight) + 1
+            dpad_value_1 = state.d_ud + 1
+            dpad_value_2 = state.d_lr + 1
 
-            b = pollJoy(joystick, BButton)
-            x = pollJoy(joystick, XButton)
-            y = pollJoy(joystick, YButton)
-            a = pollJoy(joystick, AButton)
+            b = state.b
+            x = state.x
+            y = state.y
+            a = state.a
 
-            rt_trigger = pollJoy(joystick, RightTrigger) + 1 
-            lt_trigger = pollJoy(joystick, LeftTrigger) + 1
+            rt_trigger = state.rt + 1
+            lt_trigger = state.lt + 1
 
             rt_trigger = int(rt_trigger)
             lt_trigger = int(lt_trigger)
-
-        # Robot frame&motor power visualizer
-        print("\\===\\-----/===/\n" +
-              f"\\{lf*100:3.0f}\\     /{rf*100:3.0f}/\n" +
-              "\\===\\     /===/\n" +
-              ("   |       |\n" * 3) +
-              "/===/     \\===\\\n" +
-              f"/{lb*100:3.0f}/     \\{rb*100:3.0f}\\\n" +
-              "/===/-----\\===\\\n")
-
-        lb, lf = remap(lb, lf)
-        rb, rf = remap(rf, rb)
-        
-        print(f"{lf:3d}\t{rf:3d}\n{lb:3d}\t{rb:3d}\t{dpad_value_1: 3d}\t{dpad_value_2: 3d}\t{a: 3d}\t{y: 3d}\t{rt_trigger: 3d}\t{lt_trigger: 3d}\t{lb_button: 3d}\t {rb_button: 3d}\t {a: 3d}\t{y: 3d} \n\n")
-        print(ip_address)
-        
-        if connect:
-            try:
-                client.send(struct.pack('!' + 'B'*14,
-                                        rb, rf, lb, lf,
-                                        rb_button, lb_button,
-                                        dpad_value_1, dpad_value_2, rt_trigger,lt_trigger, x, b, a, y))
-            except (ConnectionResetError, BrokenPipeError):
-                client.close()
-                print("connection refused")
-                while(True):
-                    try:
-                        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        client.connect((ip_address, 9999))
-                        break
-                    except (ConnectionRefusedError, BrokenPipeError):
-                        time.sleep(0.1)
-                print("reconnected")
-
-        clock.tick(30)
+        if stats is not None:
+            stats.lap("read+kinematics")
+
+        powers = (lf, rf, lb, rb)
+
+        frame = motor_encoder.encode(lf, lb, rf, rb)
+        rb, rf, lb, lf = frame[0], frame[1], frame[2], frame[3]
+        if stats is not None:
+            stats.lap("encode")
+
+        if renderer is not None:
+            renderer.update(powers + (lf, rf, lb, rb, dpad_value_1, dpad_value_2, a, y, rt_trigger, lt_trigger,
+                                      lb_button, rb_button, client.transport.address[0], client.connected, arbiter.status(),
+                                      telemetry.latest))
+        if stats is not None:
+            stats.lap("render")
+
+        ControlFields.pack_into(frame, 4,
+                                rb_button, lb_button,
+                                dpad_value_1, dpad_value_2, rt_trigger,lt_trigger, x, b, a, y)
+        sent = scheduler.offer(frame)
+
+        if stats is not None:
+            stats.lap("send")
+            stats.record("loop", stats.last - busy)  # everything but the wait
+            if sent:
+                if last_sent is not None:
+                    stats.record("send interval", stats.last - last_sent)
+                last_sent = stats.last
+            # the robot's side, from the telemetry that arrived since the last frame
+            for sample in telemetry.take():
+                stats.record("robot frame age", sample[6] / 1e6)
+                stats.record("robot motor write", sample[9] / 1e6)
+            stats.maybeReport()
+
+
+# Command line options override the settings above (see settings.py)
+def parseArgs(argv=None):
+    parser = settingsParser("Drive the robot with a gamepad, 14-byte control frames")
+    parser.add_argument("--ip", dest="ip_address", help=f"robot server address (default {ip_address})")
+    parser.add_argument("--port", type=int, help=f"robot server port (default {port})")
+    parser.add_argument("--connect", action=argparse.BooleanOptionalAction,
+                        help=f"send to the robot server (default {'on' if connect else 'off'})")
+    parser.add_argument("--transport", choices=("tcp", "udp"), help=f"default {transport}")
+    parser.add_argument("--rate", dest="max_rate", type=float,
+                        help=f"most frames per second while input keeps changing, 0 for no cap (default {max_rate:g})")
+    parser.add_argument("--deadzone", type=float, help=f"default {deadzone:g}")
+    parser.add_argument("--maxspeed", type=float, help=f"motor output scale (default {maxspeed:g})")
+    parser.add_argument("--robot-mac", dest="robot_mac", help="find the robot by MAC address instead of --ip")
+    return parseSettings(globals(), parser, argv)
 
 
 if __name__ == "__main__":
+    parseArgs()
     main()
-    pygame.quit()
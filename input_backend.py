@@ -0,0 +1,155 @@
+import time
+
+from FlightRecorder import loadRecording
+
+# Input backends feed the control loop with joystick events and joystick objects.
+#
+# PygameBackend  real controllers through pygame (imported lazily, on first use)
+# ScriptedBackend synthetic controllers driven by a script function, for headless tests
+#                 and benchmarks without devices or a display
+# ReplayBackend  stick inputs from a FlightRecorder file
+#
+# Every backend has poll(timeout), which waits up to timeout seconds for input and returns
+# a list of events:
+#   (JoyAdded, joystick)       a controller appeared; joystick has get_name, get_instance_id,
+#                              get_axis, get_button and get_hat like pygame.joystick.Joystick
+#   (JoyRemoved, instance_id)  a controller went away
+#   (Quit,)                    the loop should stop
+# An empty list means only that the timeout passed or input may have changed.
+
+JoyAdded = "JoyAdded"
+JoyRemoved = "JoyRemoved"
+Quit = "Quit"
+
+
+class PygameBackend:
+    def __init__(self):
+        import pygame  # lazy: headless backends never load SDL
+        self.pygame = pygame
+        # Only what joystick events need; pygame.init() would also start audio, fonts, etc.
+        # The event queue lives in the video subsystem, but no window is opened.
+        pygame.display.init()
+        pygame.joystick.init()
+
+    # Joystick motion, buttons and hats all post events, so this wakes up as soon as input changes
+    def poll(self, timeout):
+        pygame = self.pygame
+        events = pygame.event.get()
+        if not events and timeout > 0:
+            event = pygame.event.wait(max(1, int(timeout * 1000)))
+            if event.type != pygame.NOEVENT:
+                events = [event] + pygame.event.get()
+
+        result = []
+        for event in events:
+            if event.type == pygame.QUIT:
+                result.append((Quit,))
+            elif event.type == pygame.JOYDEVICEADDED:
+                result.append((JoyAdded, pygame.joystick.Joystick(event.device_index)))
+            elif event.type == pygame.JOYDEVICEREMOVED:
+                result.append((JoyRemoved, event.instance_id))
+        return result
+
+    def close(self):
+        self.pygame.quit()
+
+
+# Stand-in for pygame.joystick.Joystick whose inputs are plain lists that can be set directly
+class SimulatedJoystick:
+    def __init__(self, name, instance_id, axes=6, buttons=16, hats=1):
+        self.name = name
+        self.instance_id = instance_id
+        self.axes = [0.0] * axes
+        self.buttons = [0] * buttons
+        self.hats = [(0, 0)] * hats
+
+    def get_name(self):
+        return self.name
+
+    def get_instance_id(self):
+        return self.instance_id
+
+    def get_axis(self, index):
+        return self.axes[index]
+
+    def get_button(self, index):
+        return self.buttons[index]
+
+    def get_hat(self, index):
+        return self.hats[index]
+
+
+# Synthetic input: script(frame, joysticks) is called once per poll to update the simulated
+# joysticks, and returns False to end the run (or frames runs out).
+# With rate=None poll never sleeps, so the loop runs as fast as it can; otherwise frames
+# are paced at `rate` per second.
+class ScriptedBackend:
+    def __init__(self, script, names=("Xbox One S Controller",), frames=None, rate=None):
+        self.script = script
+        self.joysticks = [SimulatedJoystick(name, instance_id) for instance_id, name in enumerate(names)]
+        self.frames = frames
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_frame = None
+        self.frame = 0
+        self.added = False
+
+    def poll(self, timeout):
+        if not self.added:
+            self.added = True
+            return [(JoyAdded, joystick) for joystick in self.joysticks]
+        if self.frames is not None and self.frame >= self.frames:
+            return [(Quit,)]
+        if self.interval:
+            now = time.monotonic()
+            if self.next_frame is None:
+                self.next_frame = now
+            elif self.next_frame > now:
+                time.sleep(self.next_frame - now)
+            self.next_frame += self.interval
+
+        keep_going = self.script(self.frame, self.joysticks)
+        self.frame += 1
+        if keep_going is False:
+            return [(Quit,)]
+        return []
+
+    def close(self):
+        pass
+
+
+# Plays back the stick inputs of a flight recording on one simulated controller.
+# controllerMap is the mapping entry for `name`, used to find which axes the left stick
+# and right stick X live on. realtime=True keeps the recorded timing.
+class ReplayBackend:
+    def __init__(self, path, controllerMap, name="Xbox One S Controller", realtime=False):
+        self.records = loadRecording(path)
+        self.joystick = SimulatedJoystick(name, 0)
+        self.speed_axis = controllerMap["LJ_UD"][1]
+        self.strafe_axis = controllerMap["LJ_LR"][1]
+        self.turn_axis = controllerMap["RJ_LR"][1]
+        self.realtime = realtime
+        self.index = -1  # -1: controller not announced yet
+        self.start = None
+
+    def poll(self, timeout):
+        if self.index < 0:
+            self.index = 0
+            self.start = time.monotonic()
+            return [(JoyAdded, self.joystick)]
+        if self.index >= len(self.records):
+            return [(Quit,)]
+
+        t, speed, strafe, turn = self.records[self.index][:4]
+        if self.realtime:
+            delay = self.start + (t - self.records[0][0]) - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        axes = self.joystick.axes
+        axes[self.speed_axis] = speed
+        axes[self.strafe_axis] = strafe
+        axes[self.turn_axis] = turn
+        self.index += 1
+        return []
+
+    def close(self):
+        pass
@@ -0,0 +1,63 @@
+# Mecanum drive kinematics as pure functions (no joystick or pygame access).
+# mecanumWheel works on one (speed, strafe, turn) sample, mecanumWheels on whole arrays of
+# samples at once, which is what offline replays of logged stick data want.
+# Wheel order everywhere is (left front, left back, right front, right back).
+
+from optional import lazyImport
+
+np = lazyImport("numpy")  # NumPy is optional, mecanumWheels falls back to plain Python; imported on first use
+
+
+# Zero out small joystick noise. deadzone is the largest magnitude that still counts as 0.
+def applyDeadzone(value, deadzone):
+    if value >= -deadzone and value <= deadzone:
+        return 0
+    return value
+
+
+# Convert one (speed, strafe, turn) sample into four wheel powers.
+# deadzone: small joystick noise threshold
+# maxspeed: scale factor for motor outputs
+def mecanumWheel(speed, strafe, turn, deadzone, maxspeed):
+    deadzone = abs(deadzone)
+    speed = applyDeadzone(speed, deadzone)
+    strafe = applyDeadzone(strafe, deadzone)
+    turn = applyDeadzone(turn, deadzone)
+
+    # Map joysticks onto mecanum wheel contributions
+    lFwd = speed + strafe + turn
+    lBwd = speed - strafe + turn
+    rFwd = speed - strafe - turn
+    rBwd = speed + strafe - turn
+
+    # Normalize so none exceed magnitude 1, then scale to the desired max speed
+    peak = max(abs(lFwd), abs(lBwd), abs(rFwd), abs(rBwd), 1)
+    return (lFwd / peak * maxspeed, lBwd / peak * maxspeed,
+            rFwd / peak * maxspeed, rBwd / peak * maxspeed)
+
+
+# Batch version of mecanumWheel over equally long sequences of speed, strafe and turn.
+# Returns an (N, 4) NumPy array, or a list of N 4-tuples when NumPy is not installed.
+# Results match mecanumWheel sample for sample.
+def mecanumWheels(speed, strafe, turn, deadzone, maxspeed):
+    if np is None:
+        return [mecanumWheel(s, st, t, deadzone, maxspeed) for s, st, t in zip(speed, strafe, turn)]
+
+    deadzone = abs(deadzone)
+    speed = np.asarray(speed, dtype=np.float64)
+    strafe = np.asarray(strafe, dtype=np.float64)
+    turn = np.asarray(turn, dtype=np.float64)
+    speed = np.where(np.abs(speed) <= deadzone, 0.0, speed)
+    strafe = np.where(np.abs(strafe) <= deadzone, 0.0, strafe)
+    turn = np.where(np.abs(turn) <= deadzone, 0.0, turn)
+
+    wheels = np.empty((speed.shape[0], 4), dtype=np.float64)
+    wheels[:, 0] = speed + strafe + turn
+    wheels[:, 1] = speed - strafe + turn
+    wheels[:, 2] = speed - strafe - turn
+    wheels[:, 3] = speed + strafe - turn
+
+    peak = np.maximum(np.abs(wheels).max(axis=1), 1.0)
+    wheels /= peak[:, None]
+    wheels *= maxspeed
+    return wheels
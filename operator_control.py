@@ -1,118 +1,40 @@
-import platform
-import pygame
-import socket
+import argparse
 import time
-import struct
-import subprocess
-import re
-from MotorControlWatcher import MotorControlWatcher
+import signal
+from MotorControlWatcher import MotorControlWatcher, FrameWatcher
+from TransmitScheduler import TransmitScheduler
+from protocol import FrameEncoder, MsgDrive
+from transport import makeTransport
+from ConnectionManager import ConnectionManager
+from FleetSender import FleetRoute, FleetSender, fleetTargets
+from FlightRecorder import FlightRecorder
+from ConsoleRenderer import ConsoleRenderer
+from StageTimers import StageTimers
+from TelemetryReceiver import TelemetryReceiver, renderTelemetry
+from ControllerArbiter import ControllerArbiter
+from ControllerReader import Axis, Button, ControllerState, Hat
+from MappingRegistry import MappingRegistry, MappingsPath, defaultRegistry
+from mecanum import mecanumWheel
+from quantize import MotorEncoder
+from shaping import makeShaper
+from input_backend import PygameBackend, JoyAdded, JoyRemoved, Quit
+from RobotDiscovery import DiscoveryPort, RobotDiscovery, normalizeMac, readArpTable
+from settings import parseSettings, settingsParser
 
 # Helper to find an IP address in the local ARP table by MAC address.
+# One uncached read of the table; main() uses a RobotDiscovery that caches and refreshes.
 def get_ip_from_mac(mac_address):
-    os = platform.system()
-    if os == "Windows":
-        mac_address = mac_address.replace(":", "-")  # Windows arp output uses dashes
-    try:
-        # run `arp -a` and search lines for the MAC address
-        arp_output = subprocess.check_output(['arp', '-a'], text=True)
-        arp_lines = arp_output.splitlines()
-        for line in arp_lines:
-            if mac_address in line:
-                # extract the first IPv4-looking substring
-                ip_address = re.search(r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})', line)
-                if ip_address:
-                    return ip_address.group(0)
-                return None
-    except subprocess.CalledProcessError:
-         return None
-
-
-# Standardized input type names used in mapping table
-Button = "Button"
-Axis = "Axis"
-Hat = "Hat"
-
-# Logical names for buttons/axes used by the rest of the program
-LeftBumper = "LB"
-RightBumper = "RB"
-LeftTrigger = "LT"
-RightTrigger = "RT"
-
-AButton = "A"
-BButton = "B"
-XButton = "X"
-YButton = "Y"
-HomeButton = "HOME"
-
-LeftJoyLeftRight = "LJ_LR"
-LeftJoyUpDown = "LJ_UD"
-LeftJoyIn = "LJ_IN"
-RightJoyLeftRight = "RJ_LR"
-RightJoyUpDown = "RJ_UD"
-RightJoyIn = "RJ_IN"
-
-DpadLeftRight = "D_LR"
-DpadUpDown = "D_UD"
-
-# Controller mappings: maps controller name to how its inputs map to our logical names.
-# Each mapping entry is a tuple: (type, index, optional_sign_or_hat_index)
-ControllerMappings = {
-    "Pro Controller": {
-        AButton: (Button, 1), BButton: (Button, 0),
-        XButton: (Button, 2), YButton: (Button, 3),
-        LeftBumper: (Button, 5),  RightBumper: (Button, 6),
-        LeftTrigger: (Button, 7), RightTrigger: (Button, 8),
-        LeftJoyIn: (Button, 12),  RightJoyIn: (Button, 13),
-        HomeButton: (Button, 11),
-
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 2, 1), RightJoyUpDown: (Axis, 3, -1),
-
-        DpadLeftRight: (Hat, 0, 0), DpadUpDown: (Hat, 0, 1),
-    },
-
-    "Xbox One S Controller": {
-        AButton: (Button, 0), BButton: (Button, 1),
-        XButton: (Button, 3), YButton: (Button, 4),
-        LeftBumper: (Button, 6),  RightBumper: (Button, 7),
-        LeftTrigger: (Axis, 4, 1), RightTrigger: (Axis, 5, 1),
-        LeftJoyIn: (Button, 13),  RightJoyIn: (Button, 14),
-        HomeButton: (Button, 12),
-
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 2, 1), RightJoyUpDown: (Axis, 3, -1),
-
-        DpadLeftRight: (Hat, 0, 0), DpadUpDown: (Hat, 0, 1),
-    },
-    "Xbox 360 Controller": {
-        AButton: (Button, 0), BButton: (Button, 1),
-        XButton: (Button, 3), YButton: (Button, 2),
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 3, 1), RightJoyUpDown: (Axis, 4, -1),
-        LeftBumper: (Button, 4),  RightBumper: (Button, 5),
-        LeftTrigger: (Axis, 4, 1), RightTrigger: (Axis, 5, 1),
-    },
-    "DualSense Wireless Controller": {
-        AButton: (Button, 0), BButton: (Button, 1),
-        XButton: (Button, 3), YButton: (Button, 2),
-        LeftBumper: (Button, 4),  RightBumper: (Button, 5),
-        LeftTrigger: (Axis, 2, 1), RightTrigger: (Axis, 5, 1),
-        LeftJoyIn: (Button, 13),  RightJoyIn: (Button, 14),
-        HomeButton: (Button, 12),
-
-        LeftJoyLeftRight: (Axis, 0, 1),  LeftJoyUpDown: (Axis, 1, -1),
-        RightJoyLeftRight: (Axis, 3, 1), RightJoyUpDown: (Axis, 4, -1),
-
-        DpadLeftRight: (Hat, 0, 0), DpadUpDown: (Hat, 0, 1),
-    }
-}
+    return readArpTable().get(normalizeMac(mac_address))
 
 
 # Read a logical input (input_source) from a pygame joystick using the mapping table.
+# Looks the mapping up on every call; the control loop uses compiled ControllerReaders.
 def pollJoy(joystick, input_source):
     name = joystick.get_name()
-    controllerMap = ControllerMappings.get(name, False)  # get mapping for this controller
-    source = controllerMap.get(input_source, False)  # get how this logical input is implemented
+    _, controllerMap = defaultRegistry().lookup(name)  # get mapping for this controller
+    source = controllerMap.get(input_source)  # get how this logical input is implemented
+    if source is None:
+        return 0  # the pad has no such input
 
     if source[0] == Button:
         # read a digital button
@@ -134,50 +56,22 @@ def pollJoy(joystick, input_source):
 
 
 # Convert joystick axes into four mecanum wheel values.
+# state: ControllerState filled in by a ControllerReader
 # deadzone: small joystick noise threshold
 # maxspeed: scale factor for motor outputs
-def calculateMecanumWheel(joystick, deadzone, maxspeed):
-    speed = pollJoy(joystick, LeftJoyUpDown)       # forward/back
-    strafe = pollJoy(joystick, LeftJoyLeftRight)   # left/right
-    turn = pollJoy(joystick, RightJoyLeftRight)    # rotation
-
-    deadzone = abs(deadzone)  # ensure positive
-
-    # apply deadzone to ignore small joystick noise
-    if turn > -deadzone and turn < deadzone:
-        turn = 0
-    if speed > -deadzone and speed < deadzone:
-        speed = 0
-    if strafe > -deadzone and speed < deadzone:
-        strafe = 0
-
-    # debug prints for joystick raw values
-    print("Deadzone: ", f"{deadzone}")
-    print("Turn: ", f"{turn}")
-    print("Strafe: ", f"{strafe}")
-    print("Speed: ", f"{speed}")
-
-    # Map joysticks onto mecanum wheel contributions
-    lFwd = speed + strafe + turn
-    rFwd = speed - strafe - turn
-    lBwd = speed - strafe + turn
-    rBwd = speed + strafe - turn
-
-    # Normalize so none exceed magnitude 1
-    peak = max(abs(lFwd), abs(lBwd), abs(rFwd), abs(rBwd), 1)
-    lFwd /= peak
-    lBwd /= peak
-    rFwd /= peak
-    rBwd /= peak
-
-    # Scale to desired max speed
-    lFwd *= maxspeed
-    lBwd *= maxspeed
-    rFwd *= maxspeed
-    rBwd *= maxspeed
-
-    # return wheel powers: left front, left back, right front, right back
-    return (lFwd, lBwd, rFwd, rBwd)
+# shaper: InputShaper from shaping.py applied to the sticks first (it then handles the
+# deadzone), now: time.monotonic() of this frame, for its slew limiter
+def calculateMecanumWheel(state, deadzone, maxspeed, shaper=None, now=0.0):
+    speed = state.lj_ud     # forward/back
+    strafe = state.lj_lr    # left/right
+    turn = state.rj_lr      # rotation
+    if shaper is not None:
+        speed, strafe, turn = shaper.shape(speed, strafe, turn, now)
+        deadzone = 0
+
+    # deadzone, normalization and scaling live in mecanum.py;
+    # returns wheel powers: left front, left back, right front, right back
+    return mecanumWheel(speed, strafe, turn, deadzone, maxspeed)
 
 
 # Simple remapping function converting two channels into bytes for sending.
@@ -186,46 +80,216 @@ def remap(ch1, ch2):
         return (int(ch1*63+64), int(ch2*63+192))
     else:
         return (int(ch1*63+64), int(ch2*63+192))
+
+
+# Convert the four wheel powers into the motor bytes sent to the robot, in wire order (rb, rf, lb, lf).
+# Reference version; the control loop uses the table-driven MotorEncoder from quantize.py,
+# which produces the same bytes.
+def wheelBytes(lf, lb, rf, rb):
+    lb, lf = remap(lb * -1, lf *-1)
+    rb, rf = remap(rf * -1, rb * -1)
+    return rb, rf, lb, lf
     
     
+# Text for the operator console: a simple ASCII robot frame with the motor bytes, the
+# numeric values, the raw joystick values and the connection state.
+def renderDashboard(snapshot):
+    (lf, rf, lb, rb, dpad_value_1, dpad_value_2, a, y, rt_trigger, lt_trigger,
+     lb_button, rb_button, speed, strafe, turn, ip_address, connected, observer, control, telemetry) = snapshot
+    return ("\\===\\-----/===/\n" +
+            f"\\{lf}\\     /{rf}/\n" +
+            "\\===\\     /===/\n" +
+            ("   |       |\n" * 3) +
+            "/===/     \\===\\\n" +
+            f"/{lb}/     \\{rb}\\\n" +
+            "/===/-----\\===\\\n\n" +
+            f"{lf:3d}\t{rf:3d}\n{lb:3d}\t{rb:3d}\t{dpad_value_1: 3d}\t{dpad_value_2: 3d}\t{a: 3d}\t{y: 3d}\t{rt_trigger: 3d}\t{lt_trigger: 3d}\t{lb_button: 3d}\t {rb_button: 3d}\t {a: 3d}\t{y: 3d}\n" +
+            f"Deadzone: {deadzone}  Speed: {speed: .3f}  Strafe: {strafe: .3f}  Turn: {turn: .3f}\n" +
+            f"{ip_address} {'connected' if connected else 'not connected'}\n" +
+            f"Motor Control boolean: {observer}\n" +
+            f"Control: {control}\n" +
+            renderTelemetry(telemetry))
+
+
+ip_address = '127.0.0.1'  # robot server address, when robot_mac is not set
+port = 9999  # robot server port
 connect = True  # whether to connect to the remote robot server
+transport = "tcp"  # "tcp" (reliable, TCP_NODELAY) or "udp" (newest frame wins, for lossy Wi-Fi)
 MotorControlChange = False  # unused flag in this file
-
-
-def main():
-    pygame.init()  # initialize pygame modules (needed for joystick events)
+keepalive_rate = 5.0  # frames per second sent while no input changes
+max_rate = 250.0  # cap on frames per second while input keeps changing
+deadzone = 0.08  # joystick noise threshold, radial for the left stick (see shaping.py)
+maxspeed = 0.8  # scale factor for motor outputs
+expo = 0.0  # stick response curve: 0 linear, 1 cubic (finer control at low speeds)
+slew_rate = 0.0  # fastest increase of an axis in full deflections per second, 0 for no limit
+input_step = 1 / 64  # steps the shaped sticks snap to, with hysteresis against noise; 0 to not quantize
+dashboard_rate = 10.0  # console redraws per second, 0 to turn the console output off
+recording_minutes = 5  # how much history the flight recorder keeps
+recording_rate = 250  # loop iterations per second assumed when sizing the flight recorder
+robot_mac = None  # e.g. "d8:3a:dd:d0:ac:cb": find the robot by MAC address instead of using ip_address
+discovery_beacon = True  # also ask for the robot with a UDP broadcast (answered by testcontrol.py)
+recording_path = "flight.rec"  # where the flight recorder is saved on exit, None to not save
+mappings_path = MappingsPath  # directory of controller mapping files (see MappingRegistry.py)
+mapping_reload = 1.0  # seconds between checks for edited mapping files, 0 to not reload them
+stats_interval = 0  # seconds between per-stage timing summaries, 0 turns the timers off
+stats_port = None  # serve the latest timing summary as JSON on http://127.0.0.1:<port>/
+telemetry_buffer = 64  # robot telemetry samples kept until the loop reads them; the oldest are dropped
+arbitration = "takeover"  # who drives with several pads: "takeover", "priority" or "merge" (see ControllerArbiter.py)
+fleet = None  # drive several robots instead of ip_address, e.g. {"alpha": "10.0.0.5", "beta": "10.0.0.6:9999"} (see FleetSender.py)
+fleet_mode = "mirror"  # "mirror": every robot gets the same command; "pad": each pad drives its own robot, in connection order
+
+
+# backend: where joystick input comes from (see input_backend.py); defaults to real
+# controllers through pygame
+def main(backend=None):
+    if backend is None:
+        backend = PygameBackend()
 
     # Create a MotorControlWatcher to observe motor value changes
     MotorControlWatcher1 = MotorControlWatcher()
  #   MotorControlWatcher1.add_observer(MotorControlChange)  # commented out in original
 
-    clock = pygame.time.Clock()
     joysticks = {}  # active joysticks tracked by instance id
-
-    # Choose IP address to connect to (placeholder or use ARP lookup)
-    ip_address =  '127.0.0.1' # get_ip_from_mac("d8:3a:dd:d0:ac:cb")
-
-    # Initialize TCP connection to robot (if enabled)
-    if connect:
-        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        client.connect((ip_address, 9999))
-
-    # Main loop: process events, read joystick inputs, compute motors, and send updates.
+    readers = {}  # compiled input readers, same keys as joysticks
+    states = {}  # reusable input snapshots, same keys as joysticks
+
+    # Controller mappings from data files; edits are picked up while the loop runs
+    mappings = MappingRegistry(mappings_path)
+    mapping_version = mappings.version
+    if mapping_reload:
+        mappings.watch(mapping_reload)
+
+    # Decides which pad drives when more than one is connected; HOME on any pad is an e-stop
+    arbiter = ControllerArbiter(arbitration)
+
+    # Choose IP address to connect to (the setting or an ARP lookup)
+    address = ip_address
+
+    # With robot_mac set, the address is looked up in a cache that a background thread keeps
+    # fresh, and looked up again before every reconnect in case the robot's DHCP lease changed
+    discovery = None
+    resolve = None
+    unreachable = None
+    if robot_mac:
+        discovery = RobotDiscovery(beacon_port=DiscoveryPort if discovery_beacon else None)
+        discovery.start()
+        address = discovery.lookup(robot_mac) or address
+        resolve = discovery.resolver(robot_mac, port)
+        unreachable = discovery.invalidator(robot_mac)
+
+    # Connect to robot (if enabled) from a background thread; it also handles reconnecting,
+    # so the loop keeps reading input and never waits on the network
+    # What the robot reports back is read on the connection's own thread into a bounded buffer
+    telemetry = TelemetryReceiver(telemetry_buffer)
+    client = ConnectionManager(makeTransport(transport, (address, port)), resolve=resolve, receiver=telemetry,
+                               unreachable=unreachable)
+    fleet_sender = None
+    routes = None  # fleet_mode "pad": one FleetRoute per robot
+    if fleet:
+        # Every robot served from one selector thread; a slow or dead one holds up no other
+        fleet_sender = FleetSender(fleetTargets(fleet, port), transport, telemetry_capacity=telemetry_buffer)
+        if fleet_mode == "pad":
+            routes = [FleetRoute(fleet_sender, name, makeShaper(deadzone, expo, slew_rate, input_step),
+                                 keepalive_rate, max_rate) for name in fleet_sender.links]
+        if connect:
+            fleet_sender.start()
+    elif connect:
+        client.start()
+
+    # Wraps each payload in a protocol header (sequence number, timestamp)
+    encoder = FrameEncoder()
+
+    def send(frame):
+        if not connect:
+            return
+        if fleet_sender is None:
+            client.send(encoder.encode(MsgDrive, frame))
+        elif routes is None:
+            fleet_sender.sendAll(encoder.encode(MsgDrive, frame))
+
+    # Sends a frame as soon as the packed bytes change, otherwise only a keepalive
+    scheduler = TransmitScheduler(send, FrameWatcher(), keepalive_rate, max_rate)
+
+    # Wheel powers -> motor bytes from lookup tables, into one reused 4-byte frame
+    motor_encoder = MotorEncoder()
+
+    # Deadzone, expo, slew limit and quantization of the sticks before the kinematics
+    shaper = makeShaper(deadzone, expo, slew_rate, input_step)
+    ramp_interval = 1.0 / max_rate if max_rate else 0.0
+
+    # Draws the console from its own thread, so a slow terminal never stalls the loop
+    renderer = None
+    if dashboard_rate:
+        renderer = ConsoleRenderer(renderDashboard, dashboard_rate)
+        renderer.start()
+
+    # Keeps the last few minutes of inputs, wheel values and payloads; replay with replay.py
+    recorder = FlightRecorder.forDuration(recording_minutes, recording_rate)
+    if recording_path:
+        recorder.dumpAtExit(recording_path)
+    if recording_path and hasattr(signal, "SIGUSR1"):
+        # `kill -USR1 <pid>` saves the recording without stopping the station
+        signal.signal(signal.SIGUSR1, lambda signum, frame: recorder.dump(recording_path))
+
+    # Per-stage timing histograms (see StageTimers.py); None when turned off
+    stats = None
+    if stats_interval:
+        stats = StageTimers(stats_interval)
+        if stats_port:
+            stats.serve(stats_port)
+    last_sent = None
+
+    # Main loop: wait for input (or the next keepalive), read joysticks, compute motors, and send updates.
     while True:
-        for event in pygame.event.get():
-            if event.type == pygame.QUIT:
+        if stats is not None:
+            stats.start()
+        timeout = scheduler.timeout()
+        if routes is not None:
+            timeout = min([timeout] + [route.scheduler.timeout() for route in routes])
+        # A slew-limited ramp only moves when the loop shapes again, so keep waking at max_rate
+        if shaper.settling() or (routes is not None and any(route.shaper.settling() for route in routes)):
+            timeout = min(timeout, ramp_interval)
+        for event in backend.poll(timeout):
+            if event[0] == Quit:
+                client.stop()
+                if fleet_sender is not None:
+                    fleet_sender.stop()
+                if stats is not None:
+                    stats.stop()
+                mappings.stop()
+                if discovery is not None:
+                    discovery.stop()
+                if renderer is not None:
+                    renderer.stop()
+                backend.close()
                 return
 
             # Handle joystick hotplug events
-            if event.type == pygame.JOYDEVICEADDED:
-                joy = pygame.joystick.Joystick(event.device_index)
+            if event[0] == JoyAdded:
+                joy = event[1]
                 joysticks[joy.get_instance_id()] = joy
+                readers[joy.get_instance_id()] = mappings.reader(joy)
+                states[joy.get_instance_id()] = ControllerState()
+                arbiter.add(joy.get_instance_id())
                 print(f"{joy.get_name()}, connencted") 
-            if event.type == pygame.JOYDEVICEREMOVED:
-                del joysticks[event.instance_id]
+                if routes is not None:
+                    route = next((route for route in routes if route.pad is None), None)
+                    if route is not None:
+                        route.pad = joy.get_instance_id()
+                        print(f"{joy.get_name()} drives {route.name}")
+            if event[0] == JoyRemoved:
+                joy = joysticks.pop(event[1])
+                del readers[event[1]]
+                del states[event[1]]
+                arbiter.remove(event[1])
+                if routes is not None:
+                    for route in routes:
+                        if route.pad == event[1]:
+                            route.pad = None  # free for the next pad that connects
                 print(f"{joy.get_name()}, disconnected")
 
         # default values for this update
+        speed, strafe, turn = 0.0, 0.0, 0.0
         lf, lb, rf, rb = 0.0, 0.0, 0.0, 0.0
         lb_button, rb_button = 0, 0
         rt_trigger, lt_trigger = 0, 0
@@ -233,72 +297,127 @@ def main():
         dpad_value_2 = 0
         a, b, x, y = 0, 0, 0, 0
 
-        # Read inputs from all connected joysticks (currently uses last joystick read)
-        for joystick in joysticks.values():
-            lf, lb, rf, rb = calculateMecanumWheel(joystick, 0.08, 0.8)
+        # Mapping files changed: recompile every pad's reader, then swap them all in at once
+        if mappings.version != mapping_version:
+            mapping_version = mappings.version
+            readers = {instance_id: mappings.reader(joy) for instance_id, joy in joysticks.items()}
+
+        if stats is not None:
+            stats.lap("wait")  # blocked in poll, plus hotplug handling
+            busy = stats.last
+
+        # Read every input of every connected pad in one pass each
+        for instance_id, reader in readers.items():
+            reader.read(states[instance_id])
+
+        # One command state from all pads, according to the arbitration policy
+        state = arbiter.merge(states)
+        now = time.monotonic()
+        if state is None:
+            shaper.reset()  # nobody driving: the next pad starts from rest
+        else:
+            speed, strafe, turn = state.lj_ud, state.lj_lr, state.rj_lr
+            lf, lb, rf, rb = calculateMecanumWheel(state, deadzone, maxspeed, shaper, now)
 
             # notify watcher about motor values (observer pattern)
             MotorControlWatcher1.notify(lf,lb,rf,rb)
 
-            # read button/hat/trigger values
-            lb_button = pollJoy(joystick, LeftBumper) 
-            rb_button = pollJoy(joystick, RightBumper)
+            # button/hat/trigger values
+            lb_button = state.lb
+            rb_button = state.rb
 
-            dpad_value_1 = pollJoy(joystick, DpadUpDown) + 1
-            dpad_value_2 = pollJoy(joystick, DpadLeftRight) + 1
+            dpad_value_1 = state.d_ud + 1
+            dpad_value_2 = state.d_lr + 1
 
-            b = pollJoy(joystick, BButton)
-            x = pollJoy(joystick, XButton)
-            y = pollJoy(joystick, YButton)
-            a = pollJoy(joystick, AButton)
+            b = state.b
+            x = state.x
+            y = state.y
+            a = state.a
 
-            rt_trigger = pollJoy(joystick, RightTrigger) + 1 
-            lt_trigger = pollJoy(joystick, LeftTrigger) + 1
+            rt_trigger = state.rt + 1
+            lt_trigger = state.lt + 1
 
             rt_trigger = int(rt_trigger)
             lt_trigger = int(lt_trigger)
 
-        # Convert wheel float values into bytes for visualizer / sending
-        lb, lf = remap(lb * -1, lf *-1)
-        rb, rf = remap(rf * -1, rb * -1)
-
-        # Print a simple ASCII robot frame and values for debugging
-        print("\\===\\-----/===/\n" +
-              f"\\{lf}\\     /{rf}/\n" +
-              "\\===\\     /===/\n" +
-              ("   |       |\n" * 3) +
-              "/===/     \\===\\\n" +
-              f"/{lb}/     \\{rb}\\\n" +
-              "/===/-----\\===\\\n")
-        
-        # Print numeric values; formatting may assume integers
-        print(f"{lf:3d}\t{rf:3d}\n{lb:3d}\t{rb:3d}\t{dpad_value_1: 3d}\t{dpad_value_2: 3d}\t{a: 3d}\t{y: 3d}\t{rt_trigger: 3d}\t{lt_trigger: 3d}\t{lb_button: 3d}\t {rb_button: 3d}\t {a: 3d}\t{y: 3d} \n\n")
-        print(ip_address)
-        
-        # show watcher state for debugging
-        print("Motor Control boolean: ", MotorControlWatcher1.observer)
-    
-        # Send 4 bytes (rb, rf, lb, lf) to the connected robot server
-        if connect:
-            try:
-                client.send(struct.pack('!' + 'B'*4,
-                                        rb, rf, lb, lf,))
-            except (ConnectionResetError, BrokenPipeError):
-                # attempt to reconnect if connection breaks
-                client.close()
-                print("connection refused")
-                while(True):
-                    try:
-                        client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        client.connect((ip_address, 9999))
-                        break
-                    except (ConnectionRefusedError, BrokenPipeError):
-                        time.sleep(0.1)
-                print("reconnected")
-
-        clock.tick(30)  # limit loop to ~30 FPS
+        # Fleet mode "pad": every robot follows its own pad; robots without one, and all of
+        # them during an e-stop, are sent stop
+        if routes is not None:
+            for route in routes:
+                pad_state = None if arbiter.estopped else states.get(route.pad)
+                if pad_state is None:
+                    route.shaper.reset()
+                    route.scheduler.offer(route.motor_encoder.encode(0.0, 0.0, 0.0, 0.0))
+                else:
+                    route.scheduler.offer(route.motor_encoder.encode(
+                        *calculateMecanumWheel(pad_state, deadzone, maxspeed, route.shaper, now)))
+        if stats is not None:
+            stats.lap("read+kinematics")
+
+        wheels = (lf, lb, rf, rb)
+
+        # Convert wheel float values into the bytes (rb, rf, lb, lf) for visualizer / sending
+        frame = motor_encoder.encode(lf, lb, rf, rb)
+        rb, rf, lb, lf = frame
+        if stats is not None:
+            stats.lap("encode")
+
+        # Hand the latest values to the console renderer
+        if renderer is not None:
+            if fleet_sender is None:
+                target, connected = client.transport.address[0], client.connected
+                sample = telemetry.latest
+            else:
+                robots = fleet_sender.connectedCount()
+                target, connected = f"{robots}/{len(fleet_sender.links)} robots", robots == len(fleet_sender.links)
+                sample = None
+            renderer.update((lf, rf, lb, rb, dpad_value_1, dpad_value_2, a, y, rt_trigger, lt_trigger,
+                             lb_button, rb_button, speed, strafe, turn, target, connected,
+                             MotorControlWatcher1.observer, arbiter.status(), sample))
+        if stats is not None:
+            stats.lap("render")
+
+        # Send 4 bytes (rb, rf, lb, lf) to the connected robot server when they changed
+        # or a keepalive is due
+        recorder.record(now, speed, strafe, turn, *wheels, frame)
+        if stats is not None:
+            stats.lap("record")
+        sent = scheduler.offer(frame)
+
+        if stats is not None:
+            stats.lap("send")
+            stats.record("loop", stats.last - busy)  # everything but the wait
+            if sent:
+                if last_sent is not None:
+                    stats.record("send interval", stats.last - last_sent)
+                last_sent = stats.last
+            # the robot's side, from the telemetry that arrived since the last frame
+            for sample in telemetry.take():
+                stats.record("robot frame age", sample[6] / 1e6)
+                stats.record("robot motor write", sample[9] / 1e6)
+            stats.maybeReport()
+
+
+# Command line options override the settings above (see settings.py)
+def parseArgs(argv=None):
+    parser = settingsParser("Drive the robot with a gamepad")
+    parser.add_argument("--ip", dest="ip_address", help=f"robot server address (default {ip_address})")
+    parser.add_argument("--port", type=int, help=f"robot server port (default {port})")
+    parser.add_argument("--connect", action=argparse.BooleanOptionalAction,
+                        help=f"send to the robot server (default {'on' if connect else 'off'})")
+    parser.add_argument("--transport", choices=("tcp", "udp"), help=f"default {transport}")
+    parser.add_argument("--rate", dest="max_rate", type=float,
+                        help=f"most frames per second while input keeps changing, 0 for no cap (default {max_rate:g})")
+    parser.add_argument("--deadzone", type=float, help=f"default {deadzone:g}")
+    parser.add_argument("--maxspeed", type=float, help=f"motor output scale (default {maxspeed:g})")
+    parser.add_argument("--robot-mac", dest="robot_mac", help="find the robot by MAC address instead of --ip")
+    parser.add_argument("--fleet", action="append", metavar="[NAME=]HOST[:PORT]",
+                        help="drive this robot instead of --ip; repeat for every robot of the fleet")
+    parser.add_argument("--fleet-mode", dest="fleet_mode", choices=("mirror", "pad"),
+                        help=f"mirror: same command to every robot, pad: one robot per pad (default {fleet_mode})")
+    return parseSettings(globals(), parser, argv)
 
 
 if __name__ == "__main__":
+    parseArgs()
     main()
-    pygame.quit()
@@ -0,0 +1,24 @@
+import importlib.util
+import sys
+
+# Optional dependencies that only some code paths need (NumPy for the batch functions) are
+# imported on first use rather than with the module that uses them: NumPy alone takes longer
+# to import than everything else the control loops load.
+#
+# lazyImport(name) returns a module object whose first attribute access runs the real
+# import, or None when the package is not installed, so `np is None` checks still work.
+
+
+def lazyImport(name):
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        return None
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
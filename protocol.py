@@ -0,0 +1,152 @@
+import struct
+import time
+
+# Wire protocol shared by operator_control.py, control.py and testcontrol.py.
+#
+# Every frame is a 16 byte header followed by a payload:
+#   version   B  protocol version, frames with another version are rejected
+#   type      B  message type (MsgDrive, MsgControl, ...)
+#   length    H  payload length in bytes
+#   sequence  I  per-sender counter, wraps at 2**32
+#   timestamp Q  sender's time.monotonic_ns() when the frame was encoded
+# Several frames may be sent back to back in one send (batching); the length field is
+# enough to split them again.
+
+Version = 1
+Header = struct.Struct('!BBHIQ')
+
+MsgDrive = 1    # rb, rf, lb, lf motor bytes (operator_control.py)
+MsgControl = 2  # rb, rf, lb, lf, rb_button, lb_button, dpad x2, triggers x2, x, b, a, y (control.py)
+# Robot -> driver (testcontrol.py): rb, rf, lb, lf last written to the motors, flags
+# (Telemetry* below), age of the newest driver frame in us, driver frames received per second,
+# driver frames received but not applied (stale or superseded, a running count), slowest
+# motor controller write since the previous telemetry frame in us
+MsgTelemetry = 3
+
+# Payload layout of each message type
+Payloads = {
+    MsgDrive: struct.Struct('!4B'),
+    MsgControl: struct.Struct('!14B'),
+    MsgTelemetry: struct.Struct('!5BIHII'),
+}
+
+TelemetryIdle = 1  # the watchdog stopped the motors, no driver frame since
+TelemetryRamping = 2  # the command store is ramping the motors down (deadman)
+
+MaxPayload = max(payload.size for payload in Payloads.values())
+MaxFrame = Header.size + MaxPayload
+
+SequenceMask = 0xFFFFFFFF
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+# Encodes frames into one preallocated buffer with pack_into, so encoding does not
+# allocate new bytes objects. Frames added with add()/add_values() accumulate until
+# flush() returns them as one batch; encode() is add() + flush() for a single frame.
+# The memoryview returned by flush()/encode() is only valid until the next call.
+class FrameEncoder:
+    def __init__(self, batch_size=8, clock=time.monotonic_ns):
+        self.buffer = bytearray(batch_size * MaxFrame)
+        self.view = memoryview(self.buffer)
+        self.length = 0
+        self.sequence = 0
+        self.clock = clock
+
+    def _header(self, msg_type, size):
+        if self.length + Header.size + size > len(self.buffer):
+            raise ProtocolError("batch is full, flush() before adding more frames")
+        Header.pack_into(self.buffer, self.length, Version, msg_type, size, self.sequence, self.clock())
+        self.sequence = (self.sequence + 1) & SequenceMask
+        self.length += Header.size
+
+    # Add a frame whose payload is already packed (bytes, bytearray or memoryview)
+    def add(self, msg_type, payload):
+        size = len(payload)
+        self._header(msg_type, size)
+        self.buffer[self.length:self.length + size] = payload
+        self.length += size
+
+    # Add a frame and pack its payload straight into the buffer
+    def add_values(self, msg_type, *values):
+        payload = Payloads[msg_type]
+        self._header(msg_type, payload.size)
+        payload.pack_into(self.buffer, self.length, *values)
+        self.length += payload.size
+
+    def flush(self):
+        frames = self.view[:self.length]
+        self.length = 0
+        return frames
+
+    def encode(self, msg_type, payload):
+        self.add(msg_type, payload)
+        return self.flush()
+
+
+# Unpack and validate a header. Returns (msg_type, length, sequence, timestamp).
+def decodeHeader(buf, offset=0):
+    version, msg_type, length, sequence, timestamp = Header.unpack_from(buf, offset)
+    if version != Version:
+        raise ProtocolError(f"unsupported protocol version {version}")
+    if length > MaxPayload:
+        raise ProtocolError(f"payload length {length} is too large")
+    return msg_type, length, sequence, timestamp
+
+
+# Unpack a payload into its values. Unknown message types and payloads too short for their
+# type raise ProtocolError.
+def decodePayload(msg_type, payload):
+    layout = Payloads.get(msg_type)
+    if layout is None:
+        raise ProtocolError(f"unknown message type {msg_type}")
+    if len(payload) < layout.size:
+        raise ProtocolError(f"payload of {len(payload)} bytes is too short for message type {msg_type}")
+    return layout.unpack_from(payload)
+
+
+# Split a buffer holding one or more complete frames (a batch, or one datagram).
+# Yields (msg_type, sequence, timestamp, payload memoryview).
+def decodeFrames(buf):
+    view = memoryview(buf)
+    offset = 0
+    while offset < len(view):
+        if len(view) - offset < Header.size:
+            raise ProtocolError("truncated header")
+        msg_type, length, sequence, timestamp = decodeHeader(view, offset)
+        offset += Header.size
+        if len(view) - offset < length:
+            raise ProtocolError("truncated payload")
+        yield msg_type, sequence, timestamp, view[offset:offset + length]
+        offset += length
+
+
+# Tracks the newest sequence number seen from one sender, so stale (older or repeated)
+# frames can be dropped. Uses serial number arithmetic, so the counter may wrap.
+# Also estimates queuing delay: the sender's clock is unrelated to ours, so the smallest
+# (arrival - timestamp) seen so far is taken as the fixed offset and delay is the excess.
+class SequenceTracker:
+    def __init__(self):
+        self.last = None
+        self.dropped = 0
+        self.min_offset = None
+        self.delay = 0  # nanoseconds of queuing delay for the newest frame
+
+    def accept(self, sequence, timestamp=None, now=None):
+        if self.last is not None:
+            ahead = (sequence - self.last) & SequenceMask
+            if ahead == 0 or ahead >= 0x80000000:
+                self.dropped += 1
+                return False
+        self.last = sequence
+
+        if timestamp is not None:
+            if now is None:
+                now = time.monotonic_ns()
+            offset = now - timestamp
+            if self.min_offset is None or offset < self.min_offset:
+                self.min_offset = offset
+            self.delay = offset - self.min_offset
+        return True
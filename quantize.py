@@ -0,0 +1,89 @@
+import struct
+
+# Table-driven motor byte encoding: the same bytes as remap()/wheelBytes() in
+# operator_control.py and control.py, without the per-channel float arithmetic and without
+# building a new struct format and bytes object every frame.
+#
+# Each channel function (wheel power -> byte) is monotonic, so it is tabulated over small
+# buckets of the input range: a bucket whose two ends map to the same byte maps every value
+# inside it to that byte. Buckets where the byte changes, and anything outside the table,
+# are computed with the channel function itself, so the output is identical for every input.
+
+Resolution = 4096  # buckets per 1.0 of wheel power, a power of two (see encode)
+Span = 2.0  # the tables cover wheel powers in [-Span, Span]
+Margin = 1e-9  # widen each bucket a little, so rounding in the bucket index cannot matter
+
+MotorBytes = struct.Struct('!4B')  # rb, rf, lb, lf: wire order of the motor bytes
+
+
+# The two halves of remap(ch1, ch2). negative_scale is 63 in operator_control.py and 64 in
+# control.py, sign is -1 where wheelBytes negates the powers first.
+def lowChannel(sign=1):
+    return lambda value: int(value * sign * 63 + 64)
+
+
+def highChannel(sign=1, negative_scale=63):
+    def channel(value):
+        value = value * sign
+        if value > 0:
+            return int(value * 63 + 192)
+        return int(value * negative_scale + 192)
+    return channel
+
+
+# Byte for each bucket of channel, None where the bucket is not a single byte
+def buildTable(channel):
+    table = []
+    for index in range(int(2 * Span * Resolution) + 1):
+        low = index / Resolution - Span - Margin
+        high = (index + 1) / Resolution - Span + Margin
+        byte = channel(low)
+        table.append(byte if byte == channel(high) and 0 <= byte <= 255 else None)
+    # Bucket 0 also receives values just below -Span (int() truncates towards zero)
+    table[0] = None
+    return table
+
+
+# Encodes the four wheel powers into the motor bytes of a reusable frame.
+# frame_size > 4 leaves room for more fields after the motor bytes (see control.py).
+# negate=True matches wheelBytes in operator_control.py, False matches control.py.
+class MotorEncoder:
+    def __init__(self, negative_scale=63, negate=True, frame_size=4):
+        sign = -1 if negate else 1
+        self.low = lowChannel(sign)
+        self.high = highChannel(sign, negative_scale)
+        self.low_table = buildTable(self.low)
+        self.high_table = buildTable(self.high)
+        self.size = len(self.low_table)
+        self.frame = bytearray(frame_size)
+
+    # Write (rb, rf, lb, lf) into the first four bytes of the frame and return the frame.
+    # The frame is reused: copy it if it has to outlive the next call.
+    # The four lookups are written out, a method call per channel would cost more than
+    # the arithmetic the tables save.
+    def encode(self, lf, lb, rf, rb):
+        low_table = self.low_table
+        high_table = self.high_table
+        size = self.size
+        scale = Resolution
+        offset = Span * Resolution  # v * scale + offset == (v + Span) * scale, scale is a power of two
+
+        index = int(rf * scale + offset)
+        rb_byte = low_table[index] if 0 < index < size else None
+        if rb_byte is None:
+            rb_byte = self.low(rf)
+        index = int(rb * scale + offset)
+        rf_byte = high_table[index] if 0 < index < size else None
+        if rf_byte is None:
+            rf_byte = self.high(rb)
+        index = int(lb * scale + offset)
+        lb_byte = low_table[index] if 0 < index < size else None
+        if lb_byte is None:
+            lb_byte = self.low(lb)
+        index = int(lf * scale + offset)
+        lf_byte = high_table[index] if 0 < index < size else None
+        if lf_byte is None:
+            lf_byte = self.high(lf)
+
+        MotorBytes.pack_into(self.frame, 0, rb_byte, rf_byte, lb_byte, lf_byte)
+        return self.frame
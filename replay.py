@@ -0,0 +1,87 @@
+import argparse
+import time
+
+from FlightRecorder import loadRecording
+import operator_control
+from mecanum import mecanumWheel
+from operator_control import wheelBytes
+from protocol import FrameEncoder, MsgDrive
+from shaping import makeShaper
+from transport import makeTransport
+
+# Replays a flight recording (see FlightRecorder.py): the recorded stick inputs go back
+# through the mecanum kinematics and remap, and the resulting frames are sent to a robot
+# server such as testcontrol.py, at real or accelerated speed.
+#
+#   python replay.py flight.rec                     # real time to 127.0.0.1:9999
+#   python replay.py flight.rec --speed 10          # ten times faster
+#   python replay.py flight.rec --speed 0 --dry-run # as fast as possible, no socket
+#   python replay.py flight.rec --maxspeed 0.6      # what would a lower maxspeed have sent?
+#   python replay.py flight.rec --expo 0.4 --slew-rate 3 --dry-run  # try other input shaping
+#
+# The input shaping defaults to operator_control.py's settings; the slew limiter runs on the
+# recorded times, so an unchanged setup reproduces the recorded frames exactly.
+
+
+# shaper: InputShaper from shaping.py (it then handles the deadzone), None for the plain deadzone
+def replay(records, client, speed=1.0, deadzone=0.08, maxspeed=0.8, shaper=None):
+    encoder = FrameEncoder()
+    mismatches = 0
+    start = time.monotonic()
+    first = records[0][0] if records else 0.0
+
+    for t, stick_speed, strafe, turn, lf, lb, rf, rb, payload in records:
+        if speed > 0:
+            # deadline relative to the start, so timing does not drift over a long replay
+            delay = start + (t - first) / speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        if shaper is not None:
+            stick_speed, strafe, turn = shaper.shape(stick_speed, strafe, turn, t)
+            frame = bytes(wheelBytes(*mecanumWheel(stick_speed, strafe, turn, 0, maxspeed)))
+        else:
+            frame = bytes(wheelBytes(*mecanumWheel(stick_speed, strafe, turn, deadzone, maxspeed)))
+        if frame != payload:
+            mismatches += 1
+        if client is not None:
+            client.send(encoder.encode(MsgDrive, frame))
+
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a flight recording to a robot server")
+    parser.add_argument("path", help="recording written by FlightRecorder")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9999)
+    parser.add_argument("--transport", default="tcp", choices=("tcp", "udp"))
+    parser.add_argument("--speed", type=float, default=1.0, help="playback speed factor, 0 for as fast as possible")
+    parser.add_argument("--deadzone", type=float, default=operator_control.deadzone)
+    parser.add_argument("--maxspeed", type=float, default=operator_control.maxspeed)
+    parser.add_argument("--expo", type=float, default=operator_control.expo)
+    parser.add_argument("--slew-rate", type=float, default=operator_control.slew_rate)
+    parser.add_argument("--step", type=float, default=operator_control.input_step,
+                        help="input quantization step, 0 for none")
+    parser.add_argument("--dry-run", action="store_true", help="recompute frames without sending them")
+    args = parser.parse_args()
+
+    records = loadRecording(args.path)
+    client = None
+    if not args.dry_run:
+        client = makeTransport(args.transport, (args.host, args.port))
+        client.connect()
+
+    started = time.monotonic()
+    shaper = makeShaper(args.deadzone, args.expo, args.slew_rate, args.step)
+    mismatches = replay(records, client, args.speed, args.deadzone, args.maxspeed, shaper)
+    elapsed = time.monotonic() - started
+    if client is not None:
+        client.close()
+
+    print(f"replayed {len(records)} frames in {elapsed:.2f} s")
+    print(f"{mismatches} frames differ from the recorded payload")
+
+
+if __name__ == "__main__":
+    main()
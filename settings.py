@@ -0,0 +1,37 @@
+import argparse
+import json
+
+# Command line handling for the scripts. Each script keeps its settings as module variables,
+# which stay the defaults; settingsParser() adds a --config option for a JSON file of
+# settings, and parseSettings() applies that file and then the command line options on top.
+# Options are added with default=None, so only the ones actually given override anything.
+
+
+def settingsParser(description):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--config", metavar="FILE",
+                        help="JSON object of settings (names as at the top of the script) applied before the options")
+    return parser
+
+
+# Plain values a config file may set: the settings, not the functions and modules
+def isSetting(value):
+    return value is None or isinstance(value, (bool, int, float, str, list, tuple))
+
+
+# settings: the script's globals(). Returns the parsed arguments.
+def parseSettings(settings, parser, argv=None):
+    args = parser.parse_args(argv)
+    if args.config:
+        with open(args.config) as source:
+            config = json.load(source)
+        if not isinstance(config, dict):
+            parser.error(f"{args.config} does not hold a JSON object")
+        unknown = [name for name in config if name.startswith("_") or name not in settings or not isSetting(settings[name])]
+        if unknown:
+            parser.error(f"{args.config}: unknown settings {', '.join(sorted(unknown))}")
+        settings.update(config)
+    for name, value in vars(args).items():
+        if name != "config" and value is not None:
+            settings[name] = value
+    return args
@@ -0,0 +1,233 @@
+import math
+
+from optional import lazyImport
+
+np = lazyImport("numpy")  # NumPy is optional, shapeArrays falls back to plain Python; imported on first use
+
+# Input shaping between the controller readers and the mecanum kinematics.
+#
+# A pipeline is a list of stages, each turning one (speed, strafe, turn) sample into the
+# next. Stages keep their state in plain attributes, so shaping a frame creates no lists or
+# other objects beyond the returned tuple. The stages:
+#   RadialDeadzone  the left stick as one 2D vector, so diagonals are not clipped, rescaled
+#                   so the output starts at 0 at the edge of the deadzone instead of jumping
+#   Expo            softer response around the center, full output at full deflection
+#   SlewLimiter     caps how fast the command can grow; releasing the stick stops at once
+#   Quantizer       snaps to steps with hysteresis, so noise smaller than a step does not
+#                   change the command (and the change-gated sender stays quiet)
+#
+# shapeArrays runs the same pipeline over whole recordings for offline replays and sweeps. It
+# is a convenience wrapper, not a faster path: stages without state from sample to sample use
+# NumPy, but the slew limiter and quantizer go sample by sample (shapeLoop), so a pipeline with
+# either of them takes about as long as calling shape() per sample.
+#
+# A stage's settling attribute is True while its last output still differs from its input
+# and will keep moving towards it (only the slew limiter ramps like that).
+
+
+class RadialDeadzone:
+    settling = False
+
+    def __init__(self, deadzone):
+        self.deadzone = abs(deadzone)
+
+    def shape(self, speed, strafe, turn, dt):
+        deadzone = self.deadzone
+        magnitude = math.sqrt(speed * speed + strafe * strafe)
+        if magnitude <= deadzone:
+            speed = strafe = 0.0
+        else:
+            scale = (magnitude - deadzone) / (1.0 - deadzone) / magnitude
+            speed *= scale
+            strafe *= scale
+        if -deadzone <= turn <= deadzone:
+            turn = 0.0
+        elif turn > 0:
+            turn = (turn - deadzone) / (1.0 - deadzone)
+        else:
+            turn = (turn + deadzone) / (1.0 - deadzone)
+        return speed, strafe, turn
+
+    def shapeArrays(self, speed, strafe, turn, dt):
+        deadzone = self.deadzone
+        magnitude = np.sqrt(speed * speed + strafe * strafe)
+        divisor = np.where(magnitude > 0.0, magnitude, 1.0)
+        scale = np.where(magnitude <= deadzone, 0.0, (magnitude - deadzone) / (1.0 - deadzone) / divisor)
+        turn = np.where(np.abs(turn) <= deadzone, 0.0, (turn - np.sign(turn) * deadzone) / (1.0 - deadzone))
+        return speed * scale, strafe * scale, turn
+
+    def reset(self):
+        pass
+
+
+# amount: 0 is linear, 1 is a pure cubic curve
+class Expo:
+    settling = False
+
+    def __init__(self, amount):
+        self.amount = amount
+
+    def shape(self, speed, strafe, turn, dt):
+        amount = self.amount
+        linear = 1.0 - amount
+        return (speed * (linear + amount * speed * speed),
+                strafe * (linear + amount * strafe * strafe),
+                turn * (linear + amount * turn * turn))
+
+    def shapeArrays(self, speed, strafe, turn, dt):
+        amount = self.amount
+        linear = 1.0 - amount
+        return (speed * (linear + amount * speed * speed),
+                strafe * (linear + amount * strafe * strafe),
+                turn * (linear + amount * turn * turn))
+
+    def reset(self):
+        pass
+
+
+# rate: largest increase per second of each axis, in full deflections (2.0 takes half a
+# second from rest to full). Changes towards 0 are not limited, so the robot always stops
+# as soon as the stick is released.
+class SlewLimiter:
+    def __init__(self, rate):
+        self.rate = rate
+        self.reset()
+
+    def reset(self):
+        self.speed = self.strafe = self.turn = 0.0
+        self.settling = False
+
+    def shape(self, speed, strafe, turn, dt):
+        step = self.rate * dt
+        self.speed = limitSlew(self.speed, speed, step)
+        self.strafe = limitSlew(self.strafe, strafe, step)
+        self.turn = limitSlew(self.turn, turn, step)
+        self.settling = self.speed != speed or self.strafe != strafe or self.turn != turn
+        return self.speed, self.strafe, self.turn
+
+    # Each output depends on the one before, so this is a loop rather than array arithmetic
+    def shapeArrays(self, speed, strafe, turn, dt):
+        return shapeLoop(self, speed, strafe, turn, dt)
+
+
+def limitSlew(last, value, step):
+    if value * last < 0.0:
+        last = 0.0  # reversing: down to 0 at once, then ramp up the other way
+    if abs(value) <= abs(last):
+        return value  # towards 0: never limited
+    if value > last + step:
+        return last + step
+    if value < last - step:
+        return last - step
+    return value
+
+
+# step: size of the output steps. hysteresis: how far past the middle between two steps
+# (as a fraction of a step) a value has to move before the output changes. 0 is plain
+# rounding; 0.5 ignores noise up to a whole step.
+class Quantizer:
+    settling = False
+
+    def __init__(self, step, hysteresis=0.5):
+        self.step = step
+        self.threshold = step * (0.5 + hysteresis)
+        self.reset()
+
+    def reset(self):
+        self.speed = self.strafe = self.turn = 0.0
+
+    def shape(self, speed, strafe, turn, dt):
+        self.speed = speed = snap(self.speed, speed, self.step, self.threshold)
+        self.strafe = strafe = snap(self.strafe, strafe, self.step, self.threshold)
+        self.turn = turn = snap(self.turn, turn, self.step, self.threshold)
+        return speed, strafe, turn
+
+    def shapeArrays(self, speed, strafe, turn, dt):
+        return shapeLoop(self, speed, strafe, turn, dt)
+
+
+def snap(last, value, step, threshold):
+    if value == 0.0:
+        return 0.0  # a released stick is exactly 0, whatever step the output was on
+    if abs(value - last) < threshold:
+        return last
+    return round(value / step) * step
+
+
+# shapeArrays for stages whose output depends on earlier samples
+def shapeLoop(stage, speed, strafe, turn, dt):
+    rows = [stage.shape(s, st, t, d) for s, st, t, d in zip(asList(speed), asList(strafe), asList(turn), asList(dt))]
+    if np is None:
+        return tuple(list(column) for column in zip(*rows)) if rows else ([], [], [])
+    columns = np.array(rows, dtype=np.float64).reshape(-1, 3)
+    return columns[:, 0], columns[:, 1], columns[:, 2]
+
+
+def asList(values):
+    return values.tolist() if np is not None and isinstance(values, np.ndarray) else values
+
+
+# The stages in order. shape() is called once per loop iteration with the current time
+# (time.monotonic()); the time between calls is what the slew limiter works with.
+class InputShaper:
+    def __init__(self, stages):
+        self.stages = tuple(stages)
+        self.last_time = None
+
+    def reset(self):
+        self.last_time = None
+        for stage in self.stages:
+            stage.reset()
+
+    # True while the output is still ramping towards the last input. The caller has to call
+    # shape() again soon even when the input does not change, or the ramp only moves when
+    # something else wakes it.
+    def settling(self):
+        for stage in self.stages:
+            if stage.settling:
+                return True
+        return False
+
+    def shape(self, speed, strafe, turn, now):
+        dt = now - self.last_time if self.last_time is not None else 0.0
+        self.last_time = now
+        for stage in self.stages:
+            speed, strafe, turn = stage.shape(speed, strafe, turn, dt)
+        return speed, strafe, turn
+
+    # shape() over equally long sequences of samples and their times, for recordings.
+    # Returns three NumPy arrays, or three lists when NumPy is not installed. Results match
+    # calling shape() sample by sample, and the state carries on from (and into) live use.
+    # Only the stateless stages are vectorized; see the note at the top of the file.
+    def shapeArrays(self, speed, strafe, turn, times):
+        if not self.stages or not len(times):
+            return speed, strafe, turn
+        if np is None:
+            rows = [self.shape(s, st, t, now) for s, st, t, now in zip(speed, strafe, turn, times)]
+            return tuple(list(column) for column in zip(*rows))
+
+        times = np.asarray(times, dtype=np.float64)
+        dt = np.empty_like(times)
+        dt[0] = times[0] - self.last_time if self.last_time is not None else 0.0
+        dt[1:] = np.diff(times)
+        self.last_time = float(times[-1])
+        speed = np.asarray(speed, dtype=np.float64)
+        strafe = np.asarray(strafe, dtype=np.float64)
+        turn = np.asarray(turn, dtype=np.float64)
+        for stage in self.stages:
+            speed, strafe, turn = stage.shapeArrays(speed, strafe, turn, dt)
+        return speed, strafe, turn
+
+
+# The pipeline for the settings in operator_control.py/control.py; 0 leaves a stage out
+def makeShaper(deadzone=0.08, expo=0.0, slew_rate=0.0, step=0.0, hysteresis=0.5):
+    stages = []
+    if deadzone:
+        stages.append(RadialDeadzone(deadzone))
+    if expo:
+        stages.append(Expo(expo))
+    if slew_rate:
+        stages.append(SlewLimiter(slew_rate))
+    if step:
+        stages.append(Quantizer(step, hysteresis))
+    return InputShaper(stages)
@@ -1,51 +1,425 @@
-import struct
-import socket
+import asyncio
+import collections
 import time
-#from serial import Serial 
+from protocol import (FrameEncoder, Header, MaxFrame, MsgControl, MsgDrive, MsgTelemetry, ProtocolError,
+                      SequenceTracker, TelemetryIdle, TelemetryRamping, decodeFrames, decodeHeader, decodePayload)
+from RobotDiscovery import DiscoveryPort, beaconReply, localMacs
+from MotorOutput import MotorOutput, MotorPorts
+from CommandStore import CommandStore, StopFrame
+from StageTimers import StageTimers
+from settings import parseSettings, settingsParser
 #host = get_non_loopback_ip()
 host = '127.0.0.1'
+bind_address = ""  # interface to listen on, "" for all of them
 port = 9999
 
-# TCP internet connection
-server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-server.bind(("", port))
-server.listen(1)
-'''serial_port = "/dev/serial0" #serial1'
-serial_port2 = "/dev/ttyAMA2"
-serial_port3 = "/dev/ttyAMA3"
+watchdog_timeout = 1.0  # seconds without a driver frame before the motors are stopped
+stop_frame = StopFrame  # remap(0, 0) for both sides, in rb, rf, lb, lf order
+
+actuation_rate = 100.0  # motor updates per second from the command store, 0 to write each frame as it arrives
+deadman_timeout = 0.5  # seconds the newest command is held before the motors ramp down
+ramp_time = 0.25  # seconds from the held command down to stop
+extrapolate_time = 0.0  # continue the command trend this long across gaps (see CommandStore.py), 0 to only hold
+
+serial_output = False  # write the motor bytes to the Roboclaws on MotorPorts (needs pyserial)
 baudrate = 115200
+motors = None  # MotorOutput once main() opened the serial ports
+stats_interval = 0  # seconds between receive timing summaries, 0 turns the timers off
+stats_port = None  # serve the latest timing summary as JSON on http://127.0.0.1:<port>/
+telemetry_rate = 10.0  # telemetry frames per second sent back to the driver (MsgTelemetry), 0 turns it off
+telemetry_queue = 8  # telemetry frames kept for a driver that reads slowly; the oldest are dropped
 
-roboclaw2 = Serial(serial_port2, baudrate, timeout=1)
-roboclaw3 = Serial(serial_port3, baudrate, timeout=1)
-roboclaw = Serial(serial_port, baudrate, timeout=1)'''
 
+# Forward one frame of motor bytes to the motor controllers.
+# Only hands the bytes to the per-port writer threads, so a stalled UART never blocks the server.
+def applyMotors(rb, rf, lb, lf):
+    if motors is not None:
+        motors.apply(rb, rf, lb, lf)
 
-def main():
+
+def stopMotors():
+    applyMotors(*stop_frame)
+
+
+# Accepts any number of operator connections over TCP, plus UDP datagrams on the same port.
+# The first sender to arrive is the driver and its frames go to the motors; later
+# connections are spectators (telemetry, monitoring) whose frames are read and ignored.
+# When the driver goes away the next sender becomes the driver.
+# Both MsgDrive (operator_control.py) and MsgControl (control.py) frames start with the
+# rb, rf, lb, lf motor bytes, so either drives the motors.
+# stats: StageTimers for the receive path (see StageTimers.py), None to not time it
+# store: CommandStore the frames go into, written to the motors by actuate() at
+# actuation_rate; None to write every applied frame straight to the motors
+# telemetry_rate: MsgTelemetry frames per second to the driver, sent by telemetry(); 0 for none
+class RobotServer:
+    def __init__(self, watchdog_timeout=watchdog_timeout, stats=None, store=None, actuation_rate=actuation_rate,
+                 telemetry_rate=telemetry_rate, telemetry_queue=telemetry_queue):
+        self.watchdog_timeout = watchdog_timeout
+        self.stats = stats
+        self.store = store
+        self.actuation_rate = actuation_rate
+        self.actuations = 0
+        self.applied = stop_frame  # motor bytes last written
+        self.telemetry_rate = telemetry_rate
+        self.telemetry_queue = telemetry_queue
+        self.telemetry_encoder = FrameEncoder(batch_size=1)
+        self.telemetry_sent = 0
+        self.telemetry_dropped = 0  # telemetry frames a slow driver never got
+        self.udp = None  # UDP transport of serve(), for telemetry to a UDP driver
+        self.driver = None  # FrameReceiver (TCP) or (host, port) address (UDP) of the driver
+        self.frames_received = 0  # frames decoded from the driver, applied or not
+        self.frames_applied = 0
+        self.udp_sequences = {}  # UDP sender address -> SequenceTracker
+        self.accepted = {MsgDrive, MsgControl}  # message types a driver may send (operator -> robot)
+        self.last_frame = 0.0  # time.monotonic() of the last driver frame
+        self.idle = False  # the watchdog stopped the motors and no frame came since
+
+    # Only commands drive the motors; any other message type, such as a telemetry frame
+    # sent back, is a protocol error
+    def checkCommand(self, msg_type):
+        if msg_type not in self.accepted:
+            raise ProtocolError(f"message type {msg_type} is not a command")
+
+    # Make key the driver if nobody is driving. Returns True if key is the driver.
+    def claim(self, key, addr):
+        if self.driver is None:
+            self.driver = key
+            print(f"{addr} is now the driver")
+        return self.driver == key
+
+    def release(self, key, reason):
+        if self.driver == key:
+            self.driver = None
+            self.halt()
+            print(f"driver {reason}, motors stopped")
+
+    # Stop the motors now, and keep the actuation loop from bringing the last command back
+    def halt(self):
+        if self.store is not None:
+            self.store.stop()
+        stopMotors()
+
+    # Forward a frame's motor bytes. Subclasses (benchmarks, loggers) can hook in here.
+    def apply(self, sequence, timestamp, values):
+        if self.store is not None:
+            self.store.update(values)
+        else:
+            rb, rf, lb, lf = self.applied = values[:4]
+            applyMotors(rb, rf, lb, lf)
+        self.frames_applied += 1
+
+    # One UDP datagram may carry a batch of frames. The whole datagram is decoded before its
+    # sender can become the driver, so garbage, empty datagrams and frames that are not commands
+    # never lock out the operator. Frames that arrive late (a newer sequence number was already
+    # applied) are dropped, and of the rest only the newest in the datagram is applied.
+    def datagram(self, data, addr):
+        received = time.perf_counter() if self.stats is not None else 0.0
+        frames = []
+        try:
+            for msg_type, sequence, timestamp, payload in decodeFrames(data):
+                self.checkCommand(msg_type)
+                frames.append((sequence, timestamp, decodePayload(msg_type, payload)))
+        except ProtocolError as error:
+            print(f"bad datagram from {addr}: {error}")
+        if not frames or not self.claim(addr, addr):
+            return
+        sequences = self.udp_sequences.get(addr)
+        if sequences is None:
+            sequences = self.udp_sequences[addr] = SequenceTracker()
+
+        newest = None
+        for sequence, timestamp, values in frames:
+            self.frames_received += 1
+            if sequences.accept(sequence, timestamp):
+                newest = (sequence, timestamp, values)
+        if newest is not None:
+            self.heard()
+            self.apply(*newest)
+            if self.stats is not None:
+                self.timed(received, sequences)
+
+    # Time from the read to the motor bytes being handed on, and how long the applied frame
+    # was queued on the way (its timestamp against the fastest frame seen so far)
+    def timed(self, received, sequences):
+        self.stats.record("receive->apply", time.perf_counter() - received)
+        self.stats.record("queue delay", sequences.delay / 1e9)
+
+    # A frame from the driver arrived
+    def heard(self):
+        now = time.monotonic()
+        if self.stats is not None and not self.idle and self.last_frame:
+            self.stats.record("frame interval", now - self.last_frame)
+        self.last_frame = now
+        self.idle = False
+
+    # Stop the motors if the driver goes quiet. A TCP driver keeps its connection, so
+    # driving resumes with its next frame; UDP has no disconnect, so a UDP driver is released.
+    async def watchdog(self):
+        while True:
+            await asyncio.sleep(self.watchdog_timeout / 4)
+            if self.stats is not None:
+                self.stats.maybeReport()
+            if self.driver is None or self.idle or time.monotonic() - self.last_frame <= self.watchdog_timeout:
+                continue
+            if isinstance(self.driver, tuple):
+                self.udp_sequences.pop(self.driver, None)
+                self.release(self.driver, f"{self.driver} stopped sending")
+            else:
+                self.idle = True
+                self.halt()
+                print("no frames from driver, motors stopped")
+
+    # Write the command store to the motors at a fixed rate, on deadlines so the rate does
+    # not drift. Ticks missed while the event loop was busy are skipped, not made up.
+    async def actuate(self):
+        interval = 1.0 / self.actuation_rate
+        next_tick = time.monotonic()
+        last_tick = None
+        while True:
+            now = time.monotonic()
+            self.applied = self.store.sample(now)
+            applyMotors(*self.applied)
+            self.actuations += 1
+            if self.stats is not None and last_tick is not None:
+                self.stats.record("actuation interval", now - last_tick)
+            last_tick = now
+
+            next_tick += interval
+            delay = next_tick - time.monotonic()
+            if delay < 0:
+                next_tick -= delay // interval * interval  # whole missed ticks
+                delay = next_tick - time.monotonic()
+            await asyncio.sleep(max(0.0, delay))
+
+    # Send the driver a MsgTelemetry frame telemetry_rate times per second. Sending never
+    # waits for the driver: see FrameReceiver.queueTelemetry.
+    async def telemetry(self):
+        interval = 1.0 / self.telemetry_rate
+        last_tick = next_tick = time.monotonic()
+        last_received = self.frames_received
+        while True:
+            next_tick = max(next_tick + interval, time.monotonic())
+            await asyncio.sleep(next_tick - time.monotonic())
+            now = time.monotonic()
+            rate = (self.frames_received - last_received) / max(now - last_tick, 1e-6)
+            last_tick, last_received = now, self.frames_received
+            if self.driver is not None:
+                self.sendTelemetry(self.telemetryFrame(now, rate))
+
+    def telemetryFrame(self, now, rate):
+        flags = TelemetryIdle if self.idle else 0
+        if self.store is not None and self.store.updated is not None and self.store.age(now) > self.store.deadman_timeout:
+            flags |= TelemetryRamping
+        age = min(int((now - self.last_frame) * 1e6), 0xFFFFFFFF) if self.last_frame else 0xFFFFFFFF
+        write_time = motors.takeWriteTime() if motors is not None else 0.0
+        self.telemetry_encoder.add_values(MsgTelemetry, *self.applied, flags, age, min(int(rate), 0xFFFF),
+                                          (self.frames_received - self.frames_applied) & 0xFFFFFFFF,
+                                          min(int(write_time * 1e6), 0xFFFFFFFF))
+        return bytes(self.telemetry_encoder.flush())
+
+    def sendTelemetry(self, frame):
+        if isinstance(self.driver, tuple):
+            if self.udp is not None:
+                self.udp.sendto(frame, self.driver)  # a full socket buffer drops the datagram
+                self.telemetry_sent += 1
+        else:
+            self.driver.queueTelemetry(frame)
+
+
+# One TCP connection. The event loop receives straight into a preallocated buffer (recv_into
+# through get_buffer/buffer_updated), so no bytes objects are created per read. Every
+# complete frame in the buffer is decoded in place; when the sender bursts, only the newest
+# accepted frame of the burst is applied. A frame cut off at the end of a read is moved to
+# the start of the buffer and completed by the next read.
+class FrameReceiver(asyncio.BufferedProtocol):
+    def __init__(self, robot, buffer_size=65536):
+        self.robot = robot
+        self.buffer = bytearray(max(buffer_size, 2 * MaxFrame))
+        self.view = memoryview(self.buffer)
+        self.filled = 0  # bytes of an incomplete frame at the start of the buffer
+        self.sequences = SequenceTracker()
+        self.transport = None
+        self.addr = None
+        self.telemetry = collections.deque(maxlen=robot.telemetry_queue)  # frames not written yet
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.addr = transport.get_extra_info('peername')
+        if self.robot.claim(self, self.addr):
+            self.robot.heard()
+            print(f"got a connection from {self.addr} (driver)")
+        else:
+            print(f"got a connection from {self.addr} (spectator)")
+
+    def get_buffer(self, sizehint):
+        return self.view[self.filled:]
+
+    def buffer_updated(self, nbytes):
+        received = time.perf_counter() if self.robot.stats is not None else 0.0
+        buffer = self.buffer
+        end = self.filled + nbytes
+        offset = 0
+        # spectators' frames are only parsed to keep the stream in step
+        driving = self.robot.claim(self, self.addr)
+        newest = None
+        try:
+            while end - offset >= Header.size:
+                msg_type, length, sequence, timestamp = decodeHeader(buffer, offset)
+                frame_end = offset + Header.size + length
+                if frame_end > end:
+                    break
+                if driving:
+                    self.robot.frames_received += 1
+                    self.robot.checkCommand(msg_type)
+                    # drop stale or repeated frames
+                    if self.sequences.accept(sequence, timestamp):
+                        newest = (msg_type, sequence, timestamp, offset + Header.size, frame_end)
+                offset = frame_end
+
+            if newest is not None:
+                msg_type, sequence, timestamp, start, stop = newest
+                values = decodePayload(msg_type, self.view[start:stop])
+                self.robot.heard()
+                self.robot.apply(sequence, timestamp, values)
+                if self.robot.stats is not None:
+                    self.robot.timed(received, self.sequences)
+        except ProtocolError as error:
+            print(f"bad frame from {self.addr}: {error}")
+            self.transport.close()
+            return
+
+        # keep the incomplete tail for the next read
+        self.filled = end - offset
+        if self.filled and offset:
+            self.view[:self.filled] = self.view[offset:end]
+
+    # Telemetry for this driver. Frames are only written once everything written before has
+    # left asyncio's send buffer; until then they wait here, and when more arrive than the
+    # queue holds the oldest are dropped. A driver that stops reading therefore never builds
+    # up a backlog, and the frames it does get are the newest.
+    def queueTelemetry(self, frame):
+        if len(self.telemetry) == self.telemetry.maxlen:
+            self.robot.telemetry_dropped += 1
+        self.telemetry.append(frame)
+        if self.transport.is_closing() or self.transport.get_write_buffer_size():
+            return
+        self.transport.write(b"".join(self.telemetry))
+        self.robot.telemetry_sent += len(self.telemetry)
+        self.telemetry.clear()
+
+    def eof_received(self):
+        return False  # close our side too
+
+    def connection_lost(self, exc):
+        self.robot.release(self, f"{self.addr} disconnected")
+
+
+class DatagramServer(asyncio.DatagramProtocol):
+    def __init__(self, robot):
+        self.robot = robot
+
+    def datagram_received(self, data, addr):
+        self.robot.datagram(data, addr)
+
+
+# Answers operator stations looking for this robot (RobotDiscovery beacon queries)
+class BeaconServer(asyncio.DatagramProtocol):
+    def __init__(self, port):
+        self.port = port
+        self.macs = localMacs()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        reply = beaconReply(data, self.macs, self.port)
+        if reply is not None:
+            self.transport.sendto(reply, addr)
+
+
+# discovery_port: UDP port to answer discovery beacons on, None to not answer them
+async def serve(bind_address="", port=port, robot=None, discovery_port=DiscoveryPort):
+    if robot is None:
+        robot = RobotServer()
+    # TCP internet connection
+    loop = asyncio.get_running_loop()
+    server = await loop.create_server(lambda: FrameReceiver(robot), bind_address, port)
+    # UDP endpoint on the same port for the low-latency transport
+    udp, _ = await loop.create_datagram_endpoint(
+        lambda: DatagramServer(robot), local_addr=(bind_address or "0.0.0.0", port))
+    beacon = None
+    if discovery_port is not None:
+        try:
+            beacon, _ = await loop.create_datagram_endpoint(
+                lambda: BeaconServer(port), local_addr=("0.0.0.0", discovery_port))
+        except OSError as error:
+            print(f"not answering discovery beacons: {error}")
+    robot.udp = udp
+    watchdog = asyncio.create_task(robot.watchdog())
+    actuation = None
+    if robot.store is not None and robot.actuation_rate:
+        actuation = asyncio.create_task(robot.actuate())
+    telemetry = None
+    if robot.telemetry_rate:
+        telemetry = asyncio.create_task(robot.telemetry())
     print("gettin connection...")
-    client, addr = server.accept()
-    print("got a connection")
-
-    # Checks constantly for client data
-    while True:
-      #  client.send("Hello from RaspberryPi".encode())
-#        pca1.frequency = 50
-        buf = ''
-        start = time.time()
-        while (len(buf) < 4):
-            buf = client.recv(4)
-            if (time.time()-start) > 1:
-                return socket.timeout
-        
-    '''  rb, rf, lb, lf = struct.unpack('!' + 'B' * 4, buf)
-        roboclaw.write(bytes([rb])) #forwards 
-        roboclaw.write(bytes([rf])) #stop
-        roboclaw2.write(bytes([lf])) #backwards
-        roboclaw2.write(bytes([lb])) #forwards '''
-       
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        watchdog.cancel()
+        if actuation is not None:
+            actuation.cancel()
+        if telemetry is not None:
+            telemetry.cancel()
+        udp.close()
+        if beacon is not None:
+            beacon.close()
+
+
+def main():
+    global motors
+    if serial_output:
+        motors = MotorOutput.open(MotorPorts, baudrate)
+        motors.start()
+    stats = None
+    if stats_interval:
+        stats = StageTimers(stats_interval)
+        if stats_port:
+            stats.serve(stats_port)
+    store = None
+    if actuation_rate:
+        store = CommandStore(extrapolate_time, deadman_timeout, ramp_time, stop_frame)
+    try:
+        robot = RobotServer(watchdog_timeout, stats, store, actuation_rate, telemetry_rate, telemetry_queue)
+        asyncio.run(serve(bind_address, port, robot))
+    finally:
+        if stats is not None:
+            stats.stop()
+        if motors is not None:
+            stopMotors()
+            motors.stop()
+
+
+# Command line options override the settings above (see settings.py)
+def parseArgs(argv=None):
+    parser = settingsParser("Robot server: receive drive frames and apply them to the motors")
+    parser.add_argument("--bind", dest="bind_address", help="interface to listen on (default all)")
+    parser.add_argument("--port", type=int, help=f"default {port}")
+    parser.add_argument("--rate", dest="actuation_rate", type=float,
+                        help=f"motor updates per second, 0 to write each frame as it arrives (default {actuation_rate:g})")
+    parser.add_argument("--watchdog", dest="watchdog_timeout", type=float, help=f"seconds (default {watchdog_timeout:g})")
+    parser.add_argument("--telemetry-rate", dest="telemetry_rate", type=float,
+                        help=f"telemetry frames per second to the driver, 0 for none (default {telemetry_rate:g})")
+    parser.add_argument("--serial", dest="serial_output", action="store_true", default=None,
+                        help="write to the Roboclaws on MotorPorts (needs pyserial)")
+    return parseSettings(globals(), parser, argv)
+
 
 if __name__ == "__main__":
-    while(True):
-        try:
-            main()
-        except (socket.timeout,ConnectionResetError):
-            time.sleep(0.1)
\ No newline at end of file
+    parseArgs()
+    try:
+        main()
+    except KeyboardInterrupt:
+        pass
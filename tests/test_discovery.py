@@ -0,0 +1,110 @@
+# RobotDiscovery (RobotDiscovery.py) against a fake ARP table: which address wins when a MAC is
+# listed more than once, forgetting an address a connect failed on, and how often `arp -a`
+# runs where there is no /proc/net/arp.
+# Run from the repository root:  python -m pytest tests  (or python -m unittest)
+import os
+import socket
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+import RobotDiscovery
+from ConnectionManager import ConnectionManager
+from RobotDiscovery import RobotDiscovery as Discovery
+from transport import TcpTransport
+
+Robot = "aa:bb:cc:00:11:22"
+Header = "IP address       HW type     Flags       HW address            Mask     Device\n"
+
+
+def arpRow(ip_address, mac, flags=0x2):
+    return f"{ip_address:16s} 0x1         {flags:#x}         {mac}     *        wlan0\n"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class ArpTable(unittest.TestCase):
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+        self.clock = FakeClock()
+        self.discovery = Discovery(clock=self.clock, arp_path=self.path)
+
+    def write(self, *rows):
+        with open(self.path, "w") as table:
+            table.write(Header + "".join(rows))
+
+    def test_incomplete_rows_are_skipped(self):
+        self.write(arpRow("10.0.0.9", Robot, flags=0x0), arpRow("10.0.0.5", Robot))
+        self.assertEqual(RobotDiscovery.readArpTable(self.path), {Robot: "10.0.0.5"})
+
+    def test_newest_address_wins(self):
+        self.write(arpRow("10.0.0.5", Robot))
+        self.assertEqual(self.discovery.lookup(Robot), "10.0.0.5")
+        # the robot got a new lease; the old one is still listed, and listed first
+        self.clock.now += 1
+        self.write(arpRow("10.0.0.5", Robot), arpRow("10.0.0.7", Robot))
+        self.discovery.refreshArp()
+        self.assertEqual(self.discovery.lookup(Robot), "10.0.0.7")
+        self.clock.now += 1
+        self.discovery.refreshArp()
+        self.assertEqual(self.discovery.lookup(Robot), "10.0.0.7")
+
+    def test_failed_address_loses(self):
+        self.write(arpRow("10.0.0.5", Robot), arpRow("10.0.0.7", Robot))
+        self.assertEqual(self.discovery.lookup(Robot), "10.0.0.5")
+        self.discovery.invalidator(Robot)(("10.0.0.5", 9999))
+        self.assertEqual(self.discovery.lookup(Robot), "10.0.0.7")
+
+    def test_invalidate_other_address_keeps_cache(self):
+        self.write(arpRow("10.0.0.5", Robot))
+        self.discovery.lookup(Robot)
+        self.discovery.invalidate(Robot, "10.0.0.99")
+        self.assertEqual(self.discovery.cached(Robot), "10.0.0.5")
+
+
+class ArpCommand(unittest.TestCase):
+    def test_arp_command_is_rate_limited(self):
+        clock = FakeClock()
+        rows = mock.Mock(return_value=[(Robot, "10.0.0.5")])
+        with mock.patch.object(RobotDiscovery, "readArpCommandRows", rows):
+            discovery = Discovery(clock=clock, arp_path="/nonexistent/arp", arp_command_interval=5.0)
+            for _ in range(10):
+                discovery.refreshArp()
+                discovery.lookup("aa:bb:cc:00:11:33")  # a miss
+                clock.now += 0.2
+            self.assertEqual(rows.call_count, 1)
+            clock.now += 5.0
+            discovery.refreshArp()
+            self.assertEqual(rows.call_count, 2)
+
+
+class FailedConnect(unittest.TestCase):
+    def test_unreachable_gets_the_failed_address(self):
+        probe = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        probe.bind(("127.0.0.1", 0))
+        address = probe.getsockname()
+        probe.close()  # nothing listens there now
+        failed = []
+        called = threading.Event()
+
+        def unreachable(where):
+            failed.append(where)
+            called.set()
+        manager = ConnectionManager(TcpTransport(address), resolve=lambda: address, unreachable=unreachable)
+        manager.start()
+        called.wait(2.0)
+        manager.stop()
+        self.assertEqual(failed[0], address)
+
+
+if __name__ == "__main__":
+    unittest.main()
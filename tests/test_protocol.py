@@ -0,0 +1,47 @@
+# Wire protocol (protocol.py): frames round-trip through the encoder and decoders, and a
+# frame of a known type whose payload is shorter than the type's layout is rejected with
+# ProtocolError (which the receive paths handle) rather than struct.error.
+# Run from the repository root:  python -m pytest tests  (or python -m unittest)
+import unittest
+
+from protocol import (FrameEncoder, Header, MsgControl, MsgDrive, Payloads, ProtocolError, Version, decodeFrames,
+                      decodeHeader, decodePayload)
+
+
+class ShortPayloads(unittest.TestCase):
+    def test_short_payloads_raise_protocol_error(self):
+        for msg_type, short in ((MsgDrive, 2), (MsgDrive, 0), (MsgControl, 4), (MsgControl, 0)):
+            with self.subTest(msg_type=msg_type, length=short):
+                frame = Header.pack(Version, msg_type, short, 0, 0) + bytes(short)
+                (_, _, _, payload), = decodeFrames(frame)
+                with self.assertRaises(ProtocolError):
+                    decodePayload(msg_type, payload)
+
+    def test_unknown_type_raises_protocol_error(self):
+        with self.assertRaises(ProtocolError):
+            decodePayload(99, bytes(4))
+
+
+class RoundTrip(unittest.TestCase):
+    def test_drive_frame(self):
+        encoder = FrameEncoder(clock=lambda: 12345)
+        frame = bytes(encoder.encode(MsgDrive, bytes((64, 192, 70, 200))))
+        self.assertEqual(decodeHeader(frame), (MsgDrive, Payloads[MsgDrive].size, 0, 12345))
+        self.assertEqual(decodePayload(MsgDrive, memoryview(frame)[Header.size:]), (64, 192, 70, 200))
+
+    def test_batch(self):
+        encoder = FrameEncoder()
+        for value in range(3):
+            encoder.add_values(MsgControl, *([value] * 14))
+        frames = list(decodeFrames(bytes(encoder.flush())))
+        self.assertEqual([sequence for _, sequence, _, _ in frames], [0, 1, 2])
+        self.assertEqual([decodePayload(msg_type, payload)[0] for msg_type, _, _, payload in frames], [0, 1, 2])
+
+    def test_truncated_batch_raises_protocol_error(self):
+        frame = bytes(FrameEncoder().encode(MsgDrive, bytes(4)))
+        with self.assertRaises(ProtocolError):
+            list(decodeFrames(frame[:-1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
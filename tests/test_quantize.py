@@ -0,0 +1,116 @@
+# MotorEncoder (quantize.py) must produce exactly the bytes of remap + struct.pack: the
+# drive variant (negative scale 63, powers negated) against wheelBytes in operator_control.py
+# and the control variant (negative scale 64, 14-byte frame) against remap in control.py.
+# Inputs: seeded random wheel powers, the edge values -1, -1/63, 0, 1/63 and 1 in every
+# combination, and values within a few ulps of every table bucket edge and byte boundary.
+# Run from the repository root:  python -m pytest tests  (or python -m unittest)
+import itertools
+import math
+import random
+import struct
+import unittest
+
+import control
+import operator_control
+from quantize import MotorEncoder, Resolution, Span
+
+Seed = 20260214
+EdgeValues = (-1.0, -1 / 63, 0.0, 1 / 63, 1.0)
+Buttons = (1, 0, 1, 2, 2, 0, 1, 0, 1, 0)
+
+
+# Old per-frame paths
+def driveFrame(lf, lb, rf, rb):
+    rb, rf, lb, lf = operator_control.wheelBytes(lf, lb, rf, rb)
+    return struct.pack('!' + 'B'*4, rb, rf, lb, lf,)
+
+
+def controlFrame(lf, lb, rf, rb, buttons=Buttons):
+    lb, lf = control.remap(lb, lf)
+    rb, rf = control.remap(rf, rb)
+    return struct.pack('!' + 'B'*14, rb, rf, lb, lf, *buttons)
+
+
+def driveEncoder():
+    encoder = MotorEncoder()
+    return lambda *wheels: bytes(encoder.encode(*wheels))
+
+
+def controlEncoder(buttons=Buttons):
+    encoder = MotorEncoder(negative_scale=64, negate=False, frame_size=14)
+
+    def encode(*wheels):
+        frame = encoder.encode(*wheels)
+        control.ControlFields.pack_into(frame, 4, *buttons)
+        return bytes(frame)
+    return encode
+
+
+# Wheel powers worth checking: around every bucket edge and every byte step, special values,
+# plus count randoms from rng
+def samples(count, rng):
+    values = list(EdgeValues) + [-0.0, 0.8, -0.8, Span, -Span, 2.5, -2.5, 1e-300, -1e-300]
+    edges = [index / Resolution - Span for index in range(int(2 * Span * Resolution) + 2)]
+    steps = [(byte - offset) / scale for scale in (63, 64) for offset in (64, 192)
+             for byte in range(-64, 320)]
+    for edge in edges + steps:
+        for point in (edge, -edge):
+            values.append(point)
+            up = down = point
+            for _ in range(2):
+                up = math.nextafter(up, math.inf)
+                down = math.nextafter(down, -math.inf)
+                values += (up, down)
+    values += (rng.uniform(-1.0, 1.0) for _ in range(count))
+    values += (rng.uniform(-1.2, 1.2) for _ in range(count))
+    return values
+
+
+# (lf, lb, rf, rb) tuples: every combination of the edge values, then values rotated so each
+# one is tried on every wheel
+def frames(values):
+    yield from itertools.product(EdgeValues, repeat=4)
+    rotations = [values[i:] + values[:i] for i in (0, 1, 2, 3)]
+    yield from zip(*rotations)
+
+
+def encodable(encode, wheels):
+    try:
+        return encode(*wheels)
+    except struct.error:
+        return struct.error  # byte out of range, both encoders must refuse it
+
+
+# Frames where encode and reference differ, as (wheels, got, expected), at most limit of them
+def mismatches(encode, reference, values, limit=10):
+    found = []
+    for wheels in frames(values):
+        got, expected = encodable(encode, wheels), encodable(reference, wheels)
+        if got != expected:
+            found.append((wheels, got, expected))
+            if len(found) == limit:
+                break
+    return found
+
+
+class MotorEncoderEquivalence(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.values = samples(20000, random.Random(Seed))
+
+    def test_drive_matches_wheelBytes(self):
+        self.assertEqual(mismatches(driveEncoder(), driveFrame, self.values), [])
+
+    def test_control_matches_remap(self):
+        self.assertEqual(mismatches(controlEncoder(), controlFrame, self.values), [])
+
+    def test_edge_values(self):
+        drive, full = driveEncoder(), controlEncoder()
+        for wheels in itertools.product(EdgeValues, repeat=4):
+            with self.subTest(wheels=wheels):
+                self.assertEqual(drive(*wheels), driveFrame(*wheels))
+                self.assertEqual(full(*wheels), controlFrame(*wheels))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+# MotionSequencer (MotionSequencer.py) drives the way the operator does: drive(+x) sends the
+# bytes of the left stick pushed forward by x, strafe and turn those of the stick pushed right,
+# read through the shipped pad mapping and operator_control's kinematics and MotorEncoder.
+# Run from the repository root:  python -m pytest tests  (or python -m unittest)
+import unittest
+
+import operator_control
+from ControllerReader import ControllerReader
+from FieldObjectTracker import FieldObjectTracker
+from MappingRegistry import defaultRegistry
+from MotionSequencer import MotionSequencer, objectInRange
+from input_backend import SimulatedJoystick
+from protocol import Header
+from quantize import MotorEncoder
+
+Pad = "Xbox One S Controller"
+MaxSpeed = 0.8
+
+
+# Motor bytes operator_control sends for raw stick axes (SDL: forward is negative on axis 1)
+def stickBytes(axes):
+    joystick = SimulatedJoystick(Pad, 0)
+    for index, value in axes.items():
+        joystick.axes[index] = value
+    state = ControllerReader(joystick, defaultRegistry().lookup(Pad)[1]).read()
+    wheels = operator_control.calculateMecanumWheel(state, 0, MaxSpeed)
+    return bytes(MotorEncoder().encode(*wheels))
+
+
+def sequencerBytes(speed=0.0, strafe=0.0, turn=0.0):
+    frames = []
+    MotionSequencer(lambda frame: frames.append(bytes(frame)), maxspeed=MaxSpeed).command(speed, strafe, turn)
+    return frames[0][Header.size:]
+
+
+class Direction(unittest.TestCase):
+    def test_drive_forward_matches_stick_forward(self):
+        for power in (0.25, 0.5, 1.0):
+            with self.subTest(power=power):
+                self.assertEqual(sequencerBytes(speed=power), stickBytes({1: -power}))
+                self.assertEqual(sequencerBytes(speed=-power), stickBytes({1: power}))
+
+    def test_forward_raises_the_motor_bytes(self):
+        rb, rf, lb, lf = sequencerBytes(speed=0.5)
+        self.assertGreater(rb, 64)
+        self.assertGreater(rf, 192)
+
+    def test_strafe_and_turn_match_the_sticks(self):
+        self.assertEqual(sequencerBytes(strafe=0.4), stickBytes({0: 0.4}))
+        self.assertEqual(sequencerBytes(turn=0.3), stickBytes({2: 0.3}))
+
+
+class InRange(unittest.TestCase):
+    def test_object_in_range(self):
+        tracker = FieldObjectTracker(clock=lambda: 10.0)
+        condition = objectInRange(tracker, "cone", 0.5)
+        self.assertFalse(condition(10.0))
+        tracker.update([("cone", 0.8, None)])
+        self.assertFalse(condition(10.0))
+        tracker.update([("cone", 0.4, None)])
+        self.assertTrue(condition(10.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
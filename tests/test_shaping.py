@@ -0,0 +1,70 @@
+# Input shaping (shaping.py): the slew limiter reports that it is still ramping, and a
+# change-gated loop that wakes at max_rate while it does (as operator_control.py and
+# control.py do) ramps in max_rate steps instead of keepalive steps.
+# Run from the repository root:  python -m pytest tests  (or python -m unittest)
+import unittest
+
+from shaping import makeShaper
+
+SlewRate = 2.0  # full deflections per second
+MaxRate = 250.0
+Keepalive = 0.2
+
+
+# Shaped speed at every wake of a loop whose stick jumps to full at t=0 and then holds still,
+# so nothing but the timeout wakes it
+def heldStickRamp(wake_while_settling, duration=1.0):
+    shaper = makeShaper(0.0, 0.0, SlewRate)
+    now, speeds = 0.0, []
+    while now <= duration:
+        speeds.append(shaper.shape(1.0, 0.0, 0.0, now)[0])
+        timeout = Keepalive
+        if wake_while_settling and shaper.settling():
+            timeout = min(timeout, 1.0 / MaxRate)
+        now += timeout
+    return speeds
+
+
+class Settling(unittest.TestCase):
+    def test_settling_while_ramping(self):
+        shaper = makeShaper(0.0, 0.0, SlewRate)
+        shaper.shape(0.0, 0.0, 0.0, 0.0)
+        self.assertFalse(shaper.settling())
+        shaper.shape(1.0, 0.0, 0.0, 0.1)
+        self.assertTrue(shaper.settling())
+        shaper.shape(1.0, 0.0, 0.0, 0.6)
+        self.assertFalse(shaper.settling())
+
+    def test_release_is_not_settling(self):
+        shaper = makeShaper(0.0, 0.0, SlewRate)
+        shaper.shape(1.0, 0.0, 0.0, 0.0)
+        shaper.shape(0.0, 0.0, 0.0, 0.01)
+        self.assertFalse(shaper.settling())
+
+    def test_without_slew_limit_never_settling(self):
+        shaper = makeShaper(0.08, 0.5, 0.0, 0.05)
+        shaper.shape(1.0, -0.4, 0.3, 0.0)
+        self.assertFalse(shaper.settling())
+
+    def test_reset_clears_settling(self):
+        shaper = makeShaper(0.0, 0.0, SlewRate)
+        shaper.shape(1.0, 0.0, 0.0, 0.0)
+        shaper.shape(1.0, 0.0, 0.0, 0.1)
+        shaper.reset()
+        self.assertFalse(shaper.settling())
+
+
+class HeldStickRamp(unittest.TestCase):
+    def test_ramp_moves_in_max_rate_steps(self):
+        speeds = heldStickRamp(True)
+        steps = [after - before for before, after in zip(speeds, speeds[1:])]
+        self.assertLessEqual(max(steps), SlewRate / MaxRate + 1e-9)
+        self.assertEqual(speeds[-1], 1.0)
+
+    def test_keepalive_wakes_alone_ramp_in_coarse_steps(self):
+        speeds = heldStickRamp(False)
+        self.assertAlmostEqual(speeds[1] - speeds[0], SlewRate * Keepalive)
+
+
+if __name__ == "__main__":
+    unittest.main()
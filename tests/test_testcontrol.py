@@ -0,0 +1,54 @@
+# Robot server (testcontrol.py): which UDP senders become the driver, and what reaches the
+# motors. Only a datagram holding at least one valid command frame may claim the driver.
+# Run from the repository root:  python -m pytest tests  (or python -m unittest)
+import contextlib
+import io
+import unittest
+
+import testcontrol
+from protocol import FrameEncoder, Header, MsgControl, MsgDrive, MsgTelemetry, Payloads, Version
+
+Operator = ("10.0.0.2", 40000)
+Stranger = ("10.0.0.66", 50000)
+
+
+class DatagramDriver(unittest.TestCase):
+    def setUp(self):
+        self.robot = testcontrol.RobotServer(actuation_rate=0, telemetry_rate=0)
+        self.encoder = FrameEncoder()
+
+    def datagram(self, data, addr):
+        with contextlib.redirect_stdout(io.StringIO()):
+            self.robot.datagram(bytes(data), addr)
+
+    def test_invalid_datagrams_do_not_claim(self):
+        telemetry = bytes((200, 200, 200, 200)) + bytes(Payloads[MsgTelemetry].size - 4)
+        for name, data in (("empty", b""),
+                           ("garbage", b"hello from nowhere"),
+                           ("short payload", Header.pack(Version, MsgDrive, 2, 0, 0) + b"\x40\x40"),
+                           ("telemetry", self.encoder.encode(MsgTelemetry, telemetry))):
+            with self.subTest(name):
+                self.datagram(data, Stranger)
+                self.assertIsNone(self.robot.driver)
+                self.assertEqual(self.robot.frames_applied, 0)
+
+    def test_operator_drives_after_garbage(self):
+        self.datagram(b"\x00" * 40, Stranger)
+        self.datagram(self.encoder.encode(MsgDrive, bytes((70, 190, 70, 190))), Operator)
+        self.assertEqual(self.robot.driver, Operator)
+        self.assertEqual(self.robot.applied, (70, 190, 70, 190))
+
+    def test_control_frames_drive(self):
+        self.datagram(self.encoder.encode(MsgControl, bytes((80, 180, 80, 180)) + bytes(10)), Operator)
+        self.assertEqual(self.robot.driver, Operator)
+        self.assertEqual(self.robot.applied, (80, 180, 80, 180))
+
+    def test_second_sender_is_ignored(self):
+        self.datagram(self.encoder.encode(MsgDrive, bytes((70, 190, 70, 190))), Operator)
+        self.datagram(FrameEncoder().encode(MsgDrive, bytes((1, 1, 1, 1))), Stranger)
+        self.assertEqual(self.robot.driver, Operator)
+        self.assertEqual(self.robot.applied, (70, 190, 70, 190))
+
+
+if __name__ == "__main__":
+    unittest.main()
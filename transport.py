@@ -0,0 +1,112 @@
+import select
+import socket
+
+# Transports carry encoded protocol frames from the operator station to the robot.
+#
+# "tcp": reliable stream with Nagle's algorithm turned off (TCP_NODELAY), so small frames
+#        go out immediately instead of waiting to be coalesced. A lost segment still stalls
+#        every later frame until it is retransmitted.
+# "udp": one datagram per send. Lost datagrams are simply gone and late ones are dropped
+#        by the robot's sequence check, so the robot always acts on the newest frame.
+#        Better on lossy Wi-Fi, since only the latest command matters.
+
+
+# timeout bounds connect() and send(), so a robot that vanished from the network is
+# noticed within a second instead of after the operating system gives up.
+class TcpTransport:
+    stream = True  # an empty read means the robot closed the connection
+
+    def __init__(self, address, timeout=1.0):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.address)
+
+    def send(self, data):
+        self.sock.sendall(data)
+
+    # Bytes from the robot (telemetry), waiting at most timeout seconds for them: None when
+    # nothing came, b'' once the robot closed the connection
+    def receive(self, timeout, size=4096):
+        return receive(self.sock, timeout, size)
+
+    # False once the robot has closed the connection. Never blocks.
+    def alive(self):
+        readable, _, _ = select.select([self.sock], [], [], 0)
+        if not readable:
+            return True
+        try:
+            return self.sock.recv(1, socket.MSG_PEEK) != b''
+        except (BlockingIOError, InterruptedError):
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+class UdpTransport:
+    stream = False  # an empty read is an empty datagram, there is no connection to close
+
+    def __init__(self, address):
+        self.address = address
+        self.sock = None
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.connect(self.address)  # only sets the default destination
+
+    # A datagram that cannot be delivered is dropped, the next frame supersedes it.
+    # Errors such as ConnectionRefusedError (robot not listening yet) are not fatal.
+    def send(self, data):
+        try:
+            self.sock.send(data)
+        except OSError:
+            pass
+
+    # Datagrams from the robot (telemetry), as for TcpTransport.receive
+    def receive(self, timeout, size=4096):
+        try:
+            return receive(self.sock, timeout, size)
+        except ConnectionRefusedError:
+            return None  # an earlier datagram found nobody listening
+
+    # There is no connection to lose, a robot that went away just stops receiving
+    def alive(self):
+        return True
+
+    def close(self):
+        if self.sock is not None:
+            self.sock.close()
+            self.sock = None
+
+
+def receive(sock, timeout, size):
+    if sock is None:
+        raise ConnectionError("not connected")
+    readable, _, _ = select.select([sock], [], [], timeout)
+    if not readable:
+        return None
+    return sock.recv(size)
+
+
+Transports = {
+    "tcp": TcpTransport,
+    "udp": UdpTransport,
+}
+
+
+# Create a transport by name ("tcp" or "udp") for the robot at address (host, port)
+def makeTransport(kind, address):
+    transport = Transports.get(kind)
+    if transport is None:
+        raise ValueError(f"unknown transport \"{kind}\", expected one of {', '.join(Transports)}")
+    return transport(address)